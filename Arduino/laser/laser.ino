@@ -1,5 +1,6 @@
 #include <Program.h>
 #include <Reading.h>
+#include <Calibration.h>
 #include <MQTT.h>
 
 #define LASER_SCAN_INTERVAL 10
@@ -9,11 +10,30 @@
 
 const int bucketDiv = (LASER_SCAN_MAX-LASER_SCAN_MIN)/LASER_BUCKETS;
 
-#define MODULE_ID 2
+#define STATION_ID "station_laser"
+#define SENSOR_ID "laser_1"
 
 Elapsed timeToScan = Elapsed(LASER_SCAN_INTERVAL);
 
-IntReading v;
+// Reports threshold crossings once the server calibrated it to the ambient light and
+// laser distance; until then, changes of about one of the old buckets. Streams every
+// scan while the server collects a baseline
+ThresholdReading<int> v(bucketDiv);
+
+void onServerMessage(const char *topic, const char *payload)
+{
+  if (strcmp(topic, STATION_BASELINE_TOPIC(STATION_ID)) == 0)
+  {
+    v.stream(baselineMillis(payload));
+    Serial.println(v.isStreaming() ? "Streaming a baseline" : "Baseline done");
+    return;
+  }
+  if (applyCalibration(payload, SENSOR_ID, v)) {
+    Serial.println("Calibrated");
+  } else {
+    Serial.println("No calibration for " SENSOR_ID);
+  }
+}
 
 void setup()
 {
@@ -21,30 +41,29 @@ void setup()
   Program::setup();
   // Moduler setup
   pinMode(A0, INPUT);
+  Mqtt::subscribe(STATION_CONFIG_TOPIC(STATION_ID), onServerMessage);
+  Mqtt::subscribe(STATION_BASELINE_TOPIC(STATION_ID), onServerMessage);
+  Program::heartbeat(STATION_HEARTBEAT_TOPIC(STATION_ID)); // Calibrated, it is silent while the beam is steady
   Serial.println("Setup done!");
 }
 
-int bucket(int reading) {
-  return (reading-LASER_SCAN_MIN) / bucketDiv;
-}
-
 void loop()
 {
   Program::loop();
   if (timeToScan)
   {
-    // read and map values to laser being on or off
-    // TODO: this needs to be calibrated from server according to ambient light and laser distance
     int reading = analogRead(A0);
     //Serial.println(reading);
-    v.updateIfChanged(bucket(reading));
+    v.update(reading);
 
-    // notify server if a change happened
+    // notify server if a threshold was crossed
     if (v.available())
     {
-      int bucket = v.get();
-      //Serial.printf("Notify server: %d\n", bucket);
-      Mqtt::send("mp/02", bucket);
+      char message[96];
+      int value = v.get();
+      snprintf(message, sizeof(message), "{\"sensor\":\"" SENSOR_ID "\",\"value\":%d,\"band\":%d,\"seq\":%lu}",
+               value, v.band(), (unsigned long)Mqtt::nextSequence());
+      Mqtt::send(STATION_EVENT_TOPIC(STATION_ID, "laser"), message);
     }
   }
 }
@@ -0,0 +1,124 @@
+#ifndef ER_BINARY_PAYLOAD
+#define ER_BINARY_PAYLOAD
+
+#include "Arduino.h"
+
+/* Compact binary event payload
+  An alternative to JSON text for station events. The server accepts both formats
+  on the same topics and tells them apart by the first byte (BINARY_PAYLOAD_MARKER).
+
+  Layout (little endian):
+  * u8 marker, u8 version, u8 event type, u16 station id, u32 sequence
+  * then fields: u8 field id, u8 type tag ('i' int32, 'f' float32, 'b' bool, 's' u8 length + bytes)
+
+  Notes:
+  - ids must match server/src/binary_payload.py
+  - the buffer is fixed size, add* calls that would overflow are ignored and valid() turns false
+  - send with Mqtt::send(topic, payload.data(), payload.size())
+*/
+
+#define BINARY_PAYLOAD_MARKER 0xB5
+#define BINARY_PAYLOAD_VERSION 1
+#define BINARY_PAYLOAD_MAX_SIZE 64
+
+// Event types
+#define EVENT_BEACON_PROXIMITY 1
+#define EVENT_DOOR_STATUS 2
+#define EVENT_LASER 3
+
+// Fields
+#define FIELD_SENSOR 1
+#define FIELD_RANGE 2
+#define FIELD_STATUS 3
+#define FIELD_VALUE 4
+
+class BinaryPayload
+{
+private:
+  uint8_t buffer[BINARY_PAYLOAD_MAX_SIZE];
+  size_t length = 0;
+  bool overflow = false;
+
+  void put(uint8_t b)
+  {
+    if (length < BINARY_PAYLOAD_MAX_SIZE)
+      buffer[length++] = b;
+    else
+      overflow = true;
+  }
+
+  void put32(uint32_t v)
+  {
+    put(v & 0xFF);
+    put((v >> 8) & 0xFF);
+    put((v >> 16) & 0xFF);
+    put((v >> 24) & 0xFF);
+  }
+
+public:
+  BinaryPayload(uint8_t eventType, uint16_t stationId, uint32_t sequence)
+  {
+    put(BINARY_PAYLOAD_MARKER);
+    put(BINARY_PAYLOAD_VERSION);
+    put(eventType);
+    put(stationId & 0xFF);
+    put((stationId >> 8) & 0xFF);
+    put32(sequence);
+  }
+
+  BinaryPayload &addInt(uint8_t fieldId, int32_t value)
+  {
+    put(fieldId);
+    put('i');
+    put32((uint32_t)value);
+    return *this;
+  }
+
+  BinaryPayload &addFloat(uint8_t fieldId, float value)
+  {
+    uint32_t bits;
+    memcpy(&bits, &value, sizeof(bits));
+    put(fieldId);
+    put('f');
+    put32(bits);
+    return *this;
+  }
+
+  BinaryPayload &addBool(uint8_t fieldId, bool value)
+  {
+    put(fieldId);
+    put('b');
+    put(value ? 1 : 0);
+    return *this;
+  }
+
+  BinaryPayload &addString(uint8_t fieldId, const char *value)
+  {
+    size_t n = strlen(value);
+    if (n > 255)
+      n = 255;
+    put(fieldId);
+    put('s');
+    put((uint8_t)n);
+    for (size_t i = 0; i < n; i++)
+      put((uint8_t)value[i]);
+    return *this;
+  }
+
+  const uint8_t *data() const
+  {
+    return buffer;
+  }
+
+  size_t size() const
+  {
+    return length;
+  }
+
+  bool valid() const
+  {
+    return !overflow;
+  }
+};
+
+#endif
@@ -0,0 +1,106 @@
+#ifndef ER_CALIBRATION
+#define ER_CALIBRATION
+
+#include "Arduino.h"
+#include "Reading.h"
+
+/* Station calibration
+  The server collects a baseline of each calibrated sensor, computes its thresholds and
+  deadband, and publishes them retained on the station config topic, so a station gets
+  them back from the broker every time it subscribes, e.g. after a reboot:
+
+  escaperoom/station/<station id>/config
+  {"sensors": {"laser_1": {"thresholds": [571.3, 648.9], "deadband": 9.7, "baseline": 610.1, "samples": 1000}}, ...}
+
+  To collect a baseline, the server asks the station to stream every raw reading, on a
+  topic that is not retained, and says when to stop; the station also stops by itself
+  after "seconds":
+
+  escaperoom/station/<station id>/baseline
+  {"collect_baseline": true, "seconds": 15}
+
+  Usage:
+  - Mqtt::subscribe(STATION_CONFIG_TOPIC("station_laser"), onServerMessage) and
+    Mqtt::subscribe(STATION_BASELINE_TOPIC("station_laser"), onServerMessage) after Program::setup()
+  - in onServerMessage: reading.stream(baselineMillis(payload)) for the baseline topic,
+    applyCalibration(payload, "laser_1", reading) for the config topic
+
+  Notes:
+  - only the keys above are looked up, this is not a general JSON parser
+  - the server lists "thresholds" and "deadband" first in each sensor object
+*/
+
+#define STATION_TOPIC_BASE "escaperoom/station/"
+#define STATION_EVENT_TOPIC(stationId, eventType) STATION_TOPIC_BASE stationId "/event/" eventType
+#define STATION_CONFIG_TOPIC(stationId) STATION_TOPIC_BASE stationId "/config"
+#define STATION_BASELINE_TOPIC(stationId) STATION_TOPIC_BASE stationId "/baseline"
+// Only proves the station is alive; see Program::heartbeat
+#define STATION_HEARTBEAT_TOPIC(stationId) STATION_EVENT_TOPIC(stationId, "heartbeat")
+
+// How long to stream raw readings for a baseline request, 0 to stop
+inline unsigned long baselineMillis(const char *json)
+{
+  const char *flag = strstr(json, "\"collect_baseline\"");
+  const char *seconds = strstr(json, "\"seconds\"");
+  if (!flag || !(flag = strchr(flag, ':')))
+  {
+    return 0;
+  }
+  flag++;
+  while (*flag == ' ')
+  {
+    flag++;
+  }
+  if (strncmp(flag, "true", 4) != 0 || !seconds || !(seconds = strchr(seconds, ':')))
+  {
+    return 0;
+  }
+  float value = strtof(seconds + 1, NULL);
+  return value > 0 ? (unsigned long)(value * 1000) : 0;
+}
+
+// Applies the thresholds of one sensor. Returns false, leaving the reading as it was,
+// if the sensor is missing, malformed or has more thresholds than a reading holds.
+template <typename T>
+bool applyCalibration(const char *json, const char *sensorId, ThresholdReading<T> &reading)
+{
+  char key[48];
+  snprintf(key, sizeof(key), "\"%s\"", sensorId);
+  const char *sensor = strstr(json, key);
+  if (!sensor)
+  {
+    return false;
+  }
+  const char *list = strstr(sensor, "\"thresholds\"");
+  const char *deadband = strstr(sensor, "\"deadband\"");
+  if (!list || !deadband || !(list = strchr(list, '[')) || !(deadband = strchr(deadband, ':')))
+  {
+    return false;
+  }
+
+  float thresholds[READING_MAX_THRESHOLDS];
+  int count = 0;
+  const char *cursor = list + 1;
+  while (true)
+  {
+    while (*cursor == ' ' || *cursor == ',')
+    {
+      cursor++;
+    }
+    if (*cursor == ']')
+    {
+      break;
+    }
+    char *end;
+    float value = strtof(cursor, &end);
+    if (end == cursor || count == READING_MAX_THRESHOLDS)
+    {
+      return false;
+    }
+    thresholds[count++] = value;
+    cursor = end;
+  }
+  return reading.calibrate(thresholds, count, strtof(deadband + 1, NULL));
+}
+
+#endif
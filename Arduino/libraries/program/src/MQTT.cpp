@@ -6,6 +6,8 @@ WiFiClient Mqtt::wifiClient = WiFiClient();
 MqttClient Mqtt::mqttClient = MqttClient(wifiClient);
 const char *Mqtt::brokerIp;
 bool Mqtt::connected = false;
+uint32_t Mqtt::sequence = 0;
+MessageCallback Mqtt::messageCallback = NULL;
 
 void Mqtt::setup(const char *_brokerIp)
 {
@@ -49,3 +51,60 @@ void Mqtt::send(const char *topic, int message)
   mqttClient.endMessage();
   Serial.printf("[MQTT] Sent int %s %d\n", topic, message);
 }
+
+// Sends a binary payload, e.g. one built with BinaryPayload
+void Mqtt::send(const char *topic, const uint8_t *payload, size_t length)
+{
+  mqttClient.beginMessage(topic);
+  mqttClient.write(payload, length);
+  mqttClient.endMessage();
+  Serial.printf("[MQTT] Sent binary %s (%d bytes)\n", topic, (int)length);
+}
+
+// Sequence numbers let the server drop duplicated/redelivered events
+uint32_t Mqtt::nextSequence()
+{
+  return ++sequence;
+}
+
+void Mqtt::subscribe(const char *topic, MessageCallback callback)
+{
+  messageCallback = callback;
+  mqttClient.onMessage(onMessage);
+  mqttClient.subscribe(topic, 1);
+  Serial.printf("[MQTT] Subscribed %s\n", topic);
+}
+
+void Mqtt::poll()
+{
+  if (connected)
+  {
+    mqttClient.poll();
+  }
+}
+
+void Mqtt::onMessage(int size)
+{
+  static char payload[MQTT_MAX_INCOMING + 1];
+  String topic = mqttClient.messageTopic();
+  int length = 0;
+  while (mqttClient.available())
+  {
+    int c = mqttClient.read();
+    if (length < MQTT_MAX_INCOMING)
+    {
+      payload[length++] = (char)c;
+    }
+  }
+  payload[length] = '\0';
+  if (size > MQTT_MAX_INCOMING)
+  {
+    Serial.printf("[MQTT] Dropped %s (%d bytes)\n", topic.c_str(), size);
+    return;
+  }
+  Serial.printf("[MQTT] Received %s (%d bytes)\n", topic.c_str(), size);
+  if (messageCallback)
+  {
+    messageCallback(topic.c_str(), payload);
+  }
+}
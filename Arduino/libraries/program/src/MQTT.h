@@ -16,6 +16,10 @@
 #define MQTT_USER "marzuk"
 #define MQTT_PASSWORD "lalaland"
 #define MQTT_CONNECT_INTERVAL 5000
+#define MQTT_MAX_INCOMING 512 // larger messages are dropped
+
+// Receives the topic and the NUL terminated payload of a message on a subscribed topic
+typedef void (*MessageCallback)(const char *topic, const char *payload);
 
 // To connect with SSL/TLS:
 // 1) Change WiFiClient to WiFiSSLClient.
@@ -33,6 +37,10 @@ private:
   static MqttClient mqttClient;
   static const char *brokerIp;
   static bool connected;
+  static uint32_t sequence;
+  static MessageCallback messageCallback;
+
+  static void onMessage(int size);
 
 public:
   static void setup(const char *_brokerIp);
@@ -44,6 +52,17 @@ public:
   static void send(const char *topic, const char *message);
 
   static void send(const char *topic, int message);
+
+  static void send(const char *topic, const uint8_t *payload, size_t length);
+
+  static uint32_t nextSequence();
+
+  // Retained messages, e.g. the station config, are delivered right after subscribing.
+  // All subscriptions share one callback: the last one given; it gets the topic
+  static void subscribe(const char *topic, MessageCallback callback);
+
+  // Keeps the connection alive and delivers incoming messages. Called from Program::loop()
+  static void poll();
 };
 
 #endif
\ No newline at end of file
@@ -4,6 +4,9 @@
 #include "Blinker.h"
 #include "MQTT.h"
 
+static const char *heartbeatTopic = NULL;
+static Elapsed timeToHeartbeat = Elapsed(HEARTBEAT_INTERVAL);
+
 void Program::setup()
 {
 
@@ -40,5 +43,18 @@ void Program::setup()
 void Program::loop()
 {
   Blinker::loop();
+  Mqtt::poll();
+  if (heartbeatTopic && timeToHeartbeat && Mqtt::isConnected())
+  {
+    char message[32];
+    snprintf(message, sizeof(message), "{\"seq\":%lu}", (unsigned long)Mqtt::nextSequence());
+    Mqtt::send(heartbeatTopic, message);
+  }
   delay(1); // allow events on 8266
 }
+
+void Program::heartbeat(const char *topic, unsigned long interval)
+{
+  heartbeatTopic = topic;
+  timeToHeartbeat.reset(interval);
+}
@@ -43,12 +43,18 @@
     }                                             \
   }
 
+#define HEARTBEAT_INTERVAL 10000 // shorter than any station's heartbeat_interval_seconds on the server
+
 class Program
 {
 public:
   static void setup();
 
   static void loop();
+
+  // Publishes {"seq":n} on topic every interval from loop(), so the server sees a
+  // station that has nothing to report (e.g. calibrated and idle) as alive
+  static void heartbeat(const char *topic, unsigned long interval = HEARTBEAT_INTERVAL);
 };
 
 #endif
\ No newline at end of file
@@ -1,6 +1,8 @@
 #ifndef ER_READING
 #define ER_READING
 
+#include "Arduino.h"
+
 template <typename T>
 class Reading
 {
@@ -45,4 +47,155 @@ class IntReading : public Reading<int>
 {
 };
 
+/* Reading that reports threshold crossings only
+  The server computes the thresholds and a deadband from a baseline window and pushes
+  them on the station config topic (see Calibration.h and server/src/calibration.py).
+  The thresholds split the sensor range into bands; a reading is reported when it
+  moves to another band.
+
+  Notes:
+  - entering a band is reported at once, so the server sees a crossing as it happens
+  - going back over the threshold just crossed needs the reading to clear it by the
+    deadband, so noise around a threshold doesn't chatter
+  - a reading equal to a threshold belongs to the band below it (rules compare with <=)
+  - until calibrated, changes of at least fallbackStep from the last reported value
+    are reported
+  - while streaming, every reading is reported: the server asks for it while it
+    collects a baseline (see Calibration.h), so it gets enough samples even from
+    a steady sensor, calibrated or not. Streaming stops after the requested
+    duration even if the server never says so
+*/
+
+#define READING_MAX_THRESHOLDS 4
+
+template <typename T>
+class ThresholdReading : public Reading<T>
+{
+private:
+  float thresholds[READING_MAX_THRESHOLDS];
+  int thresholdCount;
+  float deadband;
+  float fallbackStep;
+  bool calibrated;
+  unsigned long streamStart;
+  unsigned long streamDuration; // 0 when not streaming
+  int currentBand;
+  int lastEdge; // index of the threshold crossed last, -1 if none
+  bool hasReported;
+  T lastReported;
+
+  int bandOf(float value) const
+  {
+    int band = 0;
+    while (band < thresholdCount && value > thresholds[band])
+    {
+      band++;
+    }
+    return band;
+  }
+
+  void restartReporting()
+  {
+    currentBand = -1;
+    lastEdge = -1;
+    hasReported = false;
+  }
+
+  void report(T value)
+  {
+    lastReported = value;
+    hasReported = true;
+    Reading<T>::update(value);
+  }
+
+public:
+  ThresholdReading(float _fallbackStep = 1)
+      : thresholdCount(0), deadband(0), fallbackStep(_fallbackStep), calibrated(false), streamStart(0), streamDuration(0),
+        currentBand(-1), lastEdge(-1), hasReported(false) {}
+
+  // Replaces the thresholds (sorted ascending). The next reading is reported.
+  bool calibrate(const float *_thresholds, int count, float _deadband)
+  {
+    if (count < 1 || count > READING_MAX_THRESHOLDS)
+    {
+      return false;
+    }
+    for (int i = 0; i < count; i++)
+    {
+      thresholds[i] = _thresholds[i];
+    }
+    thresholdCount = count;
+    deadband = _deadband;
+    calibrated = true;
+    currentBand = -1;
+    lastEdge = -1;
+    return true;
+  }
+
+  bool isCalibrated() const
+  {
+    return calibrated;
+  }
+
+  // Reports every reading for durationMs; 0 stops. The first reading after streaming is reported.
+  void stream(unsigned long durationMs)
+  {
+    streamStart = millis();
+    streamDuration = durationMs;
+    restartReporting();
+  }
+
+  bool isStreaming() const
+  {
+    return streamDuration > 0 && millis() - streamStart < streamDuration;
+  }
+
+  // Band of the last reported reading, -1 before calibration
+  int band() const
+  {
+    return currentBand;
+  }
+
+  void update(T newValue)
+  {
+    float value = (float)newValue;
+    if (streamDuration > 0)
+    {
+      if (isStreaming())
+      {
+        report(newValue);
+        return;
+      }
+      streamDuration = 0; // Timed out
+      restartReporting();
+    }
+    if (!calibrated)
+    {
+      if (!hasReported || fabs(value - (float)lastReported) >= fallbackStep)
+      {
+        report(newValue);
+      }
+      return;
+    }
+
+    int newBand = bandOf(value);
+    if (newBand == currentBand)
+    {
+      return;
+    }
+    if (currentBand >= 0)
+    {
+      // The first threshold crossed on the way out of the current band
+      int edge = newBand > currentBand ? currentBand : currentBand - 1;
+      if (edge == lastEdge && fabs(value - thresholds[edge]) < deadband)
+      {
+        return;
+      }
+      lastEdge = newBand > currentBand ? newBand - 1 : newBand;
+    }
+    currentBand = newBand;
+    report(newValue);
+  }
+};
+
 #endif
\ No newline at end of file
@@ -26,7 +26,7 @@ const char* beaconAddress = "7d:63:9b:45:86:76";  //Address changes!
 const char* beaconService = "febe";
 
 
-class BeaconProximity : public Reading<int> {
+class BeaconProximity : public ThresholdReading<int> {
   BLEDevice* beacon = NULL;
   Elapsed timeToScan = Elapsed(BLE_SCAN_INTERVAL);
   bool connected = false;
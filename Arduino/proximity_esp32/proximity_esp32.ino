@@ -1,23 +1,47 @@
 #include <Program.h>
 #include "BeaconProximity.h"
+#include <Calibration.h>
 #include <MQTT.h>
 
+#define STATION_ID "station_5"
+#define SENSOR_ID "beacon_proximity_1"
 
-
+// Reports threshold crossings once calibrated from the server, every range change until then,
+// and every range while the server collects a baseline
 BeaconProximity proximity = BeaconProximity();
 
+void onServerMessage(const char *topic, const char *payload) {
+  if (strcmp(topic, STATION_BASELINE_TOPIC(STATION_ID)) == 0) {
+    proximity.stream(baselineMillis(payload));
+    Serial.println(proximity.isStreaming() ? "Streaming a baseline" : "Baseline done");
+    return;
+  }
+  if (applyCalibration(payload, SENSOR_ID, proximity)) {
+    Serial.println("Calibrated");
+  } else {
+    Serial.println("No calibration for " SENSOR_ID);
+  }
+}
+
 void setup() {
   Program::setup();
 
   // ------------------ init BLE
   LOOP_EVERY(proximity.begin(), , 2000)
 
+  Mqtt::subscribe(STATION_CONFIG_TOPIC(STATION_ID), onServerMessage);
+  Mqtt::subscribe(STATION_BASELINE_TOPIC(STATION_ID), onServerMessage);
+  Program::heartbeat(STATION_HEARTBEAT_TOPIC(STATION_ID)); // Calibrated, it is silent while nobody comes near
   Serial.println("Setup done!");
 }
 void loop() {
   Program::loop();
   proximity.loop();
   if (proximity.available()) {
-    Mqtt::send("mp/01", proximity.get());
+    char message[112];
+    int range = proximity.get();
+    snprintf(message, sizeof(message), "{\"sensor\":\"" SENSOR_ID "\",\"range\":%d,\"band\":%d,\"seq\":%lu}",
+             range, proximity.band(), (unsigned long)Mqtt::nextSequence());
+    Mqtt::send(STATION_EVENT_TOPIC(STATION_ID, "beacon_proximity"), message);
   }
 }
@@ -0,0 +1,239 @@
+"""
+Inbound message rate of the laser and BLE stations before and after calibration.
+
+The stations are simulated at their real sampling rates (laser every 10 ms, BLE every
+500 ms) against a noisy ambient signal with a player interaction every few seconds,
+with the sensor settings of config.json.
+
+- before: the firmware before calibration existed; the laser sends every change of
+  its 16 buckets, the BLE station every range it measures.
+- after: the station is calibrated the way the server does it. A CalibrationManager
+  publishes `collect_baseline` on the station baseline topic, the simulated station
+  streams every raw reading, the manager collects them with `observe` and publishes
+  the thresholds on the station config topic when the window closes. From then on
+  the station reports threshold crossings only, with the logic of ThresholdReading
+  (Arduino/libraries/program/src/Reading.h), ported below.
+
+Rates are measured with the server's StationRateMeter on a simulated clock; the after
+rate covers the run once calibrated. Heartbeats (one per station every 10 s) are
+not counted, as on the server.
+
+Run from the server directory:
+    python -m benchmarks.bench_calibration_rate
+"""
+import heapq
+import json
+import math
+import random
+
+from src.calibration import (
+    CalibrationManager, StationRateMeter, BASELINE_FLAG,
+    DEFAULT_WINDOW_SECONDS, DEFAULT_MIN_SAMPLES, DEFAULT_RATE_WINDOW_SECONDS
+)
+from src.config_loader import load_config
+from src.topics import station_config_topic, station_baseline_topic
+
+CONFIG = load_config()
+DURATION_SECONDS = 120
+BASELINE_SECONDS = CONFIG.get("calibration", {}).get("window_seconds", DEFAULT_WINDOW_SECONDS)
+MIN_SAMPLES = CONFIG.get("calibration", {}).get("min_samples", DEFAULT_MIN_SAMPLES)
+
+LASER_INTERVAL = 0.01
+LASER_SCAN_MIN, LASER_SCAN_MAX, LASER_BUCKETS = 600, 1024, 16
+LASER_BUCKET = (LASER_SCAN_MAX - LASER_SCAN_MIN) // LASER_BUCKETS
+
+BLE_INTERVAL = 0.5
+
+
+class ThresholdReading:
+    """Python port of ThresholdReading<T>: reports band changes, with hysteresis on the threshold just crossed."""
+
+    def __init__(self, fallback_step=1):
+        self.fallback_step = fallback_step
+        self.thresholds = None
+        self.deadband = 0
+        self.stream_until = None
+        self.band = -1
+        self.last_edge = -1
+        self.last_reported = None
+
+    def stream(self, until):
+        """Reports every reading until `until` (simulated seconds), or stops if None."""
+        self.stream_until = until
+        self.band = self.last_edge = -1
+        self.last_reported = None
+
+    def calibrate(self, thresholds, deadband):
+        self.thresholds = thresholds
+        self.deadband = deadband
+        self.band = self.last_edge = -1
+
+    def update(self, value, now):
+        """Returns True if the reading is reported."""
+        if self.stream_until is not None:
+            if now < self.stream_until:
+                return True
+            self.stream(None) # Timed out
+        if self.thresholds is None:
+            if self.last_reported is None or abs(value - self.last_reported) >= self.fallback_step:
+                self.last_reported = value
+                return True
+            return False
+        band = sum(1 for threshold in self.thresholds if value > threshold)
+        if band == self.band:
+            return False
+        if self.band >= 0:
+            edge = self.band if band > self.band else self.band - 1
+            if edge == self.last_edge and abs(value - self.thresholds[edge]) < self.deadband:
+                return False
+            self.last_edge = band - 1 if band > self.band else band
+        self.band = band
+        return True
+
+
+class SimulatedStation:
+    """A station receiving what the manager publishes (onServerMessage in the sketches)."""
+
+    def __init__(self, station_id, sensor_id, reading):
+        self.station_id = station_id
+        self.sensor_id = sensor_id
+        self.reading = reading
+        self.calibration = None
+        self.clock = lambda: 0.0
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        message = json.loads(payload)
+        if topic == station_baseline_topic(self.station_id):
+            collect = message.get(BASELINE_FLAG) and message.get("seconds", 0) > 0
+            self.reading.stream(self.clock() + message["seconds"] if collect else None)
+            return
+        assert topic == station_config_topic(self.station_id)
+        sensor = message.get("sensors", {}).get(self.sensor_id)
+        if sensor is not None:
+            self.calibration = sensor
+            self.reading.calibrate(sensor["thresholds"], sensor["deadband"])
+
+
+class _SimulatedTimer:
+    __slots__ = ('cancelled',)
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SimulatedScheduler:
+    """Runs the manager's timers on the simulated clock."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._timers = []
+
+    def schedule(self, delay_seconds, callback, *args, name=None):
+        timer = _SimulatedTimer()
+        heapq.heappush(self._timers, (self._clock() + delay_seconds, len(self._timers), timer, callback, args))
+        return timer
+
+    def run_due(self):
+        while self._timers and self._timers[0][0] <= self._clock():
+            _, _, timer, callback, args = heapq.heappop(self._timers)
+            if not timer.cancelled:
+                callback(*args)
+
+
+def laser_signal(t, rng):
+    """ADC reading: ambient light drifting around 700, the beam broken for a second every 15 s after the baseline."""
+    if t >= BASELINE_SECONDS and (t - BASELINE_SECONDS) % 15 < 1:
+        return rng.gauss(450, 6)
+    return 700 + 10 * math.sin(2 * math.pi * t / 60) + rng.gauss(0, 6)
+
+
+def beacon_signal(t, rng):
+    """Range (-RSSI): a player walks up to the beacon for 3 s every 20 s after the baseline."""
+    if t >= BASELINE_SECONDS and (t - BASELINE_SECONDS) % 20 < 3:
+        return max(1, round(rng.gauss(3, 1)))
+    return round(rng.gauss(60, 4))
+
+
+def simulate(interval, signal, report, rng):
+    """Feeds the readings of the whole run to `report` at `interval`."""
+    for step in range(int(DURATION_SECONDS / interval)):
+        t = step * interval
+        report(t, signal(t, rng))
+
+
+def measure_before(station_id, interval, signal, before_filter, seed):
+    clock = [0.0]
+    rates = StationRateMeter(window_seconds=DURATION_SECONDS, clock=lambda: clock[0])
+
+    def report(t, value):
+        clock[0] = t
+        if before_filter(value):
+            rates.count(station_id)
+
+    simulate(interval, signal, report, random.Random(seed))
+    clock[0] = DURATION_SECONDS
+    return rates.rate(station_id)
+
+
+def measure_calibrated(station, event_type, field, interval, signal, seed):
+    """Calibrates the station through the server's CalibrationManager at the start of the run."""
+    clock = [0.0]
+    rates = StationRateMeter(window_seconds=DURATION_SECONDS, clock=lambda: clock[0])
+    scheduler = SimulatedScheduler(lambda: clock[0])
+    station.clock = lambda: clock[0]
+    manager = CalibrationManager(scheduler, rates, window_seconds=BASELINE_SECONDS,
+                                 rate_window_seconds=DEFAULT_RATE_WINDOW_SECONDS, min_samples=MIN_SAMPLES)
+    manager.start(station, CONFIG, [station.station_id])
+    collected = [0]
+
+    def report(t, value):
+        clock[0] = t
+        scheduler.run_due()
+        if station.reading.update(value, t):
+            rates.count(station.station_id)
+            if manager.collecting_from(station.station_id):
+                collected[0] += 1
+                manager.observe(station.station_id, event_type, {"sensor": station.sensor_id, field: value})
+
+    simulate(interval, signal, report, random.Random(seed))
+    clock[0] = DURATION_SECONDS
+    return rates.rate(station.station_id, DURATION_SECONDS - BASELINE_SECONDS), collected[0]
+
+
+def bucket_changes():
+    last = [None]
+
+    def update(value):
+        bucket = (int(value) - LASER_SCAN_MIN) // LASER_BUCKET
+        changed = bucket != last[0]
+        last[0] = bucket
+        return changed
+    return update
+
+
+def every_reading():
+    return lambda value: True
+
+
+def main():
+    print(f"{DURATION_SECONDS}s per run, {BASELINE_SECONDS:g}s baseline streamed on request")
+    print(f"{'station':<14} {'before msg/s':>12} {'after msg/s':>12} {'reduction':>10} {'baseline':>9}  thresholds / deadband")
+    for station_id, sensor_id, event_type, field, interval, signal, before_filter, fallback_step in (
+        ("station_laser", "laser_1", "laser", "value", LASER_INTERVAL, laser_signal, bucket_changes, LASER_BUCKET),
+        ("station_5", "beacon_proximity_1", "beacon_proximity", "range", BLE_INTERVAL, beacon_signal, every_reading, 1),
+    ):
+        before = measure_before(station_id, interval, signal, before_filter(), seed=1)
+        station = SimulatedStation(station_id, sensor_id, ThresholdReading(fallback_step))
+        after, collected = measure_calibrated(station, event_type, field, interval, signal, seed=1)
+        if station.calibration is None:
+            print(f"{station_id:<14} {before:>12.2f}  not calibrated: {collected} baseline readings, {MIN_SAMPLES} needed")
+            continue
+        print(f"{station_id:<14} {before:>12.2f} {after:>12.2f} {before / after:>9.1f}x {collected:>9}  "
+              f"{station.calibration['thresholds']} / {station.calibration['deadband']}")
+
+
+if __name__ == "__main__":
+    main()
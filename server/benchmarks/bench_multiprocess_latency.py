@@ -0,0 +1,250 @@
+"""
+End-to-end latency of station events, single-process vs multi-process runtime.
+
+A feeder process sends station readings over a pipe (standing in for the broker) at
+a fixed rate; every CUE_EVERY-th reading triggers a cue. Latency is measured from the
+moment a reading is sent to the moment the station handler has evaluated it.
+
+- single: one process, as `python -m src.server` runs. A thread reads and dispatches
+  like paho's network thread; each cue is decoded and mixed on its own thread, in the
+  same interpreter.
+- multi: the layout of `multiprocess_runtime`: an ingest process copies readings into
+  the ingest ring, the rule process dispatches them and forwards cues over the cue
+  ring to the audio process, which decodes and mixes them.
+
+Each layout runs idle (no cues) and under mixed load (cues).
+
+Run from the server directory:
+    python -m benchmarks.bench_multiprocess_latency
+"""
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import struct
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+from src.shm_ring import ShmRing
+from src.server_state import ServerState
+from src.station_handler import StationEventHandler
+from src.audio_utils import forward_audio
+from src.audio_engine import AudioEngine, decode_wav
+from src.constants import SESSION_STATE_RUNNING
+from src.multiprocess_runtime import (
+    Supervisor, RingWriter, CueForwarder, worker_should_run,
+    pack_ingest_record, unpack_ingest_record, unpack_cue_record,
+    RECORD_MESSAGE, CUE_PLAY, CUE_RECORD_BYTES, DEFAULT_INGEST_RECORD_BYTES, RING_POLL_SECONDS
+)
+
+RATE_PER_SECOND = 400
+DURATION_SECONDS = 4.0
+CUE_EVERY = 40 # 10 cues per second at the default rate
+CUE_SECONDS = 3.0
+CUE_FILE_NAME = "cue.wav"
+
+TOPIC = "escaperoom/station/station_5/event/beacon_proximity"
+FRAME = struct.Struct('<d') # Send time, prepended to the payload on the pipe
+CONFIG = {
+    "station_configs": {
+        "station_5": {
+            "beacon_proximity_1": {"event_type": "beacon_proximity", "range_threshold": 5, "sound_on_trigger": CUE_FILE_NAME}
+        }
+    }
+}
+
+
+def _write_cue(path):
+    """A 22.05 kHz mono cue, so playing it means resampling and upmixing like a real file."""
+    rate = 22050
+    t = np.arange(int(rate * CUE_SECONDS)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 0.5 * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+
+
+class _NullSink:
+    def write(self, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+def play_cue(path):
+    """Decodes a cue and mixes all of it: the audio work one cue costs."""
+    engine = AudioEngine(_NullSink())
+    engine.play(decode_wav(path, engine.sample_rate, engine.channels))
+    engine.render(int(CUE_SECONDS * engine.sample_rate / engine.frame_size))
+
+
+class _Rules:
+    """The rule evaluation of one reading: decode, then the station handler."""
+
+    def __init__(self):
+        self.handler = StationEventHandler()
+        self.state = ServerState(session_state=SESSION_STATE_RUNNING, station_status={}, config=CONFIG,
+                                 logger=logging, station_liveness={})
+        self.latencies = []
+
+    def apply(self, sent_at, topic, payload):
+        reading = json.loads(payload)
+        if self.handler.can_handle(topic, reading, self.state):
+            self.handler.handle(topic, reading, None, self.state) # State kept as is: every trigger cues again
+        self.latencies.append(time.monotonic() - sent_at)
+
+
+def feed(connection, cues):
+    """Sends the readings at RATE_PER_SECOND, then an empty frame. Runs in the feeder process."""
+    count = int(RATE_PER_SECOND * DURATION_SECONDS)
+    start = time.monotonic()
+    for i in range(count):
+        due = start + i / RATE_PER_SECOND
+        while time.monotonic() < due:
+            time.sleep(max(0.0, due - time.monotonic()))
+        near = cues and i % CUE_EVERY == 0
+        payload = json.dumps({"sensor": "beacon_proximity_1", "range": 2 if near else 40, "seq": i}).encode()
+        connection.send_bytes(FRAME.pack(time.monotonic()) + payload)
+    connection.send_bytes(b'')
+
+
+class _LocalCues:
+    """Plays cues on threads of the calling process, as audio_utils does in the single-process server."""
+
+    def __init__(self, audio_dir):
+        self.audio_dir = audio_dir
+
+    def play_cue(self, sound_file_name, gain):
+        threading.Thread(target=play_cue, args=(os.path.join(self.audio_dir, sound_file_name),), daemon=True).start()
+
+    def set_music(self, playing):
+        pass
+
+
+def run_single(connection, results, audio_dir):
+    """The single-process layout. Runs in its own process."""
+    forward_audio(_LocalCues(audio_dir))
+    rules = _Rules()
+
+    def network_thread():
+        while True:
+            frame = connection.recv_bytes()
+            if not frame:
+                return
+            (sent_at,) = FRAME.unpack_from(frame)
+            rules.apply(sent_at, TOPIC, frame[FRAME.size:])
+
+    thread = threading.Thread(target=network_thread)
+    thread.start()
+    thread.join()
+    results.send(rules.latencies)
+
+
+def run_ingest(connection, ingest_ring, stop_event):
+    """Ingest process of the multi-process layout."""
+    writer = RingWriter(ShmRing.attach(*ingest_ring), "rule process")
+    while True:
+        frame = connection.recv_bytes()
+        if not frame:
+            break
+        (sent_at,) = FRAME.unpack_from(frame)
+        writer.put(pack_ingest_record(RECORD_MESSAGE, sent_at, TOPIC, frame[FRAME.size:]))
+    writer.put(pack_ingest_record(RECORD_MESSAGE, 0.0)) # End marker
+    writer.ring.close()
+
+
+def run_rules(ingest_ring, cue_ring, results, stop_event):
+    """Rule process of the multi-process layout."""
+    ingest = ShmRing.attach(*ingest_ring)
+    forward_audio(CueForwarder(RingWriter(ShmRing.attach(*cue_ring), "audio process")))
+    rules = _Rules()
+    while worker_should_run(stop_event):
+        record = ingest.get(timeout=RING_POLL_SECONDS)
+        if record is None:
+            continue
+        _, _, sent_at, topic, payload = unpack_ingest_record(record)
+        if not topic:
+            break
+        rules.apply(sent_at, topic, payload)
+    results.send(rules.latencies)
+    ingest.close()
+
+
+def run_audio(cue_ring, audio_dir, stop_event):
+    """Audio process of the multi-process layout."""
+    ring = ShmRing.attach(*cue_ring)
+    while worker_should_run(stop_event):
+        record = ring.get(timeout=RING_POLL_SECONDS)
+        if record is not None:
+            kind, _, sound_file_name, _ = unpack_cue_record(record)
+            if kind == CUE_PLAY:
+                play_cue(os.path.join(audio_dir, sound_file_name))
+    ring.close()
+
+
+def _measure_single(context, audio_dir, cues):
+    feeder_end, server_end = context.Pipe(duplex=False)
+    results_end, results_sender = context.Pipe(duplex=False)
+    server = context.Process(target=run_single, args=(feeder_end, results_sender, audio_dir))
+    feeder = context.Process(target=feed, args=(server_end, cues))
+    server.start()
+    feeder.start()
+    latencies = results_end.recv()
+    feeder.join()
+    server.join()
+    return latencies
+
+
+def _measure_multi(context, audio_dir, cues):
+    ingest = ShmRing.create(4096, DEFAULT_INGEST_RECORD_BYTES, context.Semaphore(0))
+    cue = ShmRing.create(256, CUE_RECORD_BYTES, context.Semaphore(0))
+    ingest_handle, cue_handle = (ingest.name, ingest.doorbell), (cue.name, cue.doorbell)
+    feeder_end, ingest_end = context.Pipe(duplex=False)
+    results_end, results_sender = context.Pipe(duplex=False)
+    supervisor = Supervisor(context, context.Event())
+    supervisor.add('audio', run_audio, (cue_handle, audio_dir, supervisor.stop_event))
+    supervisor.add('rules', run_rules, (ingest_handle, cue_handle, results_sender, supervisor.stop_event))
+    supervisor.add('ingest', run_ingest, (feeder_end, ingest_handle, supervisor.stop_event))
+    supervisor.start()
+    time.sleep(1.0) # Let the workers import before the clock starts
+    feeder = context.Process(target=feed, args=(ingest_end, cues))
+    feeder.start()
+    latencies = results_end.recv()
+    feeder.join()
+    supervisor.stop()
+    ingest.close()
+    cue.close()
+    return latencies
+
+
+def _summary(latencies):
+    values = sorted(latencies)
+    percentile = lambda p: values[min(len(values) - 1, int(p * len(values)))] * 1e3
+    return f"{len(values):>6} {statistics.median(values) * 1e3:>8.2f} {percentile(0.99):>8.2f} {values[-1] * 1e3:>8.2f}"
+
+
+def main():
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as audio_dir:
+        _write_cue(os.path.join(audio_dir, CUE_FILE_NAME))
+        start = time.perf_counter()
+        play_cue(os.path.join(audio_dir, CUE_FILE_NAME))
+        print(f"one cue: {(time.perf_counter() - start) * 1e3:.1f} ms of audio work; "
+              f"{RATE_PER_SECOND} readings/s for {DURATION_SECONDS:.0f}s, "
+              f"{RATE_PER_SECOND / CUE_EVERY:.0f} cues/s under load")
+        print(f"{'layout':<8} {'load':<6} {'msgs':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for load, cues in (("idle", False), ("mixed", True)):
+            for layout, measure in (("single", _measure_single), ("multi", _measure_multi)):
+                print(f"{layout:<8} {load:<6} {_summary(measure(context, audio_dir, cues))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Decode cost per message for JSON vs binary station payloads.
+
+Run from the server directory:
+    python -m benchmarks.bench_payload_decode
+"""
+import json
+import timeit
+
+from src.binary_payload import encode_binary_payload, decode_binary_payload
+
+ITERATIONS = 200_000
+
+SAMPLES = {
+    "beacon_proximity": {"sensor": "beacon_proximity_1", "range": 3},
+    "door_status": {"sensor": "main_door_switch", "status": "OPEN"},
+    "laser": {"sensor": "laser_1", "value": 12},
+}
+
+
+def _decode_json(raw: bytes):
+    return json.loads(raw.decode("utf-8"))
+
+
+def main():
+    print(f"{'event type':<18} {'format':<7} {'bytes':>6} {'us/msg':>8}")
+    for seq, (event_type, fields) in enumerate(SAMPLES.items()):
+        json_raw = json.dumps(dict(fields, seq=seq)).encode("utf-8")
+        binary_raw = encode_binary_payload(event_type, 5, seq, fields)
+        for name, func, raw in (("json", _decode_json, json_raw), ("binary", decode_binary_payload, binary_raw)):
+            seconds = min(timeit.repeat(lambda: func(raw), number=ITERATIONS, repeat=3))
+            print(f"{event_type:<18} {name:<7} {len(raw):>6} {seconds / ITERATIONS * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
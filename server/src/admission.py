@@ -0,0 +1,230 @@
+import json
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional
+
+from .constants import MQTT_TOPIC_SERVER_ALERTS
+from .topics import TopicDescriptor
+
+DEFAULT_TOPIC_RATE = 20.0 # Messages per second a single station topic may sustain
+DEFAULT_TOPIC_BURST = 40.0
+DEFAULT_STATION_RATE = 50.0 # Messages per second across all topics of a station
+DEFAULT_STATION_BURST = 100.0
+# A topic that stays over its budget this long is quarantined
+DEFAULT_SUSTAINED_SECONDS = 3.0
+DEFAULT_QUARANTINE_SECONDS = 30.0
+
+ALERT_TOPIC_QUARANTINED = "topic_quarantined"
+ALERT_TOPIC_RELEASED = "topic_released"
+
+
+class TokenBucket:
+    """
+    Token bucket refilled lazily on each `take`: `rate` tokens per second, at most
+    `burst` banked.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.updated = now
+        if tokens >= 1.0:
+            self.tokens = min(tokens, self.burst) - 1.0
+            return True
+        self.tokens = tokens
+        return False
+
+
+class _TopicBudget:
+    __slots__ = ('bucket', 'station_id', 'over_since', 'last_rejected', 'rejected')
+
+    def __init__(self, bucket: TokenBucket, station_id: str):
+        self.bucket = bucket
+        self.station_id = station_id
+        self.over_since: Optional[float] = None # Start of the current stretch over budget
+        self.last_rejected = 0.0
+        self.rejected = 0 # Rejections in the current stretch
+
+
+class AdmissionController:
+    """
+    Rate limits station topics before their messages are decoded and dispatched.
+
+    Every station topic has a token bucket, and so does every station (shared by all
+    its topics); a message needs a token from both. A topic that keeps exceeding its
+    budget for `sustained_seconds` is quarantined for `quarantine_seconds`: all of its
+    messages are rejected with one dictionary lookup, and `on_alert(client, alert)`
+    is called when the quarantine starts and when it ends. With a `scheduler` the
+    quarantine ends on time even if the topic went quiet; without one, it ends with
+    the topic's first message after `quarantine_seconds`. The server control topic
+    and non-station topics are never limited.
+
+    Args:
+        topic_rate (float): Sustained messages per second per topic.
+        topic_burst (float): Messages a topic may send at once after being quiet.
+        station_rate (float): Sustained messages per second per station.
+        station_burst (float): Burst of a station.
+        sustained_seconds (float): Time over budget before a topic is quarantined.
+        quarantine_seconds (float): Duration of a quarantine.
+        topic_limits (Dict[str, Dict[str, float]]): Per-topic `rate_per_second` and `burst` overrides.
+        on_alert (Callable[[Any, Dict[str, Any]], None]): Receives the client and each alert.
+        scheduler (TimerScheduler): Ends quarantines when they expire.
+        lock: Lock serializing message dispatch, held by the scheduler's timer while it
+                    ends a quarantine, since `admit` runs under it.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+
+    Attributes:
+        rejected (int): Messages rejected since start.
+    """
+
+    def __init__(self, topic_rate: float = DEFAULT_TOPIC_RATE, topic_burst: float = DEFAULT_TOPIC_BURST,
+                 station_rate: float = DEFAULT_STATION_RATE, station_burst: float = DEFAULT_STATION_BURST,
+                 sustained_seconds: float = DEFAULT_SUSTAINED_SECONDS,
+                 quarantine_seconds: float = DEFAULT_QUARANTINE_SECONDS,
+                 topic_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 on_alert: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+                 scheduler=None, lock=None, clock: Callable[[], float] = time.monotonic):
+        self.topic_rate = topic_rate
+        self.topic_burst = topic_burst
+        self.station_rate = station_rate
+        self.station_burst = station_burst
+        self.sustained_seconds = sustained_seconds
+        self.quarantine_seconds = quarantine_seconds
+        self._topic_limits = topic_limits or {}
+        self._on_alert = on_alert
+        self._scheduler = scheduler
+        self._lock = lock if lock is not None else nullcontext()
+        self._clock = clock
+        self._topics: Dict[str, _TopicBudget] = {}
+        self._stations: Dict[str, TokenBucket] = {}
+        self._quarantined: Dict[str, float] = {} # topic -> monotonic time the quarantine ends
+        self._expiry_timers: Dict[str, Any] = {} # topic -> scheduler timer ending its quarantine
+        self.rejected = 0
+
+    @property
+    def quarantined_topics(self):
+        return list(self._quarantined)
+
+    def admit(self, descriptor: TopicDescriptor, client=None) -> bool:
+        """
+        Decides whether a message may be dispatched. Called for every message, under the dispatch lock.
+
+        Args:
+            descriptor (TopicDescriptor): The message's parsed topic.
+            client: Passed on to `on_alert`.
+
+        Returns:
+            bool: False if the message is to be dropped.
+        """
+        station_id = descriptor.station_id
+        if station_id is None or descriptor.is_control:
+            return True
+        topic = descriptor.topic
+        now = self._clock()
+        until = self._quarantined.get(topic)
+        if until is not None:
+            if now < until:
+                self.rejected += 1
+                return False # The runaway case: one lookup, nothing else
+            self._release(topic, client)
+
+        budget = self._topics.get(topic)
+        if budget is None:
+            limits = self._topic_limits.get(topic, {})
+            budget = self._topics[topic] = _TopicBudget(
+                TokenBucket(limits.get('rate_per_second', self.topic_rate), limits.get('burst', self.topic_burst), now),
+                station_id)
+        station_bucket = self._stations.get(station_id)
+        if station_bucket is None:
+            station_bucket = self._stations[station_id] = TokenBucket(self.station_rate, self.station_burst, now)
+
+        if budget.bucket.take(now):
+            if station_bucket.take(now):
+                return True
+            budget.bucket.tokens += 1.0 # Not this topic's fault: give its token back
+            self.rejected += 1
+            logging.debug("Rejecting message on %s: station %s over its budget", topic, station_id)
+            return False
+
+        self.rejected += 1
+        # Rejections less than `sustained_seconds` apart belong to the same stretch over budget
+        if budget.over_since is None or now - budget.last_rejected > self.sustained_seconds:
+            budget.over_since = now
+            budget.rejected = 0
+        budget.last_rejected = now
+        budget.rejected += 1
+        logging.debug("Rejecting message on %s: topic over its budget", topic)
+        if now - budget.over_since >= self.sustained_seconds:
+            self._quarantine(topic, budget, now, client)
+        return False
+
+    def clear(self) -> None:
+        for timer in self._expiry_timers.values():
+            timer.cancel()
+        self._expiry_timers.clear()
+        self._topics.clear()
+        self._stations.clear()
+        self._quarantined.clear()
+        self.rejected = 0
+
+    # --- Internals ---
+
+    def _quarantine(self, topic: str, budget: _TopicBudget, now: float, client) -> None:
+        self._quarantined[topic] = now + self.quarantine_seconds
+        if self._scheduler is not None:
+            self._expiry_timers[topic] = self._scheduler.schedule(
+                self.quarantine_seconds, self._expire, topic, client, name=f"quarantine_{topic}")
+        observed_rate = budget.bucket.rate + budget.rejected / max(now - budget.over_since, 1e-9)
+        logging.warning(f"Quarantining topic {topic} for {self.quarantine_seconds:.0f}s: about {observed_rate:.0f} msg/s "
+                        f"for {now - budget.over_since:.1f}s, budget {budget.bucket.rate:g} msg/s")
+        self._alert(client, {
+            'alert': ALERT_TOPIC_QUARANTINED,
+            'topic': topic,
+            'station_id': budget.station_id,
+            'observed_rate_per_second': round(observed_rate, 1),
+            'limit_rate_per_second': budget.bucket.rate,
+            'quarantine_seconds': self.quarantine_seconds,
+        })
+        budget.over_since = None
+
+    def _expire(self, topic: str, client) -> None:
+        # Runs on the scheduler thread
+        with self._lock:
+            self._expiry_timers.pop(topic, None)
+            if topic in self._quarantined:
+                self._release(topic, client)
+
+    def _release(self, topic: str, client) -> None:
+        del self._quarantined[topic]
+        timer = self._expiry_timers.pop(topic, None)
+        if timer is not None:
+            timer.cancel() # Released lazily, a moment before the timer was due
+        budget = self._topics[topic]
+        budget.bucket.tokens = budget.bucket.burst
+        budget.bucket.updated = self._clock()
+        logging.info(f"Releasing topic {topic} from quarantine")
+        self._alert(client, {'alert': ALERT_TOPIC_RELEASED, 'topic': topic, 'station_id': budget.station_id})
+
+    def _alert(self, client, alert: Dict[str, Any]) -> None:
+        if self._on_alert is not None:
+            try:
+                self._on_alert(client, alert)
+            except Exception as e:
+                logging.error(f"Error raising admission alert {alert['alert']}: {e}")
+
+
+def publish_alert(client, alert: Dict[str, Any]) -> None:
+    """Publishes an alert on the server alerts topic."""
+    if client is None:
+        return
+    try:
+        client.publish(MQTT_TOPIC_SERVER_ALERTS, json.dumps(dict(alert, time=time.time())), qos=1)
+    except Exception as e:
+        logging.error(f"Failed to publish alert {alert.get('alert')}: {e}")
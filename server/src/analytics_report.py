@@ -0,0 +1,121 @@
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Any, List
+
+from .session_analytics import (
+    read_session_file, SESSION_FILE_SUFFIX,
+    KIND_EVENT, KIND_STATION_COMPLETED
+)
+
+
+def load_sessions(directory: str) -> List[tuple]:
+    """Loads every session file in a directory, skipping unreadable ones."""
+    sessions = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SESSION_FILE_SUFFIX}"))):
+        try:
+            sessions.append(read_session_file(path))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping session file {path}: {e}")
+    return sessions
+
+
+def build_report(sessions: List[tuple]) -> Dict[str, Any]:
+    """
+    Aggregates sessions into a report.
+
+    The report contains, per station:
+      * `completion_seconds`: time from session start to completion, one entry per
+        session that completed the station,
+      * `stall_seconds`: time from the previous completion (or the start) to this one,
+        i.e. how long teams were stuck on this station,
+      * `readings_before_trigger`: events the station sent before it completed,
+    and `event_counts`, a histogram of events per (station, event type).
+
+    Aggregation works on whole columns (C-level zips and Counters over the arrays),
+    touching each row a constant number of times; the only Python-level loop is over
+    completions, of which there are a few per session.
+    """
+    completion_seconds = defaultdict(list)
+    stall_seconds = defaultdict(list)
+    readings_before_trigger = defaultdict(list)
+    event_counts = Counter()
+
+    for header, columns in sessions:
+        stations, events = header['stations'], header['events']
+        kinds, station_ids, timestamps = columns['kind'], columns['station'], columns['timestamp']
+
+        for (kind, station_index, event_index), count in Counter(zip(kinds, station_ids, columns['event'])).items():
+            if kind == KIND_EVENT:
+                event_counts[(stations[station_index], events[event_index])] += count
+
+        completion_byte = bytes([KIND_STATION_COMPLETED])
+        kind_bytes = kinds.tobytes()
+        previous_completion = 0.0
+        events_before = Counter() # (kind, station) counts of the rows before `counted_up_to`
+        counted_up_to = 0
+        index = kind_bytes.find(completion_byte)
+        while index != -1:
+            station_index = station_ids[index]
+            station = stations[station_index]
+            completed_at = timestamps[index]
+            completion_seconds[station].append(completed_at)
+            stall_seconds[station].append(completed_at - previous_completion)
+            previous_completion = completed_at
+            events_before.update(zip(kinds[counted_up_to:index], station_ids[counted_up_to:index]))
+            counted_up_to = index
+            readings_before_trigger[station].append(events_before[(KIND_EVENT, station_index)])
+            index = kind_bytes.find(completion_byte, index + 1)
+
+    return {
+        'sessions': len(sessions),
+        'stations': {
+            station: {
+                'completions': len(times),
+                'completion_seconds': _summary(times),
+                'stall_seconds': _summary(stall_seconds[station]),
+                'readings_before_trigger': _summary(readings_before_trigger[station]),
+            }
+            for station, times in sorted(completion_seconds.items())
+        },
+        'event_counts': {f"{station}/{event}": count for (station, event), count in sorted(event_counts.items())},
+    }
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'mean': statistics.fmean(values),
+        'max': max(values),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"Sessions: {report['sessions']}", "",
+             f"{'station':<20} {'done':>5} {'median s':>9} {'mean s':>9} {'stall s':>9} {'readings':>9}"]
+    for station, stats in report['stations'].items():
+        lines.append(
+            f"{station:<20} {stats['completions']:>5} "
+            f"{stats['completion_seconds']['median']:>9.1f} {stats['completion_seconds']['mean']:>9.1f} "
+            f"{stats['stall_seconds']['median']:>9.1f} {stats['readings_before_trigger']['median']:>9.1f}")
+    lines += ["", "Events:"]
+    lines += [f"  {key:<40} {count:>8}" for key, count in report['event_counts'].items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize recorded escape room sessions.")
+    parser.add_argument("directory", help="Directory containing session analytics files")
+    args = parser.parse_args(argv)
+    print(format_report(build_report(load_sessions(args.directory))))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
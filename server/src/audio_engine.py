@@ -0,0 +1,420 @@
+import logging
+import subprocess
+import threading
+import time
+import wave
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+DEFAULT_FRAME_SIZE = 128 # ~2.9 ms at 44.1 kHz
+# Frames mixed ahead of real time: bounds the latency the engine adds on top of the sink's
+DEFAULT_LOOKAHEAD_FRAMES = 2
+DEFAULT_DUCK_GAIN = 0.3
+DEFAULT_DUCK_FADE_SECONDS = 0.15
+DEFAULT_STOP_FADE_SECONDS = 0.05
+# A real-time loop that falls this far behind (e.g. the host was suspended) resynchronizes instead of bursting
+MAX_LAG_SECONDS = 1.0
+
+# --- Buses ---
+CUE_BUS = "cue" # Station and timed cues; ducks the music bus while playing
+MUSIC_BUS = "music" # Background music
+
+# Raw 16-bit PCM on stdin, played by GStreamer (installed in the image for playsound)
+DEFAULT_OUTPUT_COMMAND = [
+    "gst-launch-1.0", "-q", "fdsrc", "fd=0", "!",
+    "rawaudioparse", "format=pcm", "pcm-format=s16le",
+    "sample-rate={sample_rate}", "num-channels={channels}", "!",
+    "audioconvert", "!", "autoaudiosink",
+]
+
+
+class AudioDecodeError(ValueError):
+    """Raised when a sound file cannot be decoded."""
+
+
+def decode_wav(path: str, sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS) -> np.ndarray:
+    """
+    Decodes a PCM WAV file into float32 samples in [-1, 1].
+
+    Mono files are spread over all channels, other channel counts are downmixed, and
+    files at another sample rate are resampled (linearly, which is fine for cues).
+
+    Returns:
+        np.ndarray: Array of shape (frames, channels).
+
+    Raises:
+        AudioDecodeError: If the file is not a supported WAV file.
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            source_channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            data = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise AudioDecodeError(f"Cannot decode {path}: {e}") from e
+
+    if width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise AudioDecodeError(f"Cannot decode {path}: unsupported sample width {width}")
+    samples = samples.reshape(-1, source_channels)
+
+    if source_channels != channels:
+        mono = samples.mean(axis=1, keepdims=True)
+        samples = np.repeat(mono, channels, axis=1)
+    if rate != sample_rate and len(samples):
+        frames = int(round(len(samples) * sample_rate / rate))
+        positions = np.arange(frames) * (rate / sample_rate)
+        source_positions = np.arange(len(samples))
+        samples = np.stack([np.interp(positions, source_positions, samples[:, c]) for c in range(channels)], axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+def to_pcm16(frame: np.ndarray) -> bytes:
+    """Converts float samples to interleaved little-endian 16-bit PCM, clipping out-of-range values."""
+    return (np.clip(frame, -1.0, 1.0) * 32767.0).astype('<i2').tobytes()
+
+
+# --- Sinks ---
+
+class WavSink:
+    """Writes the mixed output to a 16-bit WAV file. Used for headless rendering and tests."""
+
+    def __init__(self, path: str, sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS):
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, frame: np.ndarray) -> None:
+        self._wav.writeframesraw(to_pcm16(frame))
+
+    def close(self) -> None:
+        self._wav.close()
+
+
+class PipeSink:
+    """
+    Streams the mixed output as raw 16-bit PCM into a long-running player process.
+
+    Args:
+        command (Sequence[str]): The player command line. `{sample_rate}` and `{channels}`
+                                 placeholders are filled in.
+    """
+
+    def __init__(self, command: Sequence[str] = DEFAULT_OUTPUT_COMMAND,
+                 sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS):
+        args = [part.format(sample_rate=sample_rate, channels=channels) for part in command]
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE, bufsize=0)
+
+    def write(self, frame: np.ndarray) -> None:
+        if self._process.poll() is not None:
+            raise OSError(f"Audio output process exited with code {self._process.returncode}")
+        self._process.stdin.write(to_pcm16(frame))
+
+    def close(self) -> None:
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+# --- Mixer ---
+
+class _Ramp:
+    """A gain that moves linearly towards a target, one frame at a time."""
+    __slots__ = ('value', 'target', 'step')
+
+    def __init__(self, value: float):
+        self.value = value
+        self.target = value
+        self.step = 0.0
+
+    def set(self, target: float, seconds: float, sample_rate: int) -> None:
+        self.target = target
+        samples = seconds * sample_rate
+        self.step = abs(target - self.value) / samples if samples >= 1 else 0.0
+
+    def advance(self, frames: int) -> Union[float, np.ndarray]:
+        """Returns the gain for the next `frames` samples: a scalar if constant, else a column ramp."""
+        start = self.value
+        if start == self.target:
+            return start
+        if self.step == 0.0:
+            self.value = self.target
+            return self.target
+        delta = self.target - start
+        travel = self.step * frames
+        if travel >= abs(delta):
+            end = self.target
+            ramp = np.full(frames, end, dtype=np.float32)
+            ramp_frames = min(frames, int(abs(delta) / self.step) + 1)
+            ramp[:ramp_frames] = np.linspace(start, end, ramp_frames, endpoint=False, dtype=np.float32)
+        else:
+            end = start + (travel if delta > 0 else -travel)
+            ramp = np.linspace(start, end, frames, endpoint=False, dtype=np.float32)
+        self.value = end
+        return ramp[:, None]
+
+
+class _Voice:
+    """One playing sound."""
+    __slots__ = ('id', 'samples', 'bus', 'loop', 'position', 'gain', 'stopping')
+
+    def __init__(self, voice_id: int, samples: np.ndarray, bus: str, loop: bool, gain: _Ramp):
+        self.id = voice_id
+        self.samples = samples
+        self.bus = bus
+        self.loop = loop
+        self.position = 0
+        self.gain = gain
+        self.stopping = False # Removed once its fade-out reaches zero
+
+
+class AudioEngine:
+    """
+    Mixes any number of sounds into one persistent output stream.
+
+    Sounds are decoded once (`load`) and kept in memory; starting one only appends a
+    voice to the mix, so the cost of a trigger does not depend on how many sounds are
+    already playing. The mixer renders fixed-size frames of `frame_size` samples,
+    summing every voice with NumPy, applying per-voice and per-bus gain ramps, and
+    hands each frame to a sink: a `PipeSink` feeding a player process on the device,
+    or a `WavSink` for headless rendering.
+
+    Voices on the music bus are ducked to `duck_gain` while any cue plays and restored
+    afterwards. Every gain change (fade, stop, duck) is a ramp, so there are no clicks.
+
+    With the real-time thread (`start`), the mixer stays at most `lookahead_frames`
+    frames ahead of the clock, so a new voice is heard after at most
+    `(lookahead_frames + 1) * frame_size / sample_rate` seconds plus the sink's own
+    latency. Without it, `render` mixes frames on demand, which is how tests drive it.
+
+    Args:
+        sink: Object with `write(frame)` and `close()`; frames are float32 arrays of
+              shape (frame_size, channels).
+        sample_rate (int): Output sample rate.
+        channels (int): Output channel count.
+        frame_size (int): Samples per mixed frame.
+        duck_gain (float): Music bus gain while a cue plays.
+        duck_fade_seconds (float): Duration of the duck and restore ramps.
+        lookahead_frames (int): How far the real-time thread mixes ahead of the clock.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+
+    def __init__(self, sink, sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS,
+                 frame_size: int = DEFAULT_FRAME_SIZE, duck_gain: float = DEFAULT_DUCK_GAIN,
+                 duck_fade_seconds: float = DEFAULT_DUCK_FADE_SECONDS,
+                 lookahead_frames: int = DEFAULT_LOOKAHEAD_FRAMES, clock=time.monotonic):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_size = frame_size
+        self.duck_gain = duck_gain
+        self.duck_fade_seconds = duck_fade_seconds
+        self.lookahead_frames = lookahead_frames
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._voices: List[_Voice] = []
+        self._next_voice_id = 1
+        self._buses: Dict[str, _Ramp] = {CUE_BUS: _Ramp(1.0), MUSIC_BUS: _Ramp(1.0)}
+        self._sounds: Dict[str, np.ndarray] = {}
+        self._mix = np.zeros((frame_size, channels), dtype=np.float32)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.failed = False # Set when the sink fails; callers fall back to other playback
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def active_voices(self) -> int:
+        return len(self._voices)
+
+    # --- Sounds ---
+
+    def load(self, path: str) -> np.ndarray:
+        """Decodes a sound file, or returns it from the cache."""
+        samples = self._sounds.get(path)
+        if samples is None:
+            samples = self._sounds[path] = decode_wav(path, self.sample_rate, self.channels)
+        return samples
+
+    def is_loaded(self, path: str) -> bool:
+        return path in self._sounds
+
+    # --- Voice Control ---
+
+    def play(self, sound: Union[str, np.ndarray], gain: float = 1.0, bus: str = CUE_BUS,
+             loop: bool = False, fade_in_seconds: float = 0.0) -> int:
+        """
+        Starts a sound.
+
+        Args:
+            sound (Union[str, np.ndarray]): A file path (decoded on first use) or samples
+                                            of shape (frames, channels).
+            gain (float): Linear gain of this voice.
+            bus (str): CUE_BUS or MUSIC_BUS.
+            loop (bool): Restart from the beginning when the end is reached.
+            fade_in_seconds (float): Ramp the gain up from silence over this duration.
+
+        Returns:
+            int: The voice id, for `stop` and `fade`.
+        """
+        samples = self.load(sound) if isinstance(sound, str) else sound
+        if bus not in self._buses:
+            raise ValueError(f"Unknown audio bus: {bus}")
+        ramp = _Ramp(0.0 if fade_in_seconds > 0 else gain)
+        if fade_in_seconds > 0:
+            ramp.set(gain, fade_in_seconds, self.sample_rate)
+        with self._lock:
+            voice_id = self._next_voice_id
+            self._next_voice_id += 1
+            self._voices.append(_Voice(voice_id, samples, bus, loop, ramp))
+        return voice_id
+
+    def fade(self, voice_id: int, gain: float, seconds: float) -> bool:
+        """Ramps a voice's gain to `gain`. Returns False if the voice is no longer playing."""
+        with self._lock:
+            voice = self._find(voice_id)
+            if voice is None:
+                return False
+            voice.gain.set(gain, seconds, self.sample_rate)
+            return True
+
+    def stop(self, voice_id: int, fade_seconds: float = DEFAULT_STOP_FADE_SECONDS) -> bool:
+        """Fades a voice out and removes it. Returns False if the voice is no longer playing."""
+        with self._lock:
+            voice = self._find(voice_id)
+            if voice is None:
+                return False
+            self._stop_voice(voice, fade_seconds)
+            return True
+
+    def stop_bus(self, bus: str, fade_seconds: float = DEFAULT_STOP_FADE_SECONDS) -> None:
+        """Fades out and removes every voice on a bus."""
+        with self._lock:
+            for voice in self._voices:
+                if voice.bus == bus:
+                    self._stop_voice(voice, fade_seconds)
+
+    # --- Mixing ---
+
+    def render(self, frames: int) -> np.ndarray:
+        """
+        Mixes `frames` frames immediately, writing each to the sink.
+
+        Returns:
+            np.ndarray: The rendered samples, shape (frames * frame_size, channels).
+        """
+        return np.concatenate([self._render_frame() for _ in range(frames)]) if frames else \
+            np.zeros((0, self.channels), dtype=np.float32)
+
+    def start(self) -> None:
+        """Starts the real-time mixing thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-engine", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops the mixing thread, if running, and closes the sink."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        try:
+            self.sink.close()
+        except OSError as e:
+            logging.error(f"Error closing audio output: {e}")
+
+    # --- Internals ---
+
+    def _find(self, voice_id: int) -> Optional[_Voice]:
+        for voice in self._voices:
+            if voice.id == voice_id:
+                return voice
+        return None
+
+    def _stop_voice(self, voice: _Voice, fade_seconds: float) -> None:
+        voice.stopping = True
+        voice.gain.set(0.0, fade_seconds, self.sample_rate)
+
+    def _render_frame(self) -> np.ndarray:
+        frame = self._mix_frame()
+        self.sink.write(frame)
+        return frame
+
+    def _mix_frame(self) -> np.ndarray:
+        n = self.frame_size
+        mix = self._mix
+        mix.fill(0.0)
+        with self._lock:
+            voices = self._voices
+            music = self._buses[MUSIC_BUS]
+            cue_playing = any(voice.bus == CUE_BUS and not voice.stopping for voice in voices)
+            music_target = self.duck_gain if cue_playing else 1.0
+            if music.target != music_target:
+                music.set(music_target, self.duck_fade_seconds, self.sample_rate)
+            bus_gains = {bus: ramp.advance(n) for bus, ramp in self._buses.items()}
+
+            finished = []
+            for voice in voices:
+                gain = voice.gain.advance(n) * bus_gains[voice.bus]
+                self._mix_voice(voice, mix, gain)
+                if voice.position >= len(voice.samples) or (voice.stopping and voice.gain.value == 0.0):
+                    finished.append(voice)
+            if finished:
+                self._voices = [voice for voice in voices if voice not in finished]
+        return mix.copy()
+
+    def _mix_voice(self, voice: _Voice, mix: np.ndarray, gain) -> None:
+        samples = voice.samples
+        length = len(samples)
+        written = 0
+        n = self.frame_size
+        while written < n and length:
+            chunk = samples[voice.position:voice.position + (n - written)]
+            chunk_gain = gain if np.isscalar(gain) else gain[written:written + len(chunk)]
+            mix[written:written + len(chunk)] += chunk * chunk_gain
+            written += len(chunk)
+            voice.position += len(chunk)
+            if voice.position >= length:
+                if not voice.loop:
+                    break
+                voice.position = 0
+
+    def _run(self) -> None:
+        frame_seconds = self.frame_size / self.sample_rate
+        lookahead = self.lookahead_frames * frame_seconds
+        deadline = self._clock() # Playback time up to which frames have been written
+        while not self._stop_event.is_set():
+            try:
+                self._render_frame()
+            except (OSError, ValueError) as e:
+                logging.error(f"Audio output failed, stopping the audio engine: {e}")
+                self.failed = True
+                return
+            deadline += frame_seconds
+            ahead = deadline - self._clock() - lookahead
+            if ahead > 0:
+                self._stop_event.wait(ahead)
+            elif -ahead > MAX_LAG_SECONDS:
+                deadline = self._clock()
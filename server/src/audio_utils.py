@@ -1,31 +1,260 @@
 import os
 import threading
 import logging
-from playsound import playsound, PlaysoundException
-from .config_loader import load_config
+import time
+from contextlib import contextmanager
 
-# Load configuration specifically for audio settings
-# Assuming config.json is in the root relative to where server.py is run
-# Or adjust the path in load_config() if needed globally
-CONFIG = load_config() 
-AUDIO_BASE_PATH = CONFIG.get('audio_base_path', '/app/audio/') # Default if not in config
+DEFAULT_AUDIO_BASE_PATH = '/app/audio/'
+AUDIO_ENGINE_CONFIG_KEY = 'audio_engine'
+
+# Injected by the server through configure_audio(); no config is read at import time
+AUDIO_BASE_PATH = DEFAULT_AUDIO_BASE_PATH
+
+# The playback backend (playsound, and GStreamer behind it) is imported on first use
+_backend = None
+_backend_lock = threading.Lock()
+
+# The mixing engine (see audio_engine.py), when enabled; playsound is the fallback
+_engine = None
+_music_voice = None
+# Sounds the engine cannot decode (it only reads WAV, e.g. not MP3): played with playsound
+_undecodable = set()
+
+# Per-thread list that, while set, collects cue requests instead of playing them
+_cue_collector = threading.local()
+
+# Set in a process that leaves playback to another one (see multiprocess_runtime.py)
+_forwarder = None
+
+def configure_audio(config):
+    """Applies the audio settings of an already loaded configuration."""
+    global AUDIO_BASE_PATH
+    AUDIO_BASE_PATH = config.get('audio_base_path', DEFAULT_AUDIO_BASE_PATH) # Default if not in config
+
+def forward_audio(forwarder):
+    """
+    Hands every later cue and background music change to `forwarder` instead of playing
+    it in this process. `forwarder` provides `play_cue(sound_file_name, gain)` and
+    `set_music(playing)`; None restores local playback.
+    """
+    global _forwarder
+    _forwarder = forwarder
+
+def _load_backend():
+    """Imports the playback backend once. Returns (playsound, PlaysoundException)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                from playsound import playsound, PlaysoundException
+                _backend = (playsound, PlaysoundException)
+    return _backend
+
+def _active_engine():
+    return _engine if _engine is not None and not _engine.failed else None
+
+def start_audio_engine(config, sink=None):
+    """
+    Starts the mixing engine if `audio_engine.enabled` is set in the configuration:
+
+        "audio_engine": {
+            "enabled": true,
+            "sample_rate": 44100, "frame_size": 128, "lookahead_frames": 2,
+            "duck_gain": 0.3, "duck_fade_seconds": 0.15,
+            "output_command": ["gst-launch-1.0", ...],
+            "background_music": {"sound": "ambience.wav", "gain": 0.5}
+        }
+
+    Engine settings are read once; a config reload does not restart the engine.
+
+    Args:
+        config (Dict[str, Any]): The server configuration.
+        sink: Output sink to use instead of the configured player process (e.g. a WavSink).
+
+    Returns:
+        The AudioEngine, or None if disabled or the output could not be opened, in which
+        case sounds are played with playsound.
+    """
+    global _engine
+    engine_config = config.get(AUDIO_ENGINE_CONFIG_KEY, {})
+    if not engine_config.get('enabled', False):
+        return None
+    # NumPy is only needed, and only imported, when the engine is enabled
+    from . import audio_engine
+    sample_rate = engine_config.get('sample_rate', audio_engine.DEFAULT_SAMPLE_RATE)
+    try:
+        if sink is None:
+            sink = audio_engine.PipeSink(engine_config.get('output_command', audio_engine.DEFAULT_OUTPUT_COMMAND),
+                                         sample_rate=sample_rate)
+    except OSError as e:
+        logging.error(f"Could not open audio output, falling back to playsound: {e}")
+        return None
+    _engine = audio_engine.AudioEngine(
+        sink,
+        sample_rate=sample_rate,
+        frame_size=engine_config.get('frame_size', audio_engine.DEFAULT_FRAME_SIZE),
+        duck_gain=engine_config.get('duck_gain', audio_engine.DEFAULT_DUCK_GAIN),
+        duck_fade_seconds=engine_config.get('duck_fade_seconds', audio_engine.DEFAULT_DUCK_FADE_SECONDS),
+        lookahead_frames=engine_config.get('lookahead_frames', audio_engine.DEFAULT_LOOKAHEAD_FRAMES)
+    )
+    _engine.start()
+    logging.info(f"Audio engine started ({_engine.sample_rate} Hz, {_engine.frame_size}-sample frames)")
+    return _engine
+
+def stop_audio_engine():
+    global _engine, _music_voice
+    if _engine is not None:
+        _engine.close()
+        _engine = None
+        _music_voice = None
+    _undecodable.clear()
+
+def configured_sounds(config):
+    """Returns the file names of every sound referenced by the configuration."""
+    sounds = set()
+    for station_config in config.get('station_configs', {}).values():
+        for sensor_config in station_config.values():
+            if isinstance(sensor_config, dict) and sensor_config.get('sound_on_trigger'):
+                sounds.add(sensor_config['sound_on_trigger'])
+    for cue in config.get('session_timers', {}).get('cues', []):
+        if cue.get('sound'):
+            sounds.add(cue['sound'])
+    music = config.get(AUDIO_ENGINE_CONFIG_KEY, {}).get('background_music') or {}
+    if music.get('sound'):
+        sounds.add(music['sound'])
+    return sorted(sounds)
+
+def warm_up_audio(config=None):
+    """
+    Prepares playback ahead of the first cue: decodes the configured sounds into the
+    engine if it is running, otherwise imports the playsound backend. The backend is
+    also imported if some configured sound is not one the engine can decode.
+
+    Returns:
+        float: Seconds spent, or None if the backend could not be imported.
+    """
+    start = time.perf_counter()
+    engine = _active_engine()
+    if engine is not None:
+        from .audio_engine import AudioDecodeError
+        for sound_file_name in configured_sounds(config or {}):
+            audio_path = os.path.join(AUDIO_BASE_PATH, sound_file_name)
+            try:
+                engine.load(audio_path)
+            except AudioDecodeError as e:
+                logging.warning(f"The audio engine cannot decode {audio_path}, it will be played with playsound: {e}")
+                _undecodable.add(audio_path)
+            except OSError as e:
+                logging.error(f"Could not preload sound {audio_path}: {e}")
+        if not _undecodable:
+            return time.perf_counter() - start
+    try:
+        _load_backend()
+    except Exception as e:
+        logging.error(f"Audio backend unavailable: {e}")
+        return None
+    return time.perf_counter() - start
+
+def update_background_music(playing, config):
+    """Starts (looped, on the music bus) or fades out the configured background music."""
+    global _music_voice
+    if _forwarder is not None:
+        _forwarder.set_music(playing)
+        return
+    engine = _active_engine()
+    music = config.get(AUDIO_ENGINE_CONFIG_KEY, {}).get('background_music') or {}
+    if engine is None or not music.get('sound'):
+        return
+    if not playing:
+        if _music_voice is not None:
+            engine.stop(_music_voice, fade_seconds=music.get('fade_seconds', 1.0))
+            _music_voice = None
+        return
+    if _music_voice is not None:
+        return
+    from .audio_engine import MUSIC_BUS
+    audio_path = os.path.join(AUDIO_BASE_PATH, music['sound'])
+    try:
+        _music_voice = engine.play(audio_path, gain=music.get('gain', 1.0), bus=MUSIC_BUS, loop=True,
+                                   fade_in_seconds=music.get('fade_seconds', 1.0))
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not play background music {audio_path}: {e}")
+
+def _play_with_engine(engine, audio_path, gain):
+    """Returns False if the engine cannot decode the sound, which is then to be played with playsound."""
+    from .audio_engine import AudioDecodeError
+    try:
+        engine.play(audio_path, gain=gain)
+        logging.info(f"Playing sound: {audio_path}")
+    except AudioDecodeError as e:
+        logging.warning(f"The audio engine cannot decode {audio_path}, playing it with playsound: {e}")
+        _undecodable.add(audio_path)
+        return False
+    except (OSError, ValueError) as e:
+        logging.error(f"Error playing sound {audio_path}: {e}")
+    return True
+
+def _play_with_playsound(audio_path):
+    try:
+        playsound, PlaysoundException = _load_backend()
+    except Exception as e:
+        logging.error(f"Audio backend unavailable, cannot play {audio_path}: {e}")
+        return
+    try:
+        logging.info(f"Playing sound: {audio_path}")
+        playsound(audio_path)
+        logging.info(f"Finished playing: {os.path.basename(audio_path)}")
+    except PlaysoundException as e:
+        logging.error(f"Error playing sound {audio_path}: {e}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during audio playback {audio_path}: {e}")
+
+@contextmanager
+def collecting_cues():
+    """
+    Within the block, cues requested on the calling thread are appended to the yielded
+    list as (sound_file_name, gain) instead of being played. Used to decide which cues
+    of a batch to play once it has been evaluated.
+    """
+    cues = []
+    _cue_collector.cues = cues
+    try:
+        yield cues
+    finally:
+        _cue_collector.cues = None
+
+def play_audio_threaded(sound_file_name, gain=1.0):
+    """
+    Plays an audio file without blocking the caller.
+
+    With the audio engine running, a preloaded sound is mixed in immediately; a sound
+    that still needs decoding is decoded on a separate thread first. Otherwise the
+    sound is played with playsound in a separate thread, and `gain` is ignored; so is
+    a sound the engine cannot decode.
+    """
+    collected = getattr(_cue_collector, 'cues', None)
+    if collected is not None:
+        collected.append((sound_file_name, gain))
+        return
+    if _forwarder is not None:
+        _forwarder.play_cue(sound_file_name, gain)
+        return
+    audio_path = os.path.join(AUDIO_BASE_PATH, sound_file_name)
+    engine = _active_engine()
+    if audio_path in _undecodable:
+        engine = None
+    if engine is not None and engine.is_loaded(audio_path):
+        _play_with_engine(engine, audio_path, gain)
+        return
 
-def play_audio_threaded(sound_file_name):
-    """Plays an audio file in a separate thread."""
     def target():
-        audio_path = os.path.join(AUDIO_BASE_PATH, sound_file_name)
         if not os.path.exists(audio_path):
             logging.error(f"Audio file not found: {audio_path}")
             return
-        try:
-            logging.info(f"Playing sound: {audio_path}")
-            playsound(audio_path)
-            logging.info(f"Finished playing: {sound_file_name}")
-        except PlaysoundException as e:
-            logging.error(f"Error playing sound {audio_path}: {e}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during audio playback {audio_path}: {e}")
+        if engine is not None and _play_with_engine(engine, audio_path, gain):
+            return
+        _play_with_playsound(audio_path)
 
     thread = threading.Thread(target=target)
     thread.daemon = True # Allow main program to exit even if thread is running
-    thread.start() 
\ No newline at end of file
+    thread.start()
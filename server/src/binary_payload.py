@@ -0,0 +1,147 @@
+import struct
+from typing import Dict, Any, Optional
+
+# --- Binary Station Payload Format (version 1) ---
+# Stations may send a compact binary payload instead of JSON text. Both formats are
+# accepted on the same topics; binary payloads start with BINARY_MARKER, which can
+# never start a JSON document (or valid UTF-8 text).
+#
+# Header (little endian, 9 bytes):
+#   u8  marker      BINARY_MARKER
+#   u8  version     BINARY_VERSION
+#   u8  event type  key of EVENT_TYPE_IDS
+#   u16 station id  numeric station id
+#   u32 sequence    per-station message counter, used for de-duplication
+# Followed by zero or more typed fields:
+#   u8  field id    key of FIELD_IDS
+#   u8  type tag    one of the TYPE_* tags below
+#   ... value       i32 / f32 / u8 bool / u8 length + UTF-8 bytes
+#
+# The Arduino side lives in Arduino/libraries/program/src/BinaryPayload.h. Keep the ids in sync.
+
+BINARY_MARKER = 0xB5
+BINARY_MARKER_BYTE = bytes([BINARY_MARKER])
+BINARY_VERSION = 1
+
+HEADER = struct.Struct('<BBBHI')
+FIELD_HEADER = struct.Struct('<BB')
+INT_VALUE = struct.Struct('<i')
+FLOAT_VALUE = struct.Struct('<f')
+
+TYPE_INT = ord('i')
+TYPE_FLOAT = ord('f')
+TYPE_BOOL = ord('b')
+TYPE_STRING = ord('s')
+
+EVENT_TYPE_IDS = {
+    1: "beacon_proximity",
+    2: "door_status",
+    3: "laser",
+}
+
+FIELD_IDS = {
+    1: "sensor",
+    2: "range",
+    3: "status",
+    4: "value",
+}
+
+_EVENT_TYPE_BY_NAME = {name: type_id for type_id, name in EVENT_TYPE_IDS.items()}
+_FIELD_BY_NAME = {name: field_id for field_id, name in FIELD_IDS.items()}
+
+
+class BinaryPayloadError(ValueError):
+    """Raised when a binary payload is truncated or malformed."""
+
+
+def is_binary_payload(payload: bytes) -> bool:
+    return payload[:1] == BINARY_MARKER_BYTE
+
+
+def binary_sequence(payload: bytes) -> Optional[int]:
+    """Returns the sequence number of a binary payload without decoding its fields."""
+    if len(payload) < HEADER.size or payload[0] != BINARY_MARKER:
+        return None
+    return HEADER.unpack_from(payload)[4]
+
+
+def decode_binary_payload(payload: bytes) -> Dict[str, Any]:
+    """
+    Decodes a binary station payload into the same dict shape handlers get from JSON.
+
+    Args:
+        payload (bytes): The raw MQTT payload, starting with BINARY_MARKER.
+
+    Returns:
+        Dict[str, Any]: The decoded fields plus `seq`, `station` and `event_type`.
+
+    Raises:
+        BinaryPayloadError: If the payload is truncated, has an unknown version,
+                            or contains an unknown field type.
+    """
+    view = memoryview(payload)
+    size = len(view)
+    if size < HEADER.size:
+        raise BinaryPayloadError(f"Binary payload too short ({size} bytes)")
+    marker, version, event_type_id, station, seq = HEADER.unpack_from(view)
+    if marker != BINARY_MARKER:
+        raise BinaryPayloadError(f"Bad binary payload marker 0x{marker:02x}")
+    if version != BINARY_VERSION:
+        raise BinaryPayloadError(f"Unsupported binary payload version {version}")
+
+    result = {
+        "seq": seq,
+        "station": station,
+        "event_type": EVENT_TYPE_IDS.get(event_type_id, event_type_id),
+    }
+    offset = HEADER.size
+    try:
+        while offset < size:
+            field_id, type_tag = FIELD_HEADER.unpack_from(view, offset)
+            offset += FIELD_HEADER.size
+            if type_tag == TYPE_INT:
+                value = INT_VALUE.unpack_from(view, offset)[0]
+                offset += INT_VALUE.size
+            elif type_tag == TYPE_FLOAT:
+                value = FLOAT_VALUE.unpack_from(view, offset)[0]
+                offset += FLOAT_VALUE.size
+            elif type_tag == TYPE_BOOL:
+                value = view[offset] != 0
+                offset += 1
+            elif type_tag == TYPE_STRING:
+                length = view[offset]
+                end = offset + 1 + length
+                if end > size:
+                    raise BinaryPayloadError("Truncated string field")
+                value = str(view[offset + 1:end], 'utf-8')
+                offset = end
+            else:
+                raise BinaryPayloadError(f"Unknown field type tag {type_tag}")
+            result[FIELD_IDS.get(field_id, f"field_{field_id}")] = value
+    except (struct.error, IndexError) as e:
+        raise BinaryPayloadError(f"Truncated binary payload: {e}") from e
+    except UnicodeDecodeError as e:
+        raise BinaryPayloadError(f"Invalid UTF-8 in string field: {e}") from e
+    return result
+
+
+def encode_binary_payload(event_type: str, station: int, seq: int, fields: Dict[str, Any]) -> bytes:
+    """
+    Encodes an event in the binary format. Mirrors the Arduino encoder; used by tests,
+    benchmarks and tools that simulate stations.
+    """
+    parts = [HEADER.pack(BINARY_MARKER, BINARY_VERSION, _EVENT_TYPE_BY_NAME[event_type], station, seq)]
+    for name, value in fields.items():
+        field_id = _FIELD_BY_NAME[name]
+        if isinstance(value, bool):
+            parts.append(FIELD_HEADER.pack(field_id, TYPE_BOOL) + bytes([1 if value else 0]))
+        elif isinstance(value, int):
+            parts.append(FIELD_HEADER.pack(field_id, TYPE_INT) + INT_VALUE.pack(value))
+        elif isinstance(value, float):
+            parts.append(FIELD_HEADER.pack(field_id, TYPE_FLOAT) + FLOAT_VALUE.pack(value))
+        else:
+            encoded = str(value).encode('utf-8')
+            if len(encoded) > 255:
+                raise BinaryPayloadError(f"String field '{name}' longer than 255 bytes")
+            parts.append(FIELD_HEADER.pack(field_id, TYPE_STRING) + bytes([len(encoded)]) + encoded)
+    return b''.join(parts)
@@ -0,0 +1,351 @@
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .timer_wheel import TimerScheduler, Timer
+from .topics import station_config_topic, station_baseline_topic
+
+CALIBRATION_CONFIG_KEY = "calibration"
+# Baseline collected per calibration; long enough for the slowest station (BLE, 2 readings/s) to reach min_samples
+DEFAULT_WINDOW_SECONDS = 15.0
+DEFAULT_RATE_WINDOW_SECONDS = 60.0 # Message rates are averaged over this long
+DEFAULT_MIN_SAMPLES = 20 # A sensor with fewer baseline readings is left uncalibrated
+# Readings further than this many standard deviations from the baseline are no longer ambient noise
+DEFAULT_THRESHOLD_SIGMAS = 4.0
+DEFAULT_DEADBAND_SIGMAS = 2.0
+DEFAULT_MIN_DEADBAND = 1.0 # In sensor units; keeps a perfectly steady baseline from getting a zero deadband
+DEFAULT_VALUE_FIELD = "value"
+# Sensor settings whose value the rules compare readings against; stations must report crossing them
+RULE_THRESHOLD_KEYS = ("range_threshold",)
+# Sent on the baseline topic: while set, the station streams every raw reading
+BASELINE_FLAG = "collect_baseline"
+# The most thresholds a station holds (READING_MAX_THRESHOLDS in Arduino/libraries/program/src/Reading.h)
+MAX_THRESHOLDS = 4
+
+
+class StationRateMeter:
+    """
+    Counts inbound messages per station in one-second buckets, so rates can be
+    compared before and after a calibration. `count` is called for every station
+    message, under the dispatch lock, and costs one increment.
+
+    Args:
+        window_seconds (float): The longest span `rate` can average over.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+
+    def __init__(self, window_seconds: float = DEFAULT_RATE_WINDOW_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self._size = int(window_seconds) + 1 # One more for the second in progress
+        self._clock = clock
+        self._stations: Dict[str, _StationCounts] = {}
+
+    def count(self, station_id: str) -> None:
+        second = int(self._clock())
+        counts = self._stations.get(station_id)
+        if counts is None:
+            counts = self._stations[station_id] = _StationCounts(self._size, second)
+        elif counts.second != second:
+            counts.advance(second)
+        counts.buckets[second % self._size] += 1
+
+    def rate(self, station_id: str, seconds: Optional[float] = None) -> float:
+        """
+        Messages per second of a station over the last `seconds` complete seconds
+        (the whole window by default), or since its first message if that is more recent.
+        """
+        counts = self._stations.get(station_id)
+        if counts is None:
+            return 0.0
+        second = int(self._clock())
+        counts.advance(second)
+        span = min(int(seconds) if seconds is not None else self._size - 1, self._size - 1, second - counts.first_second)
+        if span <= 0:
+            return 0.0
+        return sum(counts.buckets[(second - k) % self._size] for k in range(1, span + 1)) / span
+
+    def clear(self) -> None:
+        self._stations.clear()
+
+
+class _StationCounts:
+    __slots__ = ('buckets', 'second', 'first_second')
+
+    def __init__(self, size: int, second: int):
+        self.buckets = [0] * size # Messages per second, indexed by second modulo size
+        self.second = second # The second the newest bucket belongs to
+        self.first_second = second
+
+    def advance(self, second: int) -> None:
+        if second <= self.second:
+            return
+        size = len(self.buckets)
+        for skipped in range(self.second + 1, min(second, self.second + size) + 1):
+            self.buckets[skipped % size] = 0
+        self.second = second
+
+
+def compute_calibration(samples: List[float], rule_thresholds: Iterable[float] = (),
+                        threshold_sigmas: float = DEFAULT_THRESHOLD_SIGMAS,
+                        deadband_sigmas: float = DEFAULT_DEADBAND_SIGMAS,
+                        min_deadband: float = DEFAULT_MIN_DEADBAND,
+                        max_thresholds: int = MAX_THRESHOLDS) -> Dict[str, Any]:
+    """
+    Computes the thresholds and deadband of a sensor from baseline readings.
+
+    The baseline band is the mean plus or minus `threshold_sigmas` standard deviations
+    (never narrower than the deadband); its edges become thresholds, together with the
+    thresholds the rules compare the sensor against, so a station reporting only
+    threshold crossings still reports everything the rules need. Beyond
+    `max_thresholds`, the band edges are left out (the upper one first): the rule
+    thresholds come first.
+
+    Args:
+        samples (List[float]): Readings collected while the sensor sat at its ambient level.
+        rule_thresholds (Iterable[float]): Thresholds of the rules that use the sensor.
+        threshold_sigmas (float): Width of the baseline band, in standard deviations.
+        deadband_sigmas (float): Hysteresis around a threshold, in standard deviations.
+        min_deadband (float): Smallest deadband, in sensor units.
+        max_thresholds (int): The most thresholds the station holds.
+
+    Returns:
+        Dict[str, Any]: `thresholds` (sorted), `deadband`, `baseline` and `samples`.
+
+    Raises:
+        ValueError: If the rules alone need more than `max_thresholds` thresholds.
+    """
+    mean = math.fsum(samples) / len(samples)
+    deviation = math.sqrt(math.fsum((s - mean) ** 2 for s in samples) / len(samples))
+    deadband = max(deadband_sigmas * deviation, min_deadband)
+    margin = max(threshold_sigmas * deviation, deadband)
+    thresholds = {float(t) for t in rule_thresholds}
+    if len(thresholds) > max_thresholds:
+        raise ValueError(f"{len(thresholds)} rule thresholds, a station holds {max_thresholds}")
+    for edge in (round(mean - margin, 2), round(mean + margin, 2)):
+        if len(thresholds | {edge}) <= max_thresholds:
+            thresholds.add(edge)
+    return {
+        "thresholds": sorted(thresholds),
+        "deadband": round(deadband, 2),
+        "baseline": round(mean, 2),
+        "samples": len(samples),
+    }
+
+
+class _SensorBaseline:
+    __slots__ = ('sensor_id', 'event_type', 'field', 'options', 'rule_thresholds', 'samples')
+
+    def __init__(self, sensor_id: str, event_type: str, field: str, options: Dict[str, Any], rule_thresholds: List[float]):
+        self.sensor_id = sensor_id
+        self.event_type = event_type
+        self.field = field
+        self.options = options
+        self.rule_thresholds = rule_thresholds
+        self.samples: List[float] = []
+
+
+def calibrated_sensors(station_config: Dict[str, Any]) -> List[_SensorBaseline]:
+    """The sensors of a station that opt in with a `calibration` section, each with an empty baseline."""
+    sensors = []
+    for sensor_id, sensor_config in station_config.items():
+        if not isinstance(sensor_config, dict) or not isinstance(sensor_config.get(CALIBRATION_CONFIG_KEY), dict):
+            continue
+        options = sensor_config[CALIBRATION_CONFIG_KEY]
+        rule_thresholds = [float(sensor_config[key]) for key in RULE_THRESHOLD_KEYS if sensor_config.get(key) is not None]
+        sensors.append(_SensorBaseline(sensor_id, sensor_config.get("event_type"), options.get("field", DEFAULT_VALUE_FIELD),
+                                       options, rule_thresholds))
+    return sensors
+
+
+class CalibrationManager:
+    """
+    Calibrates station sensors from a baseline window and pushes the result to the stations.
+
+    A sensor opts in with a `calibration` section in its station config:
+
+        "laser_1": {"event_type": "laser", "calibration": {"field": "value", "min_deadband": 4}}
+
+    `start` opens a baseline window for the chosen stations and asks them to stream
+    every raw reading, calibrated or not, on their baseline topic (not retained, so
+    the thresholds retained on the config topic are left alone):
+
+        escaperoom/station/<station_id>/baseline
+        {"collect_baseline": true, "seconds": 15}
+
+    While the window is open, `observe` collects the `field` of each of their
+    readings. When it closes, the streaming is turned off, and the thresholds and
+    deadband of every sensor with enough readings are computed with
+    `compute_calibration` and published, retained, on the station's config topic, so
+    a station that reboots gets them back from the broker:
+
+        escaperoom/station/<station_id>/config
+        {"sensors": {"laser_1": {"thresholds": [571.3, 648.9], "deadband": 9.7, ...}}, "calibrated_at": ...}
+
+    Calibrated stations report threshold crossings only (see Arduino/libraries/program/src/Reading.h).
+    A report of each station's message rate before and after calibration is logged
+    one rate window after the push.
+
+    Args:
+        scheduler (TimerScheduler): Closes baseline windows and runs the rate reports.
+        rates (StationRateMeter): The inbound message rates of the stations.
+        window_seconds (float): Default baseline window.
+        rate_window_seconds (float): How long after the push the rate is measured again.
+        min_samples (int): Fewest baseline readings a sensor needs.
+        threshold_sigmas (float): Default width of the baseline band; a sensor may override it.
+        deadband_sigmas (float): Default hysteresis; a sensor may override it.
+        min_deadband (float): Default smallest deadband; a sensor may override it.
+
+    Attributes:
+        reports (Dict[str, Dict[str, float]]): The last rate report of each station.
+    """
+
+    def __init__(self, scheduler: TimerScheduler, rates: StationRateMeter,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 rate_window_seconds: float = DEFAULT_RATE_WINDOW_SECONDS,
+                 min_samples: int = DEFAULT_MIN_SAMPLES,
+                 threshold_sigmas: float = DEFAULT_THRESHOLD_SIGMAS,
+                 deadband_sigmas: float = DEFAULT_DEADBAND_SIGMAS,
+                 min_deadband: float = DEFAULT_MIN_DEADBAND):
+        self._scheduler = scheduler
+        self.rates = rates
+        self.window_seconds = window_seconds
+        self.rate_window_seconds = rate_window_seconds
+        self.min_samples = min_samples
+        self.threshold_sigmas = threshold_sigmas
+        self.deadband_sigmas = deadband_sigmas
+        self.min_deadband = min_deadband
+        self._lock = threading.Lock()
+        # station_id -> sensors being collected; replaced, never mutated, so `observe` needs no lock
+        self._baselines: Dict[str, List[_SensorBaseline]] = {}
+        self._timers: Dict[str, Timer] = {}
+        self._published: Dict[str, Dict[str, Any]] = {} # station_id -> last pushed config
+        self.reports: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def collecting(self) -> bool:
+        return bool(self._baselines)
+
+    def collecting_from(self, station_id: str) -> bool:
+        """Whether a station is streaming a baseline."""
+        return station_id in self._baselines
+
+    def start(self, client, config: Dict[str, Any], station_ids: Optional[Iterable[str]] = None,
+              window_seconds: Optional[float] = None) -> List[str]:
+        """
+        Opens a baseline window for the given stations, or all stations with calibrated sensors.
+        A station already collecting starts over.
+
+        Returns:
+            List[str]: The stations now collecting a baseline.
+        """
+        window = float(window_seconds) if window_seconds is not None else self.window_seconds
+        station_configs = config.get("station_configs", {})
+        if station_ids is None:
+            station_ids = station_configs.keys()
+        started = []
+        with self._lock:
+            baselines = dict(self._baselines)
+            for station_id in station_ids:
+                sensors = calibrated_sensors(station_configs.get(station_id, {}))
+                if not sensors:
+                    logging.warning(f"Station {station_id} has no sensors to calibrate")
+                    continue
+                previous = self._timers.pop(station_id, None)
+                if previous is not None:
+                    previous.cancel()
+                baselines[station_id] = sensors
+                rate_before = self.rates.rate(station_id, self.rate_window_seconds)
+                self._timers[station_id] = self._scheduler.schedule(
+                    window, self._finish, client, station_id, rate_before, name=f"calibrate_{station_id}")
+                started.append(station_id)
+            self._baselines = baselines
+        for station_id in started:
+            # The station stops by itself after `seconds`, should the server not come back to say so
+            self._publish(client, station_baseline_topic(station_id), {BASELINE_FLAG: True, "seconds": window})
+        if started:
+            logging.info(f"Calibrating {', '.join(started)}: collecting a {window:g}s baseline, keep the room idle")
+        return started
+
+    def observe(self, station_id: str, event_type: str, payload: Dict[str, Any]) -> None:
+        """Adds a reading to the baseline of its sensor if its station is collecting one."""
+        sensors = self._baselines.get(station_id)
+        if sensors is None:
+            return
+        sensor_name = payload.get("sensor")
+        for sensor in sensors:
+            if sensor.event_type != event_type or (sensor_name is not None and sensor_name != sensor.sensor_id):
+                continue
+            value = payload.get(sensor.field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                sensor.samples.append(float(value))
+
+    def calibration(self, station_id: str) -> Optional[Dict[str, Any]]:
+        """The config last pushed to a station, or None."""
+        return self._published.get(station_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._baselines = {}
+        self._published.clear()
+        self.reports.clear()
+
+    # --- Internals ---
+
+    def _finish(self, client, station_id: str, rate_before: float) -> None:
+        with self._lock:
+            baselines = dict(self._baselines)
+            sensors = baselines.pop(station_id, None)
+            self._baselines = baselines
+            self._timers.pop(station_id, None)
+        if sensors is None:
+            return
+        self._publish(client, station_baseline_topic(station_id), {BASELINE_FLAG: False})
+
+        results = {}
+        for sensor in sensors:
+            if len(sensor.samples) < self.min_samples:
+                logging.warning(f"Not calibrating {station_id}/{sensor.sensor_id}: {len(sensor.samples)} baseline "
+                                f"readings, {self.min_samples} needed")
+                continue
+            try:
+                results[sensor.sensor_id] = compute_calibration(
+                    sensor.samples, sensor.rule_thresholds,
+                    threshold_sigmas=sensor.options.get("threshold_sigmas", self.threshold_sigmas),
+                    deadband_sigmas=sensor.options.get("deadband_sigmas", self.deadband_sigmas),
+                    min_deadband=sensor.options.get("min_deadband", self.min_deadband))
+            except ValueError as e:
+                logging.warning(f"Not calibrating {station_id}/{sensor.sensor_id}: {e}")
+                continue
+            logging.info(f"Calibrated {station_id}/{sensor.sensor_id}: thresholds {results[sensor.sensor_id]['thresholds']}, "
+                         f"deadband {results[sensor.sensor_id]['deadband']}")
+        if not results:
+            return # The retained config, and the thresholds in it, stay as they were
+
+        # Sensors calibrated earlier but not this time keep their thresholds
+        previous = self._published.get(station_id, {}).get("sensors", {})
+        station_calibration = {"sensors": dict(previous, **results), "calibrated_at": time.time()}
+        self._published[station_id] = station_calibration
+        if not self._publish(client, station_config_topic(station_id), station_calibration, retain=True):
+            return
+        self._scheduler.schedule(self.rate_window_seconds, self._report_rates, station_id, rate_before,
+                                 name=f"calibration_rates_{station_id}")
+
+    @staticmethod
+    def _publish(client, topic: str, message: Dict[str, Any], retain: bool = False) -> bool:
+        try:
+            client.publish(topic, json.dumps(message), qos=1, retain=retain)
+            return True
+        except Exception as e:
+            logging.error(f"Failed to publish on {topic}: {e}")
+            return False
+
+    def _report_rates(self, station_id: str, rate_before: float) -> None:
+        rate_after = self.rates.rate(station_id, self.rate_window_seconds)
+        self.reports[station_id] = {"before_per_second": round(rate_before, 2), "after_per_second": round(rate_after, 2)}
+        reduction = f", {rate_before / rate_after:.1f}x fewer" if rate_after > 0 else ""
+        logging.info(f"Station {station_id}: {rate_before:.2f} msg/s before calibration, {rate_after:.2f} msg/s after{reduction}")
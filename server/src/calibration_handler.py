@@ -0,0 +1,40 @@
+from typing import Dict, Any
+import paho.mqtt.client as mqtt
+
+from .message_handler_interface import MessageHandler
+from .server_state import ServerState
+from .calibration import CalibrationManager
+from .constants import ACTION_CALIBRATE, MQTT_TOPIC_SERVER_CONTROL, SESSION_STATE_RUNNING
+
+
+class CalibrationHandler(MessageHandler):
+    """
+    Handles the `calibrate` control action; other control messages go on to ControlMessageHandler.
+
+        {"action": "calibrate"}                                          every calibrated station
+        {"action": "calibrate", "station_id": "station_laser", "window_seconds": 5}
+
+    Calibration only opens a baseline window, so the server state is never changed.
+
+    Args:
+        calibration (CalibrationManager): Collects the baselines and pushes the thresholds.
+    """
+
+    def __init__(self, calibration: CalibrationManager):
+        self._calibration = calibration
+
+    def can_handle(self, topic: str, payload: Dict[str, Any], server_state: ServerState) -> bool:
+        return topic == MQTT_TOPIC_SERVER_CONTROL and payload.get("action") == ACTION_CALIBRATE
+
+    def handle(self, topic: str, payload: Dict[str, Any], client: mqtt.Client, server_state: ServerState) -> ServerState:
+        logger = server_state.logger
+        station_id = payload.get("station_id")
+        window_seconds = payload.get("window_seconds")
+        if window_seconds is not None and (not isinstance(window_seconds, (int, float)) or window_seconds <= 0):
+            logger.warning(f"Ignoring calibrate command: invalid window_seconds {window_seconds!r}")
+            return server_state
+        if server_state.session_state == SESSION_STATE_RUNNING:
+            # Players moving around would end up in the baseline
+            logger.warning("Calibrating while the session is RUNNING: the baseline may include player activity")
+        self._calibration.start(client, server_state.config, [station_id] if station_id else None, window_seconds)
+        return server_state
@@ -6,6 +6,22 @@ import os
 _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Default config path relative to this file's directory
 _DEFAULT_CONFIG_PATH = os.path.join(_CURRENT_DIR, 'config.json')
+# Set by `use_config`, e.g. in a worker process whose supervisor already loaded the configuration
+_PRELOADED_CONFIG = None
+
+def use_config(config):
+    """Hands an already loaded configuration to the startup code of this process (see `preloaded_config`).
+
+    Args:
+        config: The configuration, or None.
+    """
+    global _PRELOADED_CONFIG
+    _PRELOADED_CONFIG = config
+
+def preloaded_config():
+    """Returns the configuration set with `use_config`, or None. `load_config` always reads the file,
+    so a config reload still picks up changes."""
+    return _PRELOADED_CONFIG
 
 def load_config(config_path=None):
     """Loads configuration from a JSON file.
@@ -4,12 +4,31 @@ import logging
 # --- MQTT Topics ---
 MQTT_TOPIC_SERVER_CONTROL = "escaperoom/server/control"
 MQTT_TOPIC_STATION_BASE = "escaperoom/station/"
+MQTT_TOPIC_SERVER_STATE = "escaperoom/server/state" # Retained full snapshot
+MQTT_TOPIC_SERVER_STATE_DELTA = "escaperoom/server/state/delta"
+MQTT_TOPIC_LIVENESS_BASE = "escaperoom/server/liveness/" # + <station_id>, retained
+MQTT_TOPIC_SERVER_ALERTS = "escaperoom/server/alerts" # Operational alerts, e.g. a quarantined topic
+MQTT_TOPIC_STATION_EVENTS = MQTT_TOPIC_STATION_BASE + "+/event/+" # Matches escaperoom/station/<id>/event/<type>
+# Event type of the heartbeat a station sends when it has nothing else to report; it only proves liveness
+STATION_EVENT_HEARTBEAT = "heartbeat"
+
+# --- MQTT Client ---
+# Stable across restarts: the broker keeps the persistent session of this client id
+DEFAULT_MQTT_CLIENT_ID = "escape-room-server"
+MQTT_KEEPALIVE_SECONDS = 60
+MQTT_SUBSCRIPTION_QOS = 1 # The broker queues station events for us while we are disconnected
+
+# --- Runtime ---
+DEFAULT_LOG_FILE = '/app/logs/server.log' # used if not in config
+RUNTIME_MODE_SINGLE = "single" # Everything in one process (default)
+RUNTIME_MODE_MULTIPROCESS = "multiprocess" # Ingest, rule and audio processes; see multiprocess_runtime.py
 
 # --- Control Actions ---
 ACTION_START = "start"
 ACTION_STOP = "stop"
 ACTION_RESET = "reset"
 ACTION_RELOAD_CONFIG = "reload_config"
+ACTION_CALIBRATE = "calibrate" # Collect a baseline and push sensor thresholds to stations; see calibration.py
 
 # --- Session States ---
 SESSION_STATE_RUNNING = "RUNNING"
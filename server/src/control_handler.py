@@ -13,6 +13,7 @@ from .constants import (
 
 from .message_handler_interface import MessageHandler
 from .server_state import ServerState
+from .puzzle_graph import evaluate_progress
 
 # --- Helper Functions ---
 
@@ -113,11 +114,11 @@ class ControlMessageHandler(MessageHandler):
         # Create and return a new state instance ONLY if something changed
         if state_changed:
             server_state.logger.debug(f"Control action '{action}' resulted in state change. Creating new ServerState.")
-            return ServerState(
+            return server_state.replace( # Keeps the logger and any state this handler doesn't own
                 session_state=new_session_state,
                 station_status=new_station_status,
                 config=new_config,
-                logger=server_state.logger # Reuse the logger from the original state
+                puzzle_progress=evaluate_progress(new_config, new_station_status) # Full evaluation: status cleared or graph replaced
             )
         else:
             server_state.logger.debug(f"Control action '{action}' did not result in state change. Returning original ServerState.")
@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+DEFAULT_DASHBOARD_HOST = "0.0.0.0"
+DEFAULT_DASHBOARD_PORT = 8080
+# Number of recent deltas kept for SSE clients that fall behind
+EVENT_HISTORY_SIZE = 256
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+class _Published:
+    """An immutable, pre-serialized view of one published state version."""
+    __slots__ = ('version', 'snapshot_body', 'delta_event')
+
+    def __init__(self, version: int, snapshot: Dict[str, Any], delta: Dict[str, Any]):
+        self.version = version
+        self.snapshot_body = json.dumps({"version": version, "state": snapshot}).encode('utf-8')
+        self.delta_event = _sse_event("delta", {"version": version, "changes": delta}, version)
+
+
+def _sse_event(event: str, data: Dict[str, Any], version: int) -> bytes:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+class DashboardServer:
+    """
+    Read-only HTTP API for game masters.
+
+    Endpoints:
+        GET /state   The current state (session state, station status, liveness,
+                     puzzle progress, config version) as JSON.
+        GET /events  A server-sent event stream: the current state as a `snapshot`
+                     event, then a `delta` event for every published change.
+
+    The dashboard is fed by `StatePublisher` listeners on the scheduler thread, never
+    by the dispatch path. `update` serializes each version once and swaps it in as a
+    single reference; request threads only read that reference, so serving any number
+    of clients takes no lock shared with message handling.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): TCP port. 0 picks a free port (see `port`).
+    """
+
+    def __init__(self, host: str = DEFAULT_DASHBOARD_HOST, port: int = DEFAULT_DASHBOARD_PORT):
+        self._current: Optional[_Published] = None
+        self._history = deque(maxlen=EVENT_HISTORY_SIZE)
+        self._changed = threading.Condition()
+        self._stopping = False
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="dashboard", daemon=True)
+        self._thread.start()
+        logging.info(f"Dashboard listening on port {self.port}")
+
+    def stop(self) -> None:
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def update(self, version: int, delta: Dict[str, Any], snapshot: Dict[str, Any]) -> None:
+        """`StatePublisher` listener: publishes a new state version to HTTP clients."""
+        published = _Published(version, snapshot, delta)
+        with self._changed:
+            self._current = published
+            self._history.append(published)
+            self._changed.notify_all()
+
+    # --- Internals ---
+
+    def _events_after(self, version: int):
+        """Returns (events, up_to_date) for a client that has seen `version`."""
+        history = list(self._history)
+        if history and history[0].version > version + 1:
+            return None, False # Fell behind the history; resend a snapshot
+        return [p for p in history if p.version > version], True
+
+    def _make_handler(self):
+        dashboard = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/state':
+                    self._send_state()
+                elif path == '/events':
+                    self._stream_events()
+                else:
+                    self.send_error(404)
+
+            def _send_state(self):
+                current = dashboard._current
+                body = current.snapshot_body if current is not None else b'{"version": 0, "state": null}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream_events(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                last_version = -1
+                try:
+                    while True:
+                        current = dashboard._current
+                        if current is not None and last_version < 0:
+                            self._write(_sse_event("snapshot", json.loads(current.snapshot_body), current.version))
+                            last_version = current.version
+                        with dashboard._changed:
+                            if dashboard._stopping:
+                                return
+                            current = dashboard._current
+                            if current is None or current.version <= last_version:
+                                dashboard._changed.wait(SSE_KEEPALIVE_SECONDS)
+                            events, up_to_date = dashboard._events_after(last_version)
+                            if dashboard._stopping:
+                                return
+                        if not up_to_date:
+                            last_version = -1 # Send a fresh snapshot on the next iteration
+                            continue
+                        if not events:
+                            self._write(b": keepalive\n\n")
+                        for published in events:
+                            self._write(published.delta_event)
+                            last_version = published.version
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # Client went away
+
+            def _write(self, data: bytes):
+                self.wfile.write(data)
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                logging.debug(f"Dashboard {self.address_string()} - {format % args}")
+
+        return Handler
@@ -0,0 +1,115 @@
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from .binary_payload import binary_sequence
+
+DEFAULT_WINDOW_SECONDS = 2.0
+DEFAULT_MAX_ENTRIES = 1024
+
+# Matches an optional `"seq": <int>` field without parsing the JSON payload
+_SEQ_PATTERN = re.compile(rb'"seq"\s*:\s*(\d+)')
+_CRC_KEY = 'crc'
+
+
+class DuplicateFilter:
+    """
+    Drops repeated station messages before they reach JSON parsing and dispatch.
+
+    A message is a duplicate if the same sequence number was seen on the same topic
+    within `window_seconds` (the `seq` field of a JSON payload or the header of a
+    binary one). A payload without one is keyed by a CRC32 of its raw bytes, and is
+    only a duplicate of the topic's previous payload: a station really can go back
+    to an earlier state (door OPEN, CLOSED, OPEN) within the window. Entries live in
+    LRUs bounded by `max_entries`, so memory stays constant under any message rate;
+    lookups, inserts and evictions are all O(1).
+
+    Attributes:
+        checked (int): Number of messages checked.
+        duplicates_dropped (int): Number of messages reported as duplicates.
+    """
+
+    def __init__(self, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._seen = OrderedDict() # (topic, seq key) -> time last seen, oldest first
+        self._last_payload = OrderedDict() # topic -> (crc key, time) of its last payload without seq
+        self.checked = 0
+        self.duplicates_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._seen) + len(self._last_payload)
+
+    @staticmethod
+    def message_key(payload: bytes) -> Hashable:
+        """Returns the dedup key of a raw payload: its sequence number if present, else a CRC32."""
+        seq = binary_sequence(payload)
+        if seq is not None:
+            return ('seq', seq)
+        match = _SEQ_PATTERN.search(payload)
+        if match is not None:
+            return ('seq', int(match.group(1)))
+        return (_CRC_KEY, zlib.crc32(payload), len(payload))
+
+    def is_duplicate(self, topic: str, payload: bytes, key: Optional[Hashable] = None) -> bool:
+        """
+        Records the message and returns True if it was already seen within the window.
+
+        Args:
+            topic (str): The MQTT topic of the message.
+            payload (bytes): The raw, undecoded payload.
+            key (Optional[Hashable]): Precomputed dedup key, overriding `message_key`.
+        """
+        now = self._clock()
+        self.checked += 1
+        if key is None:
+            key = self.message_key(payload)
+        if isinstance(key, tuple) and key[0] == _CRC_KEY:
+            return self._repeats_last_payload(topic, key, now)
+        entry = (topic, key)
+        seen_at = self._seen.get(entry)
+        if seen_at is not None and now - seen_at <= self.window_seconds:
+            self._seen.move_to_end(entry) # Keep it hot, but keep the original time so bursts don't extend the window
+            self.duplicates_dropped += 1
+            return True
+
+        self._seen[entry] = now
+        self._seen.move_to_end(entry)
+        # Evict expired entries from the old end, and the oldest one when over capacity
+        while self._seen:
+            oldest_entry, oldest_time = next(iter(self._seen.items()))
+            if len(self._seen) > self.max_entries or now - oldest_time > self.window_seconds:
+                del self._seen[oldest_entry]
+            else:
+                break
+        return False
+
+    def _repeats_last_payload(self, topic: str, key: Hashable, now: float) -> bool:
+        last = self._last_payload.get(topic)
+        if last is not None and last[0] == key and now - last[1] <= self.window_seconds:
+            self._last_payload.move_to_end(topic) # Keep the original time, as for sequence numbers
+            self.duplicates_dropped += 1
+            return True
+        self._last_payload[topic] = (key, now)
+        self._last_payload.move_to_end(topic)
+        if len(self._last_payload) > self.max_entries:
+            self._last_payload.popitem(last=False)
+        return False
+
+    def clear(self) -> None:
+        self._seen.clear()
+        self._last_payload.clear()
+        self.checked = 0
+        self.duplicates_dropped = 0
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "duplicates_dropped": self.duplicates_dropped,
+            "entries": len(self),
+        }
@@ -0,0 +1,135 @@
+import heapq
+import json
+import logging
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import paho.mqtt.client as mqtt
+
+from .constants import MQTT_TOPIC_LIVENESS_BASE
+from .topics import describe_topic
+
+DEFAULT_HEARTBEAT_INTERVAL_SECONDS = 30.0
+# A station is declared offline after this many heartbeat intervals without a message
+MISSED_HEARTBEATS_BEFORE_OFFLINE = 2
+
+HEARTBEAT_CONFIG_KEY = "heartbeat_interval_seconds"
+DEFAULT_HEARTBEAT_CONFIG_KEY = "default_heartbeat_interval_seconds"
+
+
+def station_id_from_topic(topic: str) -> Optional[str]:
+    """Returns the station id of an `escaperoom/station/<station_id>/...` topic, or None."""
+    return describe_topic(topic).station_id
+
+
+def heartbeat_interval(config: Dict[str, Any], station_id: str) -> float:
+    """Reads the heartbeat interval of a station from `station_configs`, with a global default."""
+    station_config = config.get("station_configs", {}).get(station_id, {})
+    interval = station_config.get(HEARTBEAT_CONFIG_KEY)
+    if interval is None:
+        interval = config.get(DEFAULT_HEARTBEAT_CONFIG_KEY, DEFAULT_HEARTBEAT_INTERVAL_SECONDS)
+    return float(interval)
+
+
+class LivenessTracker:
+    """
+    Tracks when each station was last heard from and detects stations that went silent.
+
+    `touch` is O(1): it only records the time. Deadlines live in a min-heap holding at
+    most one entry per station. `expire` pops entries whose deadline has passed and,
+    if the station was heard from since the entry was pushed, pushes it back with its
+    real deadline; so each check costs O(k log n) for the k entries due, and there is
+    never a full scan of all stations.
+
+    The status map exposed by `status` is copy-on-write: it is replaced, never mutated,
+    so a reference taken by a reader stays consistent. All methods are thread-safe.
+
+    Args:
+        clock (Callable[[], float]): Monotonic time source used for deadlines.
+        wall_clock (Callable[[], float]): Time source for the reported `last_seen`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic,
+                 wall_clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._last_seen: Dict[str, float] = {} # station_id -> monotonic time
+        self._timeouts: Dict[str, float] = {} # station_id -> seconds of silence before offline
+        self._heap: List[Tuple[float, str]] = [] # (deadline, station_id)
+        self._in_heap = set()
+        self._status: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """The current {station_id: {"online": bool, "last_seen": float}} map. Do not mutate."""
+        return self._status
+
+    def touch(self, station_id: str, interval_seconds: float) -> bool:
+        """
+        Records a message from a station.
+
+        Args:
+            station_id (str): The station that sent a message.
+            interval_seconds (float): The station's heartbeat interval.
+
+        Returns:
+            bool: True if the station just came online (first message or back from offline).
+        """
+        now = self._clock()
+        with self._lock:
+            self._last_seen[station_id] = now
+            self._timeouts[station_id] = interval_seconds * MISSED_HEARTBEATS_BEFORE_OFFLINE
+            if station_id not in self._in_heap:
+                heapq.heappush(self._heap, (now + self._timeouts[station_id], station_id))
+                self._in_heap.add(station_id)
+            current = self._status.get(station_id)
+            if current is not None and current["online"]:
+                return False # Common case: no transition, last_seen is refreshed lazily
+            self._set_status(station_id, True, now)
+            return True
+
+    def expire(self) -> List[str]:
+        """Marks stations whose deadline passed as offline. Returns the stations that went offline."""
+        now = self._clock()
+        went_offline = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, station_id = heapq.heappop(self._heap)
+                deadline = self._last_seen[station_id] + self._timeouts[station_id]
+                if deadline > now:
+                    heapq.heappush(self._heap, (deadline, station_id)) # Heard from since, check again later
+                    continue
+                self._in_heap.discard(station_id)
+                self._set_status(station_id, False, self._last_seen[station_id])
+                went_offline.append(station_id)
+        return went_offline
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the status map with up-to-date `last_seen` times for online stations."""
+        with self._lock:
+            return {
+                station_id: {"online": status["online"],
+                             "last_seen": self._to_wall_time(self._last_seen[station_id])}
+                for station_id, status in self._status.items()
+            }
+
+    # --- Internals ---
+
+    def _to_wall_time(self, monotonic_time: float) -> float:
+        return self._wall_clock() - (self._clock() - monotonic_time)
+
+    def _set_status(self, station_id: str, online: bool, seen_at: float) -> None:
+        new_status = dict(self._status)
+        new_status[station_id] = {"online": online, "last_seen": self._to_wall_time(seen_at)}
+        self._status = new_status
+
+
+def publish_liveness(client: mqtt.Client, station_id: str, status: Dict[str, Any]) -> None:
+    """Publishes a station's online/offline status as a retained message."""
+    topic = f"{MQTT_TOPIC_LIVENESS_BASE}{station_id}"
+    payload = json.dumps({"station_id": station_id, **status})
+    try:
+        client.publish(topic, payload, qos=1, retain=True)
+    except Exception as e:
+        logging.error(f"Failed to publish liveness of {station_id}: {e}")
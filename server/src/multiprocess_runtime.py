@@ -0,0 +1,508 @@
+"""
+Multi-process runtime: MQTT ingest, rule evaluation and audio run in separate processes.
+
+    ingest process --ingest ring--> rule process --cue ring--> audio process
+
+- The ingest process owns the broker connection (the persistent session of the
+  single-process server) and the serial transport, and copies every message, with
+  its arrival time, into the ingest ring without decoding it.
+- The rule process is the single-process server minus the network and audio: it
+  decodes and dispatches records through `server.on_message`, runs the timers, the
+  state publisher and the dashboard, and publishes over its own broker connection.
+  Cues and background music changes are forwarded to the cue ring.
+- The audio process decodes and mixes sounds.
+
+The supervisor loads the configuration once and hands it to every worker.
+
+The rings are `ShmRing`s of fixed-size records created by the supervisor, so they
+outlive the workers: a restarted worker picks up where its predecessor stopped. A
+restarted rule process starts from a fresh session state, as after a server restart.
+
+Enable with `"runtime": {"mode": "multiprocess"}` in config.json, or run directly:
+    python -m src.multiprocess_runtime
+"""
+import logging
+import multiprocessing
+import signal
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config_loader import load_config, use_config
+from .logging_utils import setup_logging
+from .shm_ring import ShmRing
+from .constants import (
+    MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_EVENTS,
+    DEFAULT_MQTT_CLIENT_ID, MQTT_KEEPALIVE_SECONDS, MQTT_SUBSCRIPTION_QOS, DEFAULT_LOG_FILE
+)
+
+RUNTIME_CONFIG_KEY = 'runtime'
+DEFAULT_INGEST_RING_CAPACITY = 4096
+DEFAULT_INGEST_RECORD_BYTES = 1024 # Topic and payload of one message; station payloads are far smaller
+DEFAULT_CUE_RING_CAPACITY = 256
+CUE_RECORD_BYTES = 256
+DEFAULT_RESTART_DELAY_SECONDS = 1.0
+DEFAULT_MAX_RESTART_DELAY_SECONDS = 30.0
+# A worker that ran this long before dying gets the initial restart delay again
+STABLE_RUN_SECONDS = 60.0
+SUPERVISOR_POLL_SECONDS = 0.5
+RING_POLL_SECONDS = 0.2 # Longest a worker waits on its ring before checking for shutdown
+FULL_RING_RETRY_SECONDS = 0.005 # How often a producer waiting for room checks the ring again
+# Longest paho's network thread waits for room for a QoS 1 or control message. It stops
+# reading from the broker meanwhile, well within the keepalive
+INGEST_BACKPRESSURE_SECONDS = 5.0
+MUSIC_CHANGE_WAIT_SECONDS = 1.0 # Cues go stale quickly, a music change does not
+WORKER_STOP_TIMEOUT_SECONDS = 5.0
+RULES_CLIENT_ID_SUFFIX = "-rules" # The ingest process holds the persistent session under the plain client id
+
+# --- Records ---
+# Ingest record: <kind u8> <flags u8> <received_at f64> <topic length u16> <topic> <payload>
+INGEST_HEADER = struct.Struct('<BBdH')
+RECORD_MESSAGE = 1
+RECORD_CONNECTED = 2 # flags: session present
+RECORD_DISCONNECTED = 3
+# Cue record: <kind u8> <requested_at f64> <gain f32> <sound file name>
+CUE_HEADER = struct.Struct('<Bdf')
+CUE_PLAY = 1
+CUE_MUSIC_ON = 2
+CUE_MUSIC_OFF = 3
+
+# (shared memory name, doorbell) of a ring, as handed to a worker process
+RingHandle = Tuple[str, Any]
+
+
+def pack_ingest_record(kind: int, received_at: float, topic: str = '', payload: bytes = b'', flags: int = 0) -> bytes:
+    topic_bytes = topic.encode('utf-8')
+    return INGEST_HEADER.pack(kind, flags, received_at, len(topic_bytes)) + topic_bytes + payload
+
+
+def unpack_ingest_record(record: bytes) -> Tuple[int, int, float, str, bytes]:
+    """Returns (kind, flags, received_at, topic, payload)."""
+    kind, flags, received_at, topic_length = INGEST_HEADER.unpack_from(record, 0)
+    topic_end = INGEST_HEADER.size + topic_length
+    return kind, flags, received_at, record[INGEST_HEADER.size:topic_end].decode('utf-8'), record[topic_end:]
+
+
+def pack_cue_record(kind: int, requested_at: float, sound_file_name: str = '', gain: float = 1.0) -> bytes:
+    return CUE_HEADER.pack(kind, requested_at, gain) + sound_file_name.encode('utf-8')
+
+
+def unpack_cue_record(record: bytes) -> Tuple[int, float, str, float]:
+    """Returns (kind, requested_at, sound_file_name, gain)."""
+    kind, requested_at, gain = CUE_HEADER.unpack_from(record, 0)
+    return kind, requested_at, record[CUE_HEADER.size:].decode('utf-8'), gain
+
+
+class RingMessage:
+    """An ingest record, shaped like paho's MQTTMessage for `on_message`."""
+    __slots__ = ('topic', 'payload', 'qos', 'retain')
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class RingWriter:
+    """
+    Producer side of a ring, shared by the threads of the producing process (e.g.
+    paho's network thread and the serial transport). By default a record is dropped
+    when the ring is full instead of blocking the caller; `put` can wait for room
+    instead, which holds the caller back (backpressure). Drops are counted and logged.
+
+    Args:
+        ring (ShmRing): The ring to write to.
+        description (str): The consumer, for the logs.
+        should_run (Callable[[], bool]): False once a caller waiting without a time
+                    limit should give up, e.g. on shutdown.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+    # Log the first drop, then every this many
+    DROP_LOG_INTERVAL = 1000
+
+    def __init__(self, ring: ShmRing, description: str, should_run: Callable[[], bool] = lambda: True,
+                 clock=time.monotonic):
+        self.ring = ring
+        self.description = description
+        self.dropped = 0
+        self._should_run = should_run
+        self._clock = clock
+        self._lock = threading.Lock() # The ring takes a single producer
+
+    def put(self, record: bytes, wait_seconds: Optional[float] = 0.0) -> bool:
+        """
+        Appends a record, waiting up to `wait_seconds` for room if the ring is full.
+
+        Args:
+            record (bytes): The record.
+            wait_seconds (Optional[float]): 0 drops the record right away if the ring is full;
+                    None waits until there is room or `should_run` turns False.
+
+        Returns:
+            bool: False if the record was dropped.
+        """
+        deadline = None if wait_seconds is None else self._clock() + wait_seconds
+        while True:
+            try:
+                with self._lock:
+                    if self.ring.put(record):
+                        return True
+            except ValueError as e:
+                logging.error(f"Dropping record for the {self.description}: {e}")
+                return False
+            if (deadline is not None and self._clock() >= deadline) or (deadline is None and not self._should_run()):
+                break
+            time.sleep(FULL_RING_RETRY_SECONDS)
+        if self.dropped % self.DROP_LOG_INTERVAL == 0:
+            logging.warning(f"The {self.description} is not keeping up: ring full, "
+                            f"{self.dropped + 1} record(s) dropped so far")
+        self.dropped += 1
+        return False
+
+
+class CueForwarder:
+    """Sends the cues and music changes requested in the rule process to the audio process."""
+
+    def __init__(self, writer: RingWriter, clock=time.monotonic):
+        self._writer = writer
+        self._clock = clock
+
+    def play_cue(self, sound_file_name: str, gain: float) -> None:
+        self._writer.put(pack_cue_record(CUE_PLAY, self._clock(), sound_file_name, gain))
+
+    def set_music(self, playing: bool) -> None:
+        self._writer.put(pack_cue_record(CUE_MUSIC_ON if playing else CUE_MUSIC_OFF, self._clock()),
+                         wait_seconds=MUSIC_CHANGE_WAIT_SECONDS)
+
+
+class _Worker:
+    __slots__ = ('name', 'target', 'args', 'process', 'started_at', 'restart_at', 'delay', 'restarts')
+
+    def __init__(self, name: str, target: Callable, args: tuple, delay: float):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.process = None
+        self.started_at = 0.0
+        self.restart_at: Optional[float] = None
+        self.delay = delay
+        self.restarts = 0
+
+
+class Supervisor:
+    """
+    Starts worker processes and restarts the ones that die.
+
+    A crashed worker is restarted after `restart_delay_seconds`, doubling up to
+    `max_restart_delay_seconds` while it keeps crashing soon after starting; a worker
+    that ran for `stable_seconds` starts over at the initial delay. Workers are told
+    to shut down through `stop_event`, which they pass to `worker_should_run`.
+
+    Args:
+        context: The multiprocessing context that creates the processes.
+        stop_event: A `context.Event()` shared with the workers.
+        restart_delay_seconds (float): Delay before the first restart.
+        max_restart_delay_seconds (float): Upper bound of the delay.
+        stable_seconds (float): Run time after which a crash counts as the first one.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+
+    def __init__(self, context, stop_event, restart_delay_seconds: float = DEFAULT_RESTART_DELAY_SECONDS,
+                 max_restart_delay_seconds: float = DEFAULT_MAX_RESTART_DELAY_SECONDS,
+                 stable_seconds: float = STABLE_RUN_SECONDS, clock=time.monotonic):
+        self._context = context
+        self.stop_event = stop_event
+        self.restart_delay_seconds = restart_delay_seconds
+        self.max_restart_delay_seconds = max_restart_delay_seconds
+        self.stable_seconds = stable_seconds
+        self._clock = clock
+        self._workers: Dict[str, _Worker] = {}
+        self._stopping = False
+
+    @property
+    def restarts(self) -> Dict[str, int]:
+        return {name: worker.restarts for name, worker in self._workers.items()}
+
+    def pid(self, name: str) -> Optional[int]:
+        process = self._workers[name].process
+        return process.pid if process is not None else None
+
+    def add(self, name: str, target: Callable, args: tuple = ()) -> None:
+        """Registers a worker. `target(*args)` must be importable by the worker process."""
+        self._workers[name] = _Worker(name, target, args, self.restart_delay_seconds)
+
+    def start(self) -> None:
+        for worker in self._workers.values():
+            self._spawn(worker)
+
+    def poll(self) -> List[str]:
+        """
+        Schedules restarts of dead workers and performs the due ones.
+
+        Returns:
+            List[str]: Names of the workers restarted by this call.
+        """
+        restarted = []
+        if self._stopping:
+            return restarted
+        now = self._clock()
+        for worker in self._workers.values():
+            if worker.restart_at is None:
+                if worker.process.is_alive():
+                    continue
+                if now - worker.started_at >= self.stable_seconds:
+                    worker.delay = self.restart_delay_seconds
+                logging.error(f"Worker '{worker.name}' (pid {worker.process.pid}) exited with code "
+                              f"{worker.process.exitcode}; restarting in {worker.delay:.1f}s")
+                worker.process.join()
+                worker.restart_at = now + worker.delay
+                worker.delay = min(worker.delay * 2, self.max_restart_delay_seconds)
+            if now >= worker.restart_at:
+                worker.restarts += 1
+                self._spawn(worker)
+                restarted.append(worker.name)
+        return restarted
+
+    def stop(self, timeout: float = WORKER_STOP_TIMEOUT_SECONDS) -> None:
+        """Asks every worker to exit and terminates the ones still running after `timeout` seconds."""
+        self._stopping = True
+        self.stop_event.set()
+        deadline = self._clock() + timeout
+        for worker in self._workers.values():
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - self._clock()))
+            if worker.process.is_alive():
+                logging.warning(f"Worker '{worker.name}' did not stop in time; terminating it")
+                worker.process.terminate()
+                worker.process.join()
+
+    # --- Internals ---
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.process = self._context.Process(target=worker.target, args=worker.args,
+                                               name=f"escape-room-{worker.name}", daemon=True)
+        worker.process.start()
+        worker.started_at = self._clock()
+        worker.restart_at = None
+        logging.info(f"Started worker '{worker.name}' (pid {worker.process.pid})")
+
+
+def worker_should_run(stop_event) -> bool:
+    """False once the supervisor asked to stop or is gone."""
+    parent = multiprocessing.parent_process()
+    return not stop_event.is_set() and (parent is None or parent.is_alive())
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    # Ctrl-C reaches the whole process group; only the supervisor acts on it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    use_config(config) # The server module starts from the supervisor's configuration
+    setup_logging(config.get('log_file', DEFAULT_LOG_FILE))
+
+
+# --- Workers ---
+
+def run_ingest_worker(config: Dict[str, Any], ingest_ring: RingHandle, stop_event) -> None:
+    """Receives from the broker and the serial transport into the ingest ring."""
+    import paho.mqtt.client as mqtt
+    from .reconnect import ReconnectPolicy
+
+    _init_worker(config)
+    writer = RingWriter(ShmRing.attach(*ingest_ring), "rule process", lambda: worker_should_run(stop_event))
+    clock = time.monotonic
+
+    def on_connect(client, userdata, flags, rc):
+        if rc != 0:
+            logging.error(f"Failed to connect, return code {rc}")
+            return
+        session_present = bool(flags.get('session present')) if isinstance(flags, dict) else False
+        logging.info(f"Connected to MQTT Broker! (session present: {session_present})")
+        # Never dropped: the rule process would miss the catch-up or the reconnection
+        writer.put(pack_ingest_record(RECORD_CONNECTED, clock(), flags=int(session_present)), wait_seconds=None)
+        client.subscribe(MQTT_TOPIC_SERVER_CONTROL, qos=MQTT_SUBSCRIPTION_QOS)
+        client.subscribe(MQTT_TOPIC_STATION_EVENTS, qos=MQTT_SUBSCRIPTION_QOS)
+
+    def on_disconnect(client, userdata, rc):
+        logging.warning(f"Disconnected from MQTT Broker with code: {rc}")
+        if rc != 0:
+            writer.put(pack_ingest_record(RECORD_DISCONNECTED, clock()), wait_seconds=None)
+            policy.apply(client)
+
+    def on_message(client, userdata, msg):
+        # QoS 1 and control messages hold back paho's network thread rather than being dropped;
+        # the broker keeps what it has not delivered yet in the persistent session
+        wait_seconds = INGEST_BACKPRESSURE_SECONDS if msg.qos > 0 or msg.topic == MQTT_TOPIC_SERVER_CONTROL else 0.0
+        writer.put(pack_ingest_record(RECORD_MESSAGE, clock(), msg.topic, msg.payload), wait_seconds=wait_seconds)
+
+    policy = ReconnectPolicy(**_reconnect_policy_settings(config))
+    broker = config['mqtt_broker']
+    client = mqtt.Client(client_id=broker.get('client_id', DEFAULT_MQTT_CLIENT_ID), clean_session=False)
+    policy.apply(client)
+    client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
+    client.on_message = on_message
+    client.connect_async(broker['host'], broker['port'], MQTT_KEEPALIVE_SECONDS)
+    client.loop_start()
+
+    serial_transport = None
+    serial_config = config.get('serial', {})
+    if serial_config.get('enabled', False) and serial_config.get('ports'):
+        from .serial_transport import SerialTransport, DEFAULT_BAUD_RATE, DEFAULT_RECONNECT_SECONDS
+        serial_transport = SerialTransport(
+            serial_config['ports'], lambda msg: on_message(None, None, msg),
+            baud_rate=serial_config.get('baud_rate', DEFAULT_BAUD_RATE),
+            reconnect_seconds=serial_config.get('reconnect_seconds', DEFAULT_RECONNECT_SECONDS)
+        )
+        serial_transport.start()
+    try:
+        while worker_should_run(stop_event):
+            stop_event.wait(RING_POLL_SECONDS)
+    finally:
+        if serial_transport is not None:
+            serial_transport.stop()
+        client.loop_stop()
+        client.disconnect()
+        writer.ring.close()
+
+
+def run_rules_worker(config: Dict[str, Any], ingest_ring: RingHandle, cue_ring: RingHandle, stop_event) -> None:
+    """Dispatches ingest records through the server's handlers and forwards cues to the audio process."""
+    import paho.mqtt.client as mqtt
+
+    _init_worker(config)
+    from . import server # Builds the server's state components from `config`
+    from .audio_utils import forward_audio
+
+    ingest = ShmRing.attach(*ingest_ring)
+    cues = RingWriter(ShmRing.attach(*cue_ring), "audio process")
+    forward_audio(CueForwarder(cues))
+
+    # Publishing only; the ingest process holds the subscriptions and the persistent session
+    broker = server.CONFIG['mqtt_broker']
+    client = mqtt.Client(client_id=broker.get('client_id', DEFAULT_MQTT_CLIENT_ID) + RULES_CLIENT_ID_SUFFIX)
+    server.RECONNECT_POLICY.apply(client)
+    client.connect_async(broker['host'], broker['port'], MQTT_KEEPALIVE_SECONDS)
+    client.loop_start()
+
+    server.TIMER_SCHEDULER.start()
+    dashboard = server.start_dashboard()
+    server.STATE_PUBLISHER.start(client)
+    next_liveness_check = time.monotonic()
+    try:
+        while worker_should_run(stop_event):
+            record = ingest.get(timeout=RING_POLL_SECONDS)
+            if record is not None:
+                apply_ingest_record(server, client, record)
+            now = time.monotonic()
+            if now >= next_liveness_check:
+                server.check_station_liveness(client)
+                next_liveness_check = now + server.MAIN_LOOP_SLEEP_SECONDS
+    finally:
+        if dashboard is not None:
+            dashboard.stop()
+        server.STATE_PUBLISHER.stop()
+        server.TIMER_SCHEDULER.stop()
+        client.loop_stop()
+        client.disconnect()
+        ingest.close()
+        cues.ring.close()
+
+
+def apply_ingest_record(server, client, record: bytes) -> None:
+    """Applies one ingest record in the rule process."""
+    kind, flags, _, topic, payload = unpack_ingest_record(record)
+    if kind == RECORD_MESSAGE:
+        server.on_message(client, None, RingMessage(topic, payload))
+    elif kind == RECORD_CONNECTED:
+        with server.DISPATCH_LOCK:
+            server.note_broker_connected(client, bool(flags))
+        server.STARTUP_REPORT.complete("first broker connection")
+    elif kind == RECORD_DISCONNECTED:
+        server.note_broker_disconnected()
+
+
+def run_audio_worker(config: Dict[str, Any], cue_ring: RingHandle, stop_event) -> None:
+    """Plays the cues and background music requested by the rule process."""
+    from .audio_utils import (
+        configure_audio, start_audio_engine, stop_audio_engine, warm_up_audio,
+        play_audio_threaded, update_background_music
+    )
+
+    _init_worker(config)
+    configure_audio(config)
+    start_audio_engine(config)
+    warm_up_audio(config)
+    ring = ShmRing.attach(*cue_ring)
+    try:
+        while worker_should_run(stop_event):
+            record = ring.get(timeout=RING_POLL_SECONDS)
+            if record is None:
+                continue
+            kind, _, sound_file_name, gain = unpack_cue_record(record)
+            if kind == CUE_PLAY:
+                play_audio_threaded(sound_file_name, gain=gain)
+            else:
+                update_background_music(kind == CUE_MUSIC_ON, config)
+    finally:
+        stop_audio_engine()
+        ring.close()
+
+
+def _reconnect_policy_settings(config: Dict[str, Any]) -> Dict[str, float]:
+    from .reconnect import DEFAULT_MIN_RECONNECT_SECONDS, DEFAULT_MAX_RECONNECT_SECONDS, DEFAULT_RECONNECT_JITTER
+    reconnect_config = config.get('reconnect', {})
+    return {
+        'min_seconds': reconnect_config.get('min_delay_seconds', DEFAULT_MIN_RECONNECT_SECONDS),
+        'max_seconds': reconnect_config.get('max_delay_seconds', DEFAULT_MAX_RECONNECT_SECONDS),
+        'jitter': reconnect_config.get('jitter', DEFAULT_RECONNECT_JITTER),
+    }
+
+
+def run_multiprocess(config: Dict[str, Any]) -> None:
+    """Creates the rings, starts the workers and supervises them until interrupted."""
+    runtime_config = config.get(RUNTIME_CONFIG_KEY, {})
+    # Spawned, not forked: the workers start from a clean interpreter without the parent's threads
+    context = multiprocessing.get_context('spawn')
+    ingest = ShmRing.create(runtime_config.get('ingest_ring_capacity', DEFAULT_INGEST_RING_CAPACITY),
+                            runtime_config.get('ingest_record_bytes', DEFAULT_INGEST_RECORD_BYTES),
+                            context.Semaphore(0))
+    cues = ShmRing.create(runtime_config.get('cue_ring_capacity', DEFAULT_CUE_RING_CAPACITY),
+                          CUE_RECORD_BYTES, context.Semaphore(0))
+    ingest_handle = (ingest.name, ingest.doorbell)
+    cue_handle = (cues.name, cues.doorbell)
+
+    supervisor = Supervisor(
+        context, context.Event(),
+        restart_delay_seconds=runtime_config.get('restart_delay_seconds', DEFAULT_RESTART_DELAY_SECONDS),
+        max_restart_delay_seconds=runtime_config.get('max_restart_delay_seconds', DEFAULT_MAX_RESTART_DELAY_SECONDS)
+    )
+    # Consumers first, so nothing waits long in the rings at startup
+    supervisor.add('audio', run_audio_worker, (config, cue_handle, supervisor.stop_event))
+    supervisor.add('rules', run_rules_worker, (config, ingest_handle, cue_handle, supervisor.stop_event))
+    supervisor.add('ingest', run_ingest_worker, (config, ingest_handle, supervisor.stop_event))
+
+    def on_terminate(signum, frame):
+        raise KeyboardInterrupt # `docker stop` sends SIGTERM: shut the workers down like Ctrl-C
+
+    signal.signal(signal.SIGTERM, on_terminate)
+    supervisor.start()
+    logging.info("Multi-process runtime running (ingest, rules, audio)")
+    try:
+        while True:
+            supervisor.poll()
+            time.sleep(SUPERVISOR_POLL_SECONDS)
+    except KeyboardInterrupt:
+        logging.info("Shutting down server...")
+    finally:
+        supervisor.stop()
+        ingest.close()
+        cues.close()
+
+
+if __name__ == "__main__":
+    CONFIG = load_config()
+    setup_logging(CONFIG.get('log_file', DEFAULT_LOG_FILE))
+    run_multiprocess(CONFIG)
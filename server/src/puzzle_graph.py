@@ -0,0 +1,244 @@
+import heapq
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+PUZZLE_GRAPH_CONFIG_KEY = "puzzle_graph"
+
+
+class PuzzleGraphError(ValueError):
+    """Raised for an invalid `puzzle_graph` configuration (unknown shape or a cycle)."""
+
+
+def is_station_completed(station_status: Dict[str, Any], station_id: str) -> bool:
+    status = station_status.get(station_id)
+    return isinstance(status, dict) and status.get("completed") is True
+
+
+class PuzzleGraph:
+    """
+    The puzzle dependency graph of a room, declared in config.json:
+
+        "puzzle_graph": {
+            "station_5": {"requires": []},
+            "station_door": {"requires": ["station_5"]}
+        }
+
+    A station is unlocked once every station it requires is solved, and solved once
+    it is completed while unlocked. Stations named only in a `requires` list are
+    roots. Immutable; build it with `from_config`.
+
+    Attributes:
+        order (Tuple[str, ...]): Stations in topological order (requirements first).
+        requires (Dict[str, Tuple[str, ...]]): Direct requirements of each station.
+        dependents (Dict[str, Tuple[str, ...]]): Stations that directly require each station.
+        rank (Dict[str, int]): Position of each station in `order`.
+    """
+
+    def __init__(self, requires: Dict[str, Iterable[str]]):
+        self.requires = {station_id: tuple(required) for station_id, required in requires.items()}
+        for required in list(self.requires.values()):
+            for station_id in required:
+                self.requires.setdefault(station_id, ())
+        dependents: Dict[str, List[str]] = {station_id: [] for station_id in self.requires}
+        for station_id, required in self.requires.items():
+            for requirement in required:
+                dependents[requirement].append(station_id)
+        self.dependents = {station_id: tuple(stations) for station_id, stations in dependents.items()}
+        self.order = self._topological_order()
+        self.rank = {station_id: rank for rank, station_id in enumerate(self.order)}
+
+    @classmethod
+    def from_config(cls, graph_config: Dict[str, Any]) -> 'PuzzleGraph':
+        """
+        Raises:
+            PuzzleGraphError: If the configuration is malformed or has a cycle.
+        """
+        if not isinstance(graph_config, dict):
+            raise PuzzleGraphError(f"'{PUZZLE_GRAPH_CONFIG_KEY}' must be an object of stations")
+        requires = {}
+        for station_id, node in graph_config.items():
+            required = node.get("requires", []) if isinstance(node, dict) else None
+            if not isinstance(required, list) or not all(isinstance(r, str) for r in required):
+                raise PuzzleGraphError(f"'requires' of {station_id} must be a list of station ids")
+            requires[station_id] = required
+        return cls(requires)
+
+    def __contains__(self, station_id: str) -> bool:
+        return station_id in self.requires
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    # --- Internals ---
+
+    def _topological_order(self) -> Tuple[str, ...]:
+        # Kahn's algorithm; ties broken by name so the order is stable across runs
+        missing = {station_id: len(required) for station_id, required in self.requires.items()}
+        ready = sorted(station_id for station_id, count in missing.items() if count == 0)
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            station_id = heapq.heappop(ready)
+            order.append(station_id)
+            for dependent in self.dependents[station_id]:
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        if len(order) != len(self.requires):
+            cycle = sorted(station_id for station_id, count in missing.items() if count > 0)
+            raise PuzzleGraphError(f"Puzzle graph has a cycle through: {', '.join(cycle)}")
+        return tuple(order)
+
+
+class PuzzleProgress:
+    """
+    Progress through a PuzzleGraph at one point in time. Immutable.
+
+    `update` re-evaluates only the stations reachable from the ones whose status
+    changed, in topological order, and stops wherever a station's solved state does
+    not flip; each station keeps a count of its unsolved requirements, so unlocking
+    a station costs one decrement per incoming edge. The cost of an update is
+    therefore proportional to the part of the graph the change affects, not to the
+    size of the room.
+
+    Attributes:
+        graph (PuzzleGraph): The graph this progress is measured against.
+        solved (FrozenSet[str]): Stations completed while unlocked.
+        available (FrozenSet[str]): Unlocked stations not yet solved.
+        evaluated (int): Stations re-evaluated by the update that produced this progress.
+    """
+
+    def __init__(self, graph: PuzzleGraph, missing: Dict[str, int], solved: FrozenSet[str],
+                 available: FrozenSet[str], evaluated: int = 0):
+        self.graph = graph
+        self._missing = missing # station_id -> number of unsolved requirements; never mutated
+        self.solved = solved
+        self.available = available
+        self.evaluated = evaluated
+        self._next_unlockable: Optional[List[str]] = None
+
+    @classmethod
+    def evaluate(cls, graph: PuzzleGraph, station_status: Dict[str, Any]) -> 'PuzzleProgress':
+        """Evaluates every station of the graph from scratch."""
+        missing = {station_id: len(required) for station_id, required in graph.requires.items()}
+        available = frozenset(station_id for station_id, count in missing.items() if count == 0)
+        return cls(graph, missing, frozenset(), available).update(station_status, graph.order)
+
+    def is_unlocked(self, station_id: str) -> bool:
+        """Whether events of a station count yet. Stations outside the graph are always unlocked."""
+        return self._missing.get(station_id, 0) == 0
+
+    @property
+    def percent_complete(self) -> float:
+        return 100.0 * len(self.solved) / len(self.graph) if len(self.graph) else 100.0
+
+    @property
+    def next_unlockable(self) -> List[str]:
+        """Locked stations that unlock once the currently available stations are solved."""
+        if self._next_unlockable is None:
+            candidates = {dependent for station_id in self.available for dependent in self.graph.dependents[station_id]}
+            self._next_unlockable = sorted(
+                station_id for station_id in candidates
+                if self._missing[station_id] > 0 and all(
+                    requirement in self.solved or requirement in self.available
+                    for requirement in self.graph.requires[station_id])
+            )
+        return self._next_unlockable
+
+    def update(self, station_status: Dict[str, Any], changed: Iterable[str]) -> 'PuzzleProgress':
+        """
+        Re-evaluates the stations whose status changed and everything downstream that flips.
+
+        Args:
+            station_status (Dict[str, Any]): The new station status map.
+            changed (Iterable[str]): Stations whose status may differ from the last update.
+
+        Returns:
+            PuzzleProgress: The new progress, or this one if nothing flipped.
+        """
+        graph = self.graph
+        missing, solved, available = self._missing, self.solved, self.available
+        new_missing: Optional[Dict[str, int]] = None
+        new_solved: Optional[Set[str]] = None
+        new_available: Optional[Set[str]] = None
+        queue = [(graph.rank[station_id], station_id) for station_id in set(changed) if station_id in graph]
+        heapq.heapify(queue)
+        queued = {station_id for _, station_id in queue}
+        evaluated = 0
+        while queue:
+            _, station_id = heapq.heappop(queue) # Requirements before dependents: each station is settled once
+            evaluated += 1
+            counts = new_missing if new_missing is not None else missing
+            is_solved = counts[station_id] == 0 and is_station_completed(station_status, station_id)
+            is_available = counts[station_id] == 0 and not is_solved
+            if is_available != (station_id in (new_available if new_available is not None else available)):
+                if new_available is None:
+                    new_available = set(available)
+                (new_available.add if is_available else new_available.discard)(station_id)
+            if is_solved == (station_id in (new_solved if new_solved is not None else solved)):
+                continue # Downstream stations can't be affected
+            if new_solved is None:
+                new_solved = set(solved)
+            (new_solved.add if is_solved else new_solved.discard)(station_id)
+            if new_missing is None:
+                new_missing = dict(missing)
+            for dependent in graph.dependents[station_id]:
+                new_missing[dependent] += -1 if is_solved else 1
+                if dependent not in queued:
+                    queued.add(dependent)
+                    heapq.heappush(queue, (graph.rank[dependent], dependent))
+        if new_solved is None and new_available is None:
+            return self
+        return PuzzleProgress(
+            graph,
+            new_missing if new_missing is not None else missing,
+            frozenset(new_solved) if new_solved is not None else solved,
+            frozenset(new_available) if new_available is not None else available,
+            evaluated
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "percent_complete": round(self.percent_complete, 1),
+            "solved": sorted(self.solved),
+            "available": sorted(self.available),
+            "next_unlockable": self.next_unlockable,
+        }
+
+
+# (config object, graph) of the last config whose graph was built; configs are replaced, never mutated
+_graph_cache: Tuple[Any, Optional[PuzzleGraph]] = (None, None)
+
+
+def puzzle_graph(config: Dict[str, Any]) -> Optional[PuzzleGraph]:
+    """Returns the puzzle graph of a configuration, built once per config object. None if not configured or invalid."""
+    global _graph_cache
+    cached_config, cached_graph = _graph_cache
+    if cached_config is config:
+        return cached_graph
+    graph = None
+    graph_config = config.get(PUZZLE_GRAPH_CONFIG_KEY)
+    if graph_config:
+        try:
+            graph = PuzzleGraph.from_config(graph_config)
+        except PuzzleGraphError as e:
+            logging.error(f"Ignoring puzzle graph: {e}")
+    _graph_cache = (config, graph)
+    return graph
+
+
+def evaluate_progress(config: Dict[str, Any], station_status: Dict[str, Any]) -> Optional[PuzzleProgress]:
+    """Evaluates progress from scratch, e.g. after a reset or a config reload. None without a graph."""
+    graph = puzzle_graph(config)
+    return PuzzleProgress.evaluate(graph, station_status) if graph is not None else None
+
+
+def current_progress(server_state) -> Optional[PuzzleProgress]:
+    """The progress carried by a ServerState, re-evaluated only if it belongs to another config's graph."""
+    graph = puzzle_graph(server_state.config)
+    progress = server_state.puzzle_progress
+    if graph is None:
+        return None
+    if progress is None or progress.graph is not graph:
+        progress = PuzzleProgress.evaluate(graph, server_state.station_status)
+    return progress
@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .timer_wheel import TimerScheduler, Timer
+
+DEFAULT_MIN_RECONNECT_SECONDS = 1.0
+DEFAULT_MAX_RECONNECT_SECONDS = 60.0
+# The backoff sequence is scaled by a random factor in [1 - jitter, 1], so a fleet of
+# clients that lost the same broker doesn't reconnect in lockstep
+DEFAULT_RECONNECT_JITTER = 0.5
+
+DEFAULT_QUIET_SECONDS = 0.25
+DEFAULT_MAX_CATCH_UP_SECONDS = 5.0
+
+# (topic, payload, station_id) of one buffered station event
+CatchUpMessage = Tuple[str, Dict[str, Any], str]
+
+
+class ReconnectPolicy:
+    """
+    Exponential reconnect backoff with jitter, applied through paho's own reconnect loop.
+
+    Paho doubles the reconnect delay from `min_delay` up to `max_delay`. Before each
+    reconnect cycle `apply` sets `min_delay` to a jittered base, which scales the whole
+    doubling sequence by a random factor.
+
+    Args:
+        min_seconds (float): First reconnect delay before jitter.
+        max_seconds (float): Upper bound of the delay.
+        jitter (float): Fraction of the delay that is randomized, in [0, 1].
+        rng (random.Random): Source of randomness.
+    """
+
+    def __init__(self, min_seconds: float = DEFAULT_MIN_RECONNECT_SECONDS,
+                 max_seconds: float = DEFAULT_MAX_RECONNECT_SECONDS,
+                 jitter: float = DEFAULT_RECONNECT_JITTER, rng: Optional[random.Random] = None):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+    def first_delay(self) -> float:
+        return self.min_seconds * (1.0 - self.jitter * self._rng.random())
+
+    def apply(self, client) -> float:
+        """Sets the client's reconnect delays for the next cycle. Returns the first delay."""
+        delay = self.first_delay()
+        # Unrounded: paho takes float delays, and whole seconds would flatten the jitter
+        client.reconnect_delay_set(min_delay=delay, max_delay=max(delay, self.max_seconds))
+        return delay
+
+
+class CatchUpBuffer:
+    """
+    Collects the backlog delivered after a reconnect so it can be applied as one batch.
+
+    With a persistent session the broker replays every station event queued while the
+    server was away, back to back. While catching up, station events are added here
+    instead of being dispatched. Only the latest reading of each sensor is kept: a
+    newer reading on the same topic (and `sensor` field) supersedes the older one.
+    A triggering reading (see `is_trigger`) is never lost that way: the latest one
+    of each sensor is applied just before the sensor's latest reading, so a puzzle
+    solved during the outage still counts.
+    The batch is handed to `on_batch` once no message has arrived for
+    `quiet_seconds`, or after `max_seconds` at the latest, whichever comes first.
+
+    `on_batch(client, messages, stats)` receives the client passed to `begin`, the
+    surviving readings in arrival order of their latest value, and stats about the
+    recovery: `downtime_seconds` (disconnect to reconnect), `catch_up_seconds`
+    (reconnect to batch), `recovery_seconds` (disconnect to batch), and the
+    `received` and `applied` message counts.
+
+    Args:
+        scheduler (TimerScheduler): Runs the quiet-period timer.
+        on_batch (Callable): Applies a drained batch.
+        quiet_seconds (float): Silence that ends the catch-up.
+        max_seconds (float): Longest catch-up; bounds the delay of live traffic.
+        apply_lock: Lock serializing message dispatch. Held by the timer while it drains
+                    and applies the batch, so no live message can overtake the backlog.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+        is_trigger (Callable[[str, Dict[str, Any], str], bool]): Whether a reading
+                    (topic, payload, station_id) triggers a rule. Without it every
+                    reading may be superseded.
+    """
+
+    def __init__(self, scheduler: TimerScheduler,
+                 on_batch: Callable[[Any, List[CatchUpMessage], Dict[str, Any]], None],
+                 quiet_seconds: float = DEFAULT_QUIET_SECONDS,
+                 max_seconds: float = DEFAULT_MAX_CATCH_UP_SECONDS, apply_lock=None, clock=time.monotonic,
+                 is_trigger: Optional[Callable[[str, Dict[str, Any], str], bool]] = None):
+        self._scheduler = scheduler
+        self._on_batch = on_batch
+        self.quiet_seconds = quiet_seconds
+        self.max_seconds = max_seconds
+        self._apply_lock = apply_lock if apply_lock is not None else nullcontext()
+        self._clock = clock
+        self._is_trigger = is_trigger
+        self._lock = threading.Lock()
+        self._active = False
+        self._latest: Dict[Tuple[str, Any], CatchUpMessage] = {}
+        self._triggers: Dict[Tuple[str, Any], CatchUpMessage] = {} # Latest triggering reading per key
+        self._received = 0
+        self._disconnected_at: Optional[float] = None
+        self._began_at = 0.0
+        self._last_arrival = 0.0
+        self._timer: Optional[Timer] = None
+        self._client = None
+        self.last_recovery: Optional[Dict[str, Any]] = None
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def on_disconnect(self) -> None:
+        """Remembers when the connection was lost, for the recovery time."""
+        with self._lock:
+            if self._disconnected_at is None:
+                self._disconnected_at = self._clock()
+
+    def begin(self, client) -> None:
+        """Enters catch-up mode. Called once the connection is back."""
+        with self._lock:
+            if self._active:
+                return
+            self._active = True
+            self._client = client
+            self._latest = {}
+            self._triggers = {}
+            self._received = 0
+            self._began_at = self._last_arrival = self._clock()
+            self._timer = self._scheduler.schedule(self.quiet_seconds, self._check_quiet, name="catch_up_quiet")
+
+    def add(self, topic: str, payload: Dict[str, Any], station_id: str) -> bool:
+        """
+        Buffers a station event if catching up.
+
+        Returns:
+            bool: False if not catching up; the caller dispatches the message itself.
+        """
+        with self._lock:
+            if not self._active:
+                return False
+            self._received += 1
+            self._last_arrival = self._clock()
+            sensor = payload.get('sensor') if isinstance(payload, dict) else None
+            key = (topic, sensor)
+            message = (topic, payload, station_id)
+            self._latest.pop(key, None) # Re-insert so the order follows the latest arrival
+            self._latest[key] = message
+            if self._is_trigger is not None and self._is_trigger(topic, payload, station_id):
+                self._triggers[key] = message
+            return True
+
+    def finish(self) -> None:
+        """Ends catch-up mode now and applies whatever was collected."""
+        with self._lock:
+            if not self._active:
+                return
+            self._active = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            now = self._clock()
+            messages = []
+            for key, message in self._latest.items():
+                trigger = self._triggers.get(key)
+                if trigger is not None and trigger is not message:
+                    messages.append(trigger) # Superseded, but the rules must still see it
+                messages.append(message)
+            disconnected_at = self._disconnected_at if self._disconnected_at is not None else self._began_at
+            stats = {
+                'downtime_seconds': self._began_at - disconnected_at,
+                'catch_up_seconds': now - self._began_at,
+                'recovery_seconds': now - disconnected_at,
+                'received': self._received,
+                'applied': len(messages),
+            }
+            self._latest = {}
+            self._triggers = {}
+            self._disconnected_at = None
+            self.last_recovery = stats
+            client, self._client = self._client, None
+        self._on_batch(client, messages, stats)
+
+    # --- Internals ---
+
+    def _check_quiet(self) -> None:
+        with self._lock:
+            if not self._active:
+                return
+            now = self._clock()
+            quiet_for = now - self._last_arrival
+            if quiet_for < self.quiet_seconds and now - self._began_at < self.max_seconds:
+                remaining = min(self.quiet_seconds - quiet_for, self.max_seconds - (now - self._began_at))
+                self._timer = self._scheduler.schedule(remaining, self._check_quiet, name="catch_up_quiet")
+                return
+            self._timer = None
+        try:
+            with self._apply_lock:
+                self.finish()
+        except Exception as e:
+            logging.exception(f"Error applying catch-up batch: {e}")
@@ -0,0 +1,213 @@
+import errno
+import logging
+import os
+import selectors
+import termios
+import threading
+import time
+import tty
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_BAUD_RATE = 115200 # Matches Arduino/serial_bridge
+DEFAULT_RECONNECT_SECONDS = 2.0
+# A line longer than this is garbage (e.g. a bridge started mid-record or the wrong baud rate)
+MAX_LINE_BYTES = 4096
+READ_CHUNK_BYTES = 65536
+# Only lines whose first word starts with this are records; everything else (boot banners, debug prints) is ignored
+RECORD_TOPIC_PREFIX = b"escaperoom/"
+
+
+class SerialMessage:
+    """A record read from a serial port, shaped like paho's MQTTMessage for `on_message`."""
+    __slots__ = ('topic', 'payload', 'qos', 'retain')
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class _Port:
+    __slots__ = ('path', 'fd', 'buffer', 'retry_at', 'records', 'discarded')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd: Optional[int] = None
+        self.buffer = bytearray()
+        self.retry_at = 0.0
+        self.records = 0
+        self.discarded = 0
+
+
+class SerialTransport:
+    """
+    Reads newline-framed `<topic> <payload>` records from serial ports, e.g. stations
+    wired through `Arduino/serial_bridge`, and hands them to `on_record`.
+
+    All ports are served by one thread: each port is opened non-blocking and
+    registered with a selector, and a readable port is drained with large reads into
+    a per-port buffer that is split into lines. A port that disappears (unplugged
+    USB, closed pseudo-terminal) is closed and reopened every `reconnect_seconds`
+    until it is back.
+
+    Args:
+        ports (List[str]): Device paths, e.g. ["/dev/ttyUSB0"].
+        on_record (Callable[[SerialMessage], None]): Called on the transport thread for
+                                                    every record.
+        baud_rate (int): Line speed of every port.
+        reconnect_seconds (float): Delay between attempts to reopen a lost port.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+
+    def __init__(self, ports: List[str], on_record: Callable[[SerialMessage], None],
+                 baud_rate: int = DEFAULT_BAUD_RATE, reconnect_seconds: float = DEFAULT_RECONNECT_SECONDS,
+                 clock=time.monotonic):
+        self._ports = [_Port(path) for path in ports]
+        self._on_record = on_record
+        self.baud_rate = baud_rate
+        self.reconnect_seconds = reconnect_seconds
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = os.pipe() # Wakes the selector on stop
+        os.set_blocking(self._wake_read, False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def connected_ports(self) -> List[str]:
+        return [port.path for port in self._ports if port.fd is not None]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Records delivered and lines discarded, per port."""
+        return {port.path: {'records': port.records, 'discarded': port.discarded} for port in self._ports}
+
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="serial-transport", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        os.write(self._wake_write, b'\0')
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for port in self._ports:
+            self._close(port)
+        self._selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def poll(self, timeout: Optional[float]) -> None:
+        """Opens due ports, waits up to `timeout` seconds for data and processes it."""
+        now = self._clock()
+        for port in self._ports:
+            if port.fd is None and now >= port.retry_at:
+                self._open(port)
+        wait = timeout
+        retry_at = [port.retry_at for port in self._ports if port.fd is None]
+        if retry_at:
+            until_retry = max(0.0, min(retry_at) - now)
+            wait = until_retry if wait is None else min(wait, until_retry)
+        for key, _ in self._selector.select(wait):
+            if key.data is None:
+                try:
+                    os.read(self._wake_read, 64)
+                except BlockingIOError:
+                    pass
+                continue
+            self._read(key.data)
+
+    # --- Internals ---
+
+    def _run(self) -> None:
+        logging.info(f"Serial transport reading {len(self._ports)} port(s) at {self.baud_rate} baud")
+        while not self._stopping:
+            try:
+                self.poll(None)
+            except Exception as e:
+                logging.exception(f"Error in serial transport: {e}")
+                time.sleep(self.reconnect_seconds)
+
+    def _open(self, port: _Port) -> None:
+        try:
+            fd = os.open(port.path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            port.retry_at = self._clock() + self.reconnect_seconds
+            logging.debug(f"Serial port {port.path} unavailable: {e}")
+            return
+        try:
+            tty.setraw(fd, termios.TCSANOW) # Not TCSAFLUSH: keep what the station sent before we opened
+            attributes = termios.tcgetattr(fd)
+            speed = getattr(termios, f"B{self.baud_rate}")
+            attributes[4] = attributes[5] = speed # Input and output speed
+            termios.tcsetattr(fd, termios.TCSANOW, attributes)
+        except (termios.error, AttributeError, OSError) as e:
+            os.close(fd)
+            port.retry_at = self._clock() + self.reconnect_seconds
+            logging.error(f"Cannot configure serial port {port.path}: {e}")
+            return
+        port.fd = fd
+        port.buffer.clear() # Whatever was buffered belonged to the previous connection
+        self._selector.register(fd, selectors.EVENT_READ, port)
+        logging.info(f"Serial port {port.path} connected")
+
+    def _close(self, port: _Port) -> None:
+        if port.fd is None:
+            return
+        try:
+            self._selector.unregister(port.fd)
+        except (KeyError, ValueError):
+            pass
+        os.close(port.fd)
+        port.fd = None
+
+    def _disconnected(self, port: _Port, reason: str) -> None:
+        self._close(port)
+        port.retry_at = self._clock() + self.reconnect_seconds
+        logging.warning(f"Serial port {port.path} disconnected ({reason}); retrying every {self.reconnect_seconds}s")
+
+    def _read(self, port: _Port) -> None:
+        while True:
+            try:
+                data = os.read(port.fd, READ_CHUNK_BYTES)
+            except BlockingIOError:
+                return # Drained
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                self._disconnected(port, os.strerror(e.errno) if e.errno else str(e))
+                return
+            if not data:
+                self._disconnected(port, "end of file")
+                return
+            self._frame(port, data)
+
+    def _frame(self, port: _Port, data: bytes) -> None:
+        buffer = port.buffer
+        buffer += data
+        end = buffer.rfind(b'\n')
+        if end < 0:
+            if len(buffer) > MAX_LINE_BYTES:
+                port.discarded += 1
+                buffer.clear()
+            return
+        lines = bytes(buffer[:end]).split(b'\n')
+        del buffer[:end + 1]
+        for line in lines:
+            self._deliver(port, line.rstrip(b'\r'))
+
+    def _deliver(self, port: _Port, line: bytes) -> None:
+        topic, separator, payload = line.partition(b' ')
+        if not separator or not topic.startswith(RECORD_TOPIC_PREFIX) or len(line) > MAX_LINE_BYTES:
+            if line:
+                port.discarded += 1
+                logging.debug(f"Ignoring serial line from {port.path}: {line[:80]!r}")
+            return
+        port.records += 1
+        try:
+            self._on_record(SerialMessage(topic.decode('ascii', 'replace'), payload))
+        except Exception as e:
+            logging.exception(f"Error handling serial record from {port.path}: {e}")
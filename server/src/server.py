@@ -1,75 +1,258 @@
+import time
+_STARTUP_BEGAN = time.perf_counter() # Taken before the imports so the startup report covers them
+
 import paho.mqtt.client as mqtt
 import json
 import logging
 import os
-# import threading
-import time
+import sys
+import threading
 
 
-from .config_loader import load_config
+from .config_loader import load_config, preloaded_config
 from .logging_utils import setup_logging
 from .server_state import ServerState
 from .control_handler import ControlMessageHandler
-from .station_handler import StationEventHandler
+from .station_handler import StationEventHandler, reading_triggers
+from .timer_wheel import TimerScheduler
+from .session_timers import SessionTimers
+from .binary_payload import is_binary_payload, decode_binary_payload, BinaryPayloadError
+from .liveness import (
+    LivenessTracker, heartbeat_interval, publish_liveness,
+    MISSED_HEARTBEATS_BEFORE_OFFLINE
+)
+from .state_publisher import StatePublisher, DEFAULT_COALESCE_SECONDS, DEFAULT_SNAPSHOT_INTERVAL_SECONDS
+from .session_analytics import SessionRecorder
+from .topics import describe_topic
+from .puzzle_graph import evaluate_progress
+from .dedup_cache import DuplicateFilter, DEFAULT_WINDOW_SECONDS, DEFAULT_MAX_ENTRIES
+from .admission import (
+    AdmissionController, publish_alert,
+    DEFAULT_TOPIC_RATE, DEFAULT_TOPIC_BURST, DEFAULT_STATION_RATE, DEFAULT_STATION_BURST,
+    DEFAULT_SUSTAINED_SECONDS, DEFAULT_QUARANTINE_SECONDS
+)
+from .calibration import (
+    CalibrationManager, StationRateMeter,
+    DEFAULT_WINDOW_SECONDS as DEFAULT_CALIBRATION_WINDOW_SECONDS, DEFAULT_RATE_WINDOW_SECONDS, DEFAULT_MIN_SAMPLES,
+    DEFAULT_THRESHOLD_SIGMAS, DEFAULT_DEADBAND_SIGMAS, DEFAULT_MIN_DEADBAND
+)
+from .calibration_handler import CalibrationHandler
+from .audio_utils import (
+    configure_audio, warm_up_audio, start_audio_engine, stop_audio_engine, update_background_music,
+    collecting_cues, play_audio_threaded
+)
+from .reconnect import (
+    ReconnectPolicy, CatchUpBuffer,
+    DEFAULT_MIN_RECONNECT_SECONDS, DEFAULT_MAX_RECONNECT_SECONDS, DEFAULT_RECONNECT_JITTER,
+    DEFAULT_QUIET_SECONDS, DEFAULT_MAX_CATCH_UP_SECONDS
+)
+from .startup import StartupReport
 from .constants import ( # Import necessary constants
-    SESSION_STATE_PENDING,
-    MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_BASE
+    SESSION_STATE_PENDING, SESSION_STATE_RUNNING,
+    MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_EVENTS,
+    DEFAULT_MQTT_CLIENT_ID, MQTT_KEEPALIVE_SECONDS, MQTT_SUBSCRIPTION_QOS, DEFAULT_LOG_FILE,
+    RUNTIME_MODE_MULTIPROCESS, STATION_EVENT_HEARTBEAT
 )
 
 
 
-# MQTT Configuration
-MQTT_CLIENT_ID_PREFIX = "escape-room-server-"
-MQTT_KEEPALIVE_SECONDS = 60
-
 # Other Constants
 MAIN_LOOP_SLEEP_SECONDS = 1
-DEFAULT_LOG_FILE = '/app/logs/server.log' # used if not in config
 
-CONFIG = load_config()
+STARTUP_REPORT = StartupReport(_STARTUP_BEGAN)
+STARTUP_REPORT.mark("imports")
+
+# The config is read once here and handed to the modules that need it
+CONFIG = preloaded_config() or load_config() # Preloaded in the workers of the multi-process runtime
+configure_audio(CONFIG)
 
 # --- Logging Setup ---
 LOG_FILE = CONFIG.get('log_file', DEFAULT_LOG_FILE)
 setup_logging(LOG_FILE)
+STARTUP_REPORT.mark("config and logging")
 # Ensure setup_logging configures the root logger used by logging.info etc.
 # Or get a specific logger: logger = logging.getLogger(__name__)
 
 # --- State Management (In-Memory) ---
 SESSION_STATE = SESSION_STATE_PENDING # Initial state
 STATION_STATUS = {} # e.g., {"station_5": {"completed": false}, "station_door": {"completed": false}}
+PUZZLE_PROGRESS = evaluate_progress(CONFIG, STATION_STATUS) # None unless config.json declares a puzzle_graph
+
+# The ServerState handed to handlers, rebuilt only when one of its parts was replaced
+_SERVER_STATE = None
+
+def _current_server_state():
+    """Returns a ServerState view of the current global state, reusing the last one if nothing changed."""
+    global _SERVER_STATE
+    state = _SERVER_STATE
+    liveness = LIVENESS_TRACKER.status
+    if (state is None or state.session_state != SESSION_STATE or state.station_status is not STATION_STATUS
+            or state.config is not CONFIG or state.station_liveness is not liveness
+            or state.puzzle_progress is not PUZZLE_PROGRESS):
+        state = _SERVER_STATE = ServerState(
+            session_state=SESSION_STATE,
+            station_status=STATION_STATUS,
+            config=CONFIG,
+            logger=logging,
+            station_liveness=liveness,
+            puzzle_progress=PUZZLE_PROGRESS
+        )
+    return state
+
+# --- Station Liveness ---
+LIVENESS_TRACKER = LivenessTracker()
+
+def check_station_liveness(client):
+    """Marks stations that missed their heartbeats as offline. Called periodically from the main loop."""
+    for station_id in LIVENESS_TRACKER.expire():
+        status = LIVENESS_TRACKER.status[station_id]
+        logging.warning(f"Station {station_id} is OFFLINE (missed {MISSED_HEARTBEATS_BEFORE_OFFLINE} heartbeats of {heartbeat_interval(CONFIG, station_id):.0f}s)")
+        publish_liveness(client, station_id, status)
+        STATE_PUBLISHER.notify_changed(client)
+
+# --- Timers ---
+# A single scheduler thread runs every timer (session time limits, timed cues, ...)
+TIMER_SCHEDULER = TimerScheduler()
+SESSION_TIMERS = SessionTimers(TIMER_SCHEDULER, _current_server_state)
+
+# --- State Publishing ---
+_PUBLISHER_CONFIG = CONFIG.get('state_publisher', {})
+STATE_PUBLISHER = StatePublisher(
+    TIMER_SCHEDULER, _current_server_state,
+    coalesce_seconds=_PUBLISHER_CONFIG.get('coalesce_seconds', DEFAULT_COALESCE_SECONDS),
+    snapshot_interval_seconds=_PUBLISHER_CONFIG.get('snapshot_interval_seconds', DEFAULT_SNAPSHOT_INTERVAL_SECONDS)
+)
+
+# --- Session Analytics ---
+_ANALYTICS_CONFIG = CONFIG.get('analytics', {})
+SESSION_RECORDER = SessionRecorder(_ANALYTICS_CONFIG['directory']) if _ANALYTICS_CONFIG.get('enabled', False) else None
+
+# --- Duplicate Suppression ---
+# Stations publish without message IDs, so reconnects and QoS-1 redelivery resend identical events
+_DEDUP_CONFIG = CONFIG.get('dedup', {})
+DUPLICATE_FILTER = DuplicateFilter(
+    window_seconds=_DEDUP_CONFIG.get('window_seconds', DEFAULT_WINDOW_SECONDS),
+    max_entries=_DEDUP_CONFIG.get('max_entries', DEFAULT_MAX_ENTRIES)
+)
+
+# Serializes message handling between the MQTT thread, the serial transport and the
+# timers that act on dispatch state (catch-up batch, quarantine expiry)
+DISPATCH_LOCK = threading.RLock()
+
+# --- Admission Control ---
+# Rate limits per station topic and per station, so a runaway sensor can't starve the room
+_ADMISSION_CONFIG = CONFIG.get('admission', {})
+ADMISSION = AdmissionController(
+    topic_rate=_ADMISSION_CONFIG.get('topic_rate_per_second', DEFAULT_TOPIC_RATE),
+    topic_burst=_ADMISSION_CONFIG.get('topic_burst', DEFAULT_TOPIC_BURST),
+    station_rate=_ADMISSION_CONFIG.get('station_rate_per_second', DEFAULT_STATION_RATE),
+    station_burst=_ADMISSION_CONFIG.get('station_burst', DEFAULT_STATION_BURST),
+    sustained_seconds=_ADMISSION_CONFIG.get('sustained_seconds', DEFAULT_SUSTAINED_SECONDS),
+    quarantine_seconds=_ADMISSION_CONFIG.get('quarantine_seconds', DEFAULT_QUARANTINE_SECONDS),
+    topic_limits=_ADMISSION_CONFIG.get('topics'),
+    on_alert=publish_alert,
+    scheduler=TIMER_SCHEDULER,
+    lock=DISPATCH_LOCK
+) if _ADMISSION_CONFIG.get('enabled', False) else None
+
+# --- Station Calibration ---
+# Baselines per sensor become thresholds pushed to the stations, which then report crossings only
+_CALIBRATION_CONFIG = CONFIG.get('calibration', {})
+STATION_RATES = StationRateMeter(window_seconds=_CALIBRATION_CONFIG.get('rate_window_seconds', DEFAULT_RATE_WINDOW_SECONDS))
+CALIBRATION = CalibrationManager(
+    TIMER_SCHEDULER, STATION_RATES,
+    window_seconds=_CALIBRATION_CONFIG.get('window_seconds', DEFAULT_CALIBRATION_WINDOW_SECONDS),
+    rate_window_seconds=_CALIBRATION_CONFIG.get('rate_window_seconds', DEFAULT_RATE_WINDOW_SECONDS),
+    min_samples=_CALIBRATION_CONFIG.get('min_samples', DEFAULT_MIN_SAMPLES),
+    threshold_sigmas=_CALIBRATION_CONFIG.get('threshold_sigmas', DEFAULT_THRESHOLD_SIGMAS),
+    deadband_sigmas=_CALIBRATION_CONFIG.get('deadband_sigmas', DEFAULT_DEADBAND_SIGMAS),
+    min_deadband=_CALIBRATION_CONFIG.get('min_deadband', DEFAULT_MIN_DEADBAND)
+)
 
 # --- Instantiate Handlers ---
 # Placed here so they are globally accessible if needed, or before on_message
-message_handlers = [ControlMessageHandler(), StationEventHandler()]
+# The calibration handler comes first: it takes one control action, the control handler takes the rest
+message_handlers = [CalibrationHandler(CALIBRATION), ControlMessageHandler(), StationEventHandler()]
+
+# --- Reconnects ---
+_RECONNECT_CONFIG = CONFIG.get('reconnect', {})
+RECONNECT_POLICY = ReconnectPolicy(
+    min_seconds=_RECONNECT_CONFIG.get('min_delay_seconds', DEFAULT_MIN_RECONNECT_SECONDS),
+    max_seconds=_RECONNECT_CONFIG.get('max_delay_seconds', DEFAULT_MAX_RECONNECT_SECONDS),
+    jitter=_RECONNECT_CONFIG.get('jitter', DEFAULT_RECONNECT_JITTER)
+)
+# Set once the first connection succeeded; later connections are reconnects
+_HAS_CONNECTED = False
+
+CATCH_UP = CatchUpBuffer(
+    TIMER_SCHEDULER, lambda client, messages, stats: apply_catch_up_batch(client, messages, stats), # Defined below
+    quiet_seconds=_RECONNECT_CONFIG.get('catch_up_quiet_seconds', DEFAULT_QUIET_SECONDS),
+    max_seconds=_RECONNECT_CONFIG.get('catch_up_max_seconds', DEFAULT_MAX_CATCH_UP_SECONDS),
+    apply_lock=DISPATCH_LOCK,
+    is_trigger=lambda topic, payload, station_id: reading_triggers(CONFIG, topic, payload)
+)
 
 # --- MQTT Callbacks ---
+def note_broker_connected(client, session_present):
+    """
+    Starts catching up when the broker replays what was queued for our persistent
+    session. Called from on_connect, or by the rule process of the multi-process
+    runtime, which learns about connections from the ingest process.
+    """
+    global _HAS_CONNECTED
+    # The broker replays what was queued for our persistent session: catch up on it as one batch
+    if _HAS_CONNECTED or session_present:
+        CATCH_UP.begin(client)
+    _HAS_CONNECTED = True
+
+def note_broker_disconnected():
+    """Records an unexpected disconnect, for the recovery time of the next catch-up."""
+    CATCH_UP.on_disconnect()
+
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
-        logging.info("Connected to MQTT Broker!")
+        session_present = bool(flags.get('session present')) if isinstance(flags, dict) else False
+        logging.info(f"Connected to MQTT Broker! (session present: {session_present})")
+        note_broker_connected(client, session_present)
         # Subscribe to topics upon successful connection
-        client.subscribe(MQTT_TOPIC_SERVER_CONTROL)
-        station_wildcard_topic = f"{MQTT_TOPIC_STATION_BASE}+/event/+" # Matches escaperoom/station/<id>/event/<type>
-        client.subscribe(station_wildcard_topic)
-        logging.info(f"Subscribed to: {MQTT_TOPIC_SERVER_CONTROL} and {station_wildcard_topic}")
+        # QoS 1 so the broker queues station events for us while we are disconnected
+        client.subscribe(MQTT_TOPIC_SERVER_CONTROL, qos=MQTT_SUBSCRIPTION_QOS)
+        client.subscribe(MQTT_TOPIC_STATION_EVENTS, qos=MQTT_SUBSCRIPTION_QOS)
+        logging.info(f"Subscribed to: {MQTT_TOPIC_SERVER_CONTROL} and {MQTT_TOPIC_STATION_EVENTS}")
+        STARTUP_REPORT.complete("first broker connection")
     else:
         logging.error(f"Failed to connect, return code {rc}")
 
 def on_disconnect(client, userdata, rc):
     logging.warning(f"Disconnected from MQTT Broker with code: {rc}")
     if rc != 0:
-        logging.info("Attempting to reconnect...")
-        # Note: The Paho library handles reconnection attempts automatically.
+        note_broker_disconnected()
+        delay = RECONNECT_POLICY.apply(client)
+        logging.info(f"Attempting to reconnect in about {delay:.1f}s (exponential backoff with jitter)...")
+        # Note: The Paho library runs the reconnection attempts with the delays set above.
 
 def _parse_message_payload(msg):
-    """Attempts to decode and parse the message payload."""
+    """
+    Attempts to parse the message payload (binary or JSON).
+
+    Returns:
+        Tuple: The parsed payload and the raw payload bytes (kept for logging), or (None, None).
+    """
     topic = msg.topic
+    if is_binary_payload(msg.payload):
+        try:
+            payload = decode_binary_payload(msg.payload)
+            logging.debug("Received binary message: %s - %s", topic, payload)
+            return payload, msg.payload
+        except BinaryPayloadError as e:
+            logging.error(f"Could not decode binary payload from topic {topic}: {e}")
+            return None, None
     try:
-        payload_str = msg.payload.decode("utf-8")
-        logging.info(f"Received message: {topic} - {payload_str}")
-        payload = json.loads(payload_str)
-        return payload, payload_str
+        logging.debug("Received message: %s - %s", topic, msg.payload)
+        # json decodes UTF-8 bytes itself; no intermediate str is built
+        return json.loads(msg.payload), msg.payload
     except json.JSONDecodeError:
-        logging.error(f"Could not decode JSON payload from topic {topic}: {payload_str}")
+        logging.error(f"Could not decode JSON payload from topic {topic}: {msg.payload.decode('utf-8', 'replace')}")
         return None, None
     except UnicodeDecodeError:
         logging.error(f"Could not decode UTF-8 payload from topic {topic}")
@@ -78,66 +261,145 @@ def _parse_message_payload(msg):
         logging.error(f"Error processing message from {topic}: {e}")
         return None, None
 
+def _dispatch(topic, payload, client, server_state):
+    """
+    Hands a message to the first handler that can handle it.
+
+    Returns:
+        Tuple[ServerState, bool]: The next state (the same object if unchanged) and
+                                  whether a handler took the message.
+    """
+    for handler in message_handlers:
+        try: # Add try-except around handler calls for robustness
+            if handler.can_handle(topic, payload, server_state):
+                logging.debug("Message on topic '%s' will be handled by %s", topic, type(handler).__name__)
+                # Handle the message and get the potentially updated state
+                next_server_state = handler.handle(topic, payload, client, server_state)
+                if next_server_state is server_state:
+                    logging.debug("Handler %s processed message but did not change state.", type(handler).__name__)
+                return next_server_state, True # Stop after the first handler processes the message
+        except Exception as e:
+            logging.exception(f"Error during handling message on topic {topic} by {type(handler).__name__}: {e}")
+            # Decide if we should continue trying other handlers or stop. Stopping for now.
+            return server_state, True # Mark as handled to prevent "unhandled" log, error logged instead
+    return server_state, False
+
+def _apply_server_state(client, current_server_state, next_server_state):
+    """Swaps a new state into the globals and notifies the components that follow it."""
+    global SESSION_STATE, STATION_STATUS, CONFIG, PUZZLE_PROGRESS, _SERVER_STATE
+
+    # Check if the state object reference changed. If so, update globals.
+    # This relies on handlers returning the *original* object if no changes occurred.
+    if next_server_state is current_server_state:
+        return
+    logging.debug("State updated. Updating global state.")
+    SESSION_STATE = next_server_state.session_state
+    STATION_STATUS = next_server_state.station_status
+    PUZZLE_PROGRESS = next_server_state.puzzle_progress
+    if next_server_state.config is not CONFIG:
+        configure_audio(next_server_state.config)
+    CONFIG = next_server_state.config # Update global config if handler changed it
+    _SERVER_STATE = next_server_state
+    SESSION_TIMERS.on_session_state_change(
+        current_server_state.session_state, SESSION_STATE, CONFIG, client)
+    if SESSION_STATE != current_server_state.session_state:
+        update_background_music(SESSION_STATE == SESSION_STATE_RUNNING, CONFIG)
+    STATE_PUBLISHER.notify_changed(client)
+    if SESSION_RECORDER is not None:
+        SESSION_RECORDER.on_state_change(
+            current_server_state.session_state, SESSION_STATE,
+            current_server_state.station_status, STATION_STATUS, SESSION_STATE_RUNNING)
+
 def on_message(client, userdata, msg):
-    # Make state variables accessible for update
-    global SESSION_STATE, STATION_STATUS, CONFIG
+    # Messages arrive from the MQTT thread and the serial transport thread; handle one at a time
+    with DISPATCH_LOCK:
+        _handle_message(client, msg)
 
-    logging.debug(f"Received message: {msg.topic} - {msg.payload}")
+def _handle_message(client, msg):
     topic = msg.topic
-    payload, payload_str = _parse_message_payload(msg) # Keep payload_str for logging if needed
+    descriptor = describe_topic(topic) # Parsed once per distinct topic
+    # Any message from a station, even a duplicate, proves it is alive
+    station_id = descriptor.station_id
+    if station_id is not None and LIVENESS_TRACKER.touch(station_id, heartbeat_interval(CONFIG, station_id)):
+        logging.info(f"Station {station_id} is ONLINE")
+        publish_liveness(client, station_id, LIVENESS_TRACKER.status[station_id])
+        STATE_PUBLISHER.notify_changed(client)
+    if descriptor.event_type == STATION_EVENT_HEARTBEAT:
+        return # Proved the station is alive; there is nothing else in it
+    if station_id is not None:
+        STATION_RATES.count(station_id) # Inbound volume, counted before admission drops anything
+    # Over-budget and quarantined topics are rejected before any decoding; control messages always pass.
+    # A replayed backlog arrives as one burst and is collapsed by the catch-up, and a station streaming
+    # a baseline does so because the server asked, so neither is limited
+    if ADMISSION is not None and not CATCH_UP.active and not CALIBRATION.collecting_from(station_id) \
+            and not ADMISSION.admit(descriptor, client):
+        return
+    # Drop duplicate station events before paying for decoding and parsing
+    if station_id is not None and DUPLICATE_FILTER.is_duplicate(topic, msg.payload):
+        logging.debug("Dropping duplicate message on topic %s (%d dropped so far)", topic, DUPLICATE_FILTER.duplicates_dropped)
+        return
+    payload, raw_payload = _parse_message_payload(msg) # Keep the raw payload for logging if needed
     if payload is None:
-        logging.debug(f"Ignoring message on topic {topic} due to parsing error.")
+        logging.debug("Ignoring message on topic %s due to parsing error.", topic)
         return # Error already logged in _parse_message_payload
 
-    # Create current state object
-    # Pass the logging module, assuming setup_logging configured the root logger
-    current_server_state = ServerState(
-        session_state=SESSION_STATE,
-        station_status=STATION_STATUS,
-        config=CONFIG,
-        logger=logging # Pass the configured logging module/logger
-    )
-
-    message_handled = False
-    for handler in message_handlers:
-        try: # Add try-except around handler calls for robustness
-            if handler.can_handle(topic, payload, current_server_state):
-                logging.debug(f"Message on topic '{topic}' will be handled by {type(handler).__name__}")
-                # Handle the message and get the potentially updated state
-                next_server_state = handler.handle(topic, payload, client, current_server_state)
+    if SESSION_RECORDER is not None and descriptor.event_type is not None and SESSION_RECORDER.active:
+        SESSION_RECORDER.record_event(station_id, descriptor.event_type, payload)
 
-                # Check if the state object reference changed. If so, update globals.
-                # This relies on handlers returning the *original* object if no changes occurred.
-                if next_server_state is not current_server_state:
-                    logging.debug(f"State updated by {type(handler).__name__}. Updating global state.")
-                    SESSION_STATE = next_server_state.session_state
-                    STATION_STATUS = next_server_state.station_status
-                    CONFIG = next_server_state.config # Update global config if handler changed it
-                else:
-                    logging.debug(f"Handler {type(handler).__name__} processed message but did not change state.")
+    if CALIBRATION.collecting and descriptor.event_type is not None:
+        CALIBRATION.observe(station_id, descriptor.event_type, payload)
 
+    if CATCH_UP.active:
+        if station_id is not None and CATCH_UP.add(topic, payload, station_id):
+            return # Applied with the rest of the backlog
+        CATCH_UP.finish() # Anything else (e.g. a control command) applies to the caught-up state
 
-                message_handled = True
-                break # Stop after the first handler processes the message
-        except Exception as e:
-            logging.exception(f"Error during handling message on topic {topic} by {type(handler).__name__}: {e}")
-            # Decide if we should continue trying other handlers or stop. Stopping for now.
-            message_handled = True # Mark as handled to prevent "unhandled" log, error logged instead
-            break
-
+    # Create current state object
+    # Pass the logging module, assuming setup_logging configured the root logger
+    current_server_state = _current_server_state()
+    next_server_state, message_handled = _dispatch(topic, payload, client, current_server_state)
+    _apply_server_state(client, current_server_state, next_server_state)
 
     # Log if no handler processed the message
     if not message_handled:
-        logging.warning(f"Received message on unhandled topic: {topic} or no handler found - Payload: {payload_str}")
+        logging.warning(f"Received message on unhandled topic: {topic} or no handler found - Payload: {raw_payload.decode('utf-8', 'replace')}")
+
+def apply_catch_up_batch(client, messages, stats):
+    """
+    Applies the backlog collected after a reconnect as one batch.
+
+    The handlers evaluate the collapsed readings in order against a local state, so
+    the globals change once, with a single state transition, however many stations
+    the backlog touched. Cues the handlers request are held back and at most one per
+    station (its latest) is played once the batch is applied.
+    """
+    current_server_state = _current_server_state()
+    next_server_state = current_server_state
+    station_cues = {}
+    with collecting_cues() as cues:
+        for topic, payload, station_id in messages:
+            requested = len(cues)
+            next_server_state, _ = _dispatch(topic, payload, client, next_server_state)
+            if len(cues) > requested:
+                station_cues[station_id] = cues[-1]
+    _apply_server_state(client, current_server_state, next_server_state)
+    for sound_file, gain in station_cues.values():
+        play_audio_threaded(sound_file, gain=gain)
+    logging.info(f"Recovered from broker disconnect in {stats['recovery_seconds']:.2f}s "
+                 f"(down {stats['downtime_seconds']:.2f}s, catch-up {stats['catch_up_seconds']:.2f}s): "
+                 f"{stats['received']} queued messages applied as {stats['applied']} readings, "
+                 f"{len(station_cues)} cues")
 
 
 # --- MQTT Client Setup ---
 def create_mqtt_client():
     broker_host = CONFIG['mqtt_broker']['host']
     broker_port = CONFIG['mqtt_broker']['port']
-    client_id = f"{MQTT_CLIENT_ID_PREFIX}{os.getpid()}"
+    client_id = CONFIG['mqtt_broker'].get('client_id', DEFAULT_MQTT_CLIENT_ID)
 
-    client = mqtt.Client(client_id=client_id)
+    # Persistent session: the broker keeps our subscriptions and queues QoS 1 messages while we are away
+    client = mqtt.Client(client_id=client_id, clean_session=False)
+    RECONNECT_POLICY.apply(client)
     client.on_connect = on_connect
     client.on_message = on_message
     client.on_disconnect = on_disconnect
@@ -154,10 +416,59 @@ def create_mqtt_client():
 
     return client
 
+def _warm_up_audio_in_background():
+    """Imports the audio backend off the startup path so the first cue doesn't pay for it."""
+    def target():
+        seconds = warm_up_audio(CONFIG)
+        if seconds is not None:
+            STARTUP_REPORT.record("audio warm-up (background)", seconds)
+    threading.Thread(target=target, name="audio-warm-up", daemon=True).start()
+
+def start_dashboard():
+    """Starts the game-master dashboard if enabled. Returns it, or None."""
+    dashboard_config = CONFIG.get('dashboard', {})
+    if not dashboard_config.get('enabled', False):
+        return None
+    # Imported only when enabled: the HTTP server stack is not needed otherwise
+    from .dashboard import DashboardServer, DEFAULT_DASHBOARD_HOST, DEFAULT_DASHBOARD_PORT
+    try:
+        dashboard = DashboardServer(dashboard_config.get('host', DEFAULT_DASHBOARD_HOST),
+                                    dashboard_config.get('port', DEFAULT_DASHBOARD_PORT))
+        STATE_PUBLISHER.add_listener(dashboard.update)
+        dashboard.start()
+        return dashboard
+    except OSError as e:
+        logging.error(f"Could not start dashboard: {e}")
+        return None
+
 # --- Main Execution ---
 if __name__ == "__main__":
+    if CONFIG.get('runtime', {}).get('mode') == RUNTIME_MODE_MULTIPROCESS:
+        # The supervisor runs in a fresh interpreter whose workers don't re-import this module
+        logging.info("Starting Escape Room Server in multi-process mode...")
+        os.execv(sys.executable, [sys.executable, '-m', f"{__spec__.parent}.multiprocess_runtime"])
     logging.info("Starting Escape Room Server...")
+    start_audio_engine(CONFIG)
+    _warm_up_audio_in_background()
     client = create_mqtt_client()
+    STARTUP_REPORT.mark("broker connect")
+    TIMER_SCHEDULER.start()
+
+    dashboard = start_dashboard()
+    STATE_PUBLISHER.start(client)
+    STARTUP_REPORT.mark("scheduler and dashboard")
+
+    # Wired stations, e.g. through Arduino/serial_bridge, feed the same dispatch path as MQTT
+    serial_transport = None
+    serial_config = CONFIG.get('serial', {})
+    if serial_config.get('enabled', False) and serial_config.get('ports'):
+        from .serial_transport import SerialTransport, DEFAULT_BAUD_RATE, DEFAULT_RECONNECT_SECONDS
+        serial_transport = SerialTransport(
+            serial_config['ports'], lambda msg: on_message(client, None, msg),
+            baud_rate=serial_config.get('baud_rate', DEFAULT_BAUD_RATE),
+            reconnect_seconds=serial_config.get('reconnect_seconds', DEFAULT_RECONNECT_SECONDS)
+        )
+        serial_transport.start()
 
     # Start the MQTT network loop in a separate thread
     # loop_start() is non-blocking and handles reconnections automatically.
@@ -167,11 +478,18 @@ if __name__ == "__main__":
     # Keep the main thread alive
     try:
         while True:
-            
-            time.sleep(MAIN_LOOP_SLEEP_SECONDS) 
+            check_station_liveness(client)
+            time.sleep(MAIN_LOOP_SLEEP_SECONDS)
     except KeyboardInterrupt:
         logging.info("Shutting down server...")
     finally:
+        if serial_transport is not None:
+            serial_transport.stop()
+        if dashboard is not None:
+            dashboard.stop()
+        STATE_PUBLISHER.stop() # Publishes a pending delta, while the client is still connected
+        TIMER_SCHEDULER.stop()
+        stop_audio_engine()
         client.loop_stop() # Stop the network loop
         client.disconnect()
         logging.info("MQTT client disconnected. Server stopped.") 
\ No newline at end of file
@@ -1,25 +1,55 @@
+import hashlib
+import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from .puzzle_graph import PuzzleProgress
+
+# (config object, version) of the last config fingerprinted; configs are replaced, never mutated
+_config_version_cache = (None, None)
+
+def config_version(config: Dict[str, Any]) -> str:
+    """Returns a short, stable fingerprint of a configuration, cached per config object."""
+    global _config_version_cache
+    cached_config, cached_version = _config_version_cache
+    if cached_config is config:
+        return cached_version
+    try:
+        encoded = json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+    except (TypeError, ValueError):
+        encoded = repr(config).encode('utf-8')
+    version = hashlib.sha1(encoded).hexdigest()[:12]
+    _config_version_cache = (config, version)
+    return version
 
 class ServerState:
     """
     Represents the immutable state of the server at a specific point in time.
 
     Attributes:
-        session_state (str): The current state of the escape room session 
+        session_state (str): The current state of the escape room session
                              (e.g., PENDING, RUNNING, STOPPED).
-        station_status (Dict[str, Any]): A dictionary tracking the status of 
+        station_status (Dict[str, Any]): A dictionary tracking the status of
                                         each station. The structure depends on
                                         station implementation.
-        config (Dict[str, Any]): The currently loaded server configuration 
+        config (Dict[str, Any]): The currently loaded server configuration
                                  dictionary.
         logger (logging.Logger): The logger instance used by the server.
+        station_liveness (Dict[str, Dict[str, Any]]): Online/offline status and
+                                 last-seen time of each station heard from,
+                                 e.g. {"station_5": {"online": True, "last_seen": 1700000000.0}}.
+        puzzle_progress (Optional[PuzzleProgress]): Progress through the configured
+                                 puzzle graph, or None if the config has none.
     """
-    def __init__(self, 
-                 session_state: str, 
-                 station_status: Dict[str, Any], 
-                 config: Dict[str, Any], 
-                 logger: logging.Logger):
+    puzzle_progress: Optional[PuzzleProgress] = None # Declared on the class so every ServerState has it, whatever built it
+
+    def __init__(self,
+                 session_state: str,
+                 station_status: Dict[str, Any],
+                 config: Dict[str, Any],
+                 logger: logging.Logger,
+                 station_liveness: Optional[Dict[str, Dict[str, Any]]] = None,
+                 puzzle_progress: Optional[PuzzleProgress] = None):
         """
         Initializes a new ServerState instance.
 
@@ -28,15 +58,45 @@ class ServerState:
             station_status (Dict[str, Any]): The station status dictionary.
             config (Dict[str, Any]): The server configuration dictionary.
             logger (logging.Logger): The logger instance.
+            station_liveness (Optional[Dict[str, Dict[str, Any]]]): The station liveness
+                                 dictionary. Defaults to an empty dictionary.
+            puzzle_progress (Optional[PuzzleProgress]): The puzzle progress.
         """
         self.session_state = session_state
         self.station_status = station_status
         self.config = config
         self.logger = logger
+        self.station_liveness = station_liveness if station_liveness is not None else {}
+        self.puzzle_progress = puzzle_progress
+
+    def replace(self, **changes) -> 'ServerState':
+        """
+        Returns a new ServerState with the given attributes changed and all others kept.
+
+        Handlers should use this rather than the constructor so that state they don't
+        own (e.g. station liveness) is carried over unchanged.
+        """
+        values = {
+            'session_state': self.session_state,
+            'station_status': self.station_status,
+            'config': self.config,
+            'logger': self.logger,
+            'station_liveness': self.station_liveness,
+            'puzzle_progress': self.puzzle_progress,
+        }
+        values.update(changes)
+        return ServerState(**values)
 
-    # Consider adding methods for creating modified copies if needed, 
-    # promoting immutability, e.g.:
-    # def with_session_state(self, new_state: str) -> 'ServerState':
-    #     return ServerState(new_state, self.station_status, self.config, self.logger)
-    # etc. 
-    # For now, handlers will create new instances directly as per the plan. 
\ No newline at end of file
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the JSON-serializable public view of the state, as published to
+        clients. The config itself and the logger are server internals; only the
+        config's fingerprint is included.
+        """
+        return {
+            'session_state': self.session_state,
+            'station_status': self.station_status,
+            'station_liveness': self.station_liveness,
+            'puzzle_progress': self.puzzle_progress.to_dict() if self.puzzle_progress is not None else None,
+            'config_version': config_version(self.config),
+        }
@@ -0,0 +1,220 @@
+import json
+import logging
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Any, List, Optional
+
+# --- Session File Format ---
+# <magic 4 bytes> <u32 header length> <JSON header> <columns...>
+# The header holds the session metadata, the interned string tables, the row count
+# and the byte order of the columns. Columns follow in COLUMNS order, each
+# `rows * itemsize` bytes long, exactly as written by array.tobytes().
+SESSION_FILE_MAGIC = b'ESA1'
+SESSION_FILE_SUFFIX = '.esa'
+HEADER_LENGTH = struct.Struct('<I')
+
+# (name, array typecode)
+COLUMNS = (
+    ('timestamp', 'd'), # Seconds since session start
+    ('kind', 'B'), # One of the KIND_* codes
+    ('station', 'H'), # Index into the header's station table
+    ('event', 'H'), # Index into the header's event table
+    ('value', 'd'), # Numeric reading, NaN if the event has none
+)
+
+# --- Row Kinds ---
+KIND_EVENT = 0 # A station event received while the session was running
+KIND_STATION_COMPLETED = 1 # A station's status changed to completed
+KIND_SESSION_STATE = 2 # The session state changed; `event` holds the new state
+
+# Payload fields holding the numeric reading of an event, in order of preference
+VALUE_FIELDS = ('range', 'value')
+
+NO_STATION = ''
+
+
+class SessionRecorder:
+    """
+    Records one session's events and state transitions into append-only columns.
+
+    A session starts when the session state becomes RUNNING and ends when it leaves
+    RUNNING for STOPPED or PENDING. Station and event names are interned into small
+    integer ids, so recording a row is a handful of array appends. When the session
+    ends the columns are written to `<directory>/session_<id>.esa` on a background
+    thread, keeping file I/O off the dispatch path.
+
+    Args:
+        directory (str): Where session files are written. Created if missing.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._session_id: Optional[str] = None
+        self._sessions_started = 0
+        self._reset_columns()
+
+    @property
+    def active(self) -> bool:
+        return self._session_id is not None
+
+    def start(self, session_id: Optional[str] = None) -> None:
+        """Begins recording a new session, discarding any unfinished one."""
+        self._reset_columns()
+        self._started_at = time.time()
+        self._start_clock = time.monotonic()
+        if session_id is None:
+            # Milliseconds and a counter: sessions started within the same second must not share a file
+            self._sessions_started += 1
+            session_id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started_at))}"
+                          f"-{int(self._started_at * 1000) % 1000:03d}-{self._sessions_started}")
+        self._session_id = session_id
+
+    def record_event(self, station_id: str, event_type: str, payload: Dict[str, Any]) -> None:
+        if not self.active:
+            return
+        value = math.nan
+        for field in VALUE_FIELDS:
+            raw = payload.get(field)
+            if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+                value = float(raw)
+                break
+        self._append(KIND_EVENT, station_id, event_type, value)
+
+    def record_completion(self, station_id: str) -> None:
+        if self.active:
+            self._append(KIND_STATION_COMPLETED, station_id, '', math.nan)
+
+    def record_session_state(self, session_state: str) -> None:
+        if self.active:
+            self._append(KIND_SESSION_STATE, NO_STATION, session_state, math.nan)
+
+    def on_state_change(self, previous_session_state: str, new_session_state: str,
+                        previous_station_status: Dict[str, Any], new_station_status: Dict[str, Any],
+                        running_state: str) -> None:
+        """Starts, records into, or finishes the session according to a state transition."""
+        if new_session_state == running_state and previous_session_state != running_state:
+            self.start()
+        if not self.active:
+            return
+        if previous_session_state != new_session_state:
+            self.record_session_state(new_session_state)
+        if new_station_status is not previous_station_status:
+            for station_id, status in new_station_status.items():
+                if _is_completed(status) and not _is_completed(previous_station_status.get(station_id)):
+                    self.record_completion(station_id)
+        if previous_session_state == running_state and new_session_state != running_state:
+            self.finish(new_session_state)
+
+    def finish(self, end_state: str) -> Optional[str]:
+        """
+        Ends the session and writes its file in the background.
+
+        Returns:
+            Optional[str]: The path of the session file, or None if no session was active.
+        """
+        if not self.active:
+            return None
+        header = {
+            'session_id': self._session_id,
+            'started_at': self._started_at,
+            'ended_at': time.time(),
+            'end_state': end_state,
+            'rows': len(self._columns['timestamp']),
+            'byteorder': sys.byteorder,
+            'stations': self._stations,
+            'events': self._events,
+        }
+        columns = self._columns
+        path = os.path.join(self.directory, f"session_{self._session_id}{SESSION_FILE_SUFFIX}")
+        self._session_id = None
+        self._reset_columns()
+        thread = threading.Thread(target=write_session_file, args=(path, header, columns),
+                                  name="analytics-writer", daemon=True)
+        thread.start()
+        return path
+
+    # --- Internals ---
+
+    def _reset_columns(self) -> None:
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self._stations: List[str] = []
+        self._events: List[str] = []
+        self._station_ids: Dict[str, int] = {}
+        self._event_ids: Dict[str, int] = {}
+
+    def _intern(self, table: List[str], ids: Dict[str, int], name: str) -> int:
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(table)
+            table.append(name)
+        return index
+
+    def _append(self, kind: int, station_id: str, event: str, value: float) -> None:
+        columns = self._columns
+        columns['timestamp'].append(time.monotonic() - self._start_clock)
+        columns['kind'].append(kind)
+        columns['station'].append(self._intern(self._stations, self._station_ids, station_id))
+        columns['event'].append(self._intern(self._events, self._event_ids, event))
+        columns['value'].append(value)
+
+
+def _is_completed(status: Any) -> bool:
+    return isinstance(status, dict) and bool(status.get("completed"))
+
+
+def write_session_file(path: str, header: Dict[str, Any], columns: Dict[str, array]) -> None:
+    """Writes a session file. Errors are logged, never raised: analytics must not affect the game."""
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        encoded_header = json.dumps(header).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SESSION_FILE_MAGIC)
+            f.write(HEADER_LENGTH.pack(len(encoded_header)))
+            f.write(encoded_header)
+            for name, _ in COLUMNS:
+                columns[name].tofile(f)
+        os.replace(tmp_path, path) # Readers never see a partial file
+        logging.info(f"Session analytics written to {path} ({header['rows']} rows)")
+    except OSError as e:
+        logging.error(f"Failed to write session analytics to {path}: {e}")
+
+
+def read_session_file(path: str):
+    """
+    Reads a session file.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, array]]: The header and the columns by name.
+
+    Raises:
+        ValueError: If the file is not a session file or is truncated.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(SESSION_FILE_MAGIC)] != SESSION_FILE_MAGIC:
+        raise ValueError(f"Not a session analytics file: {path}")
+    offset = len(SESSION_FILE_MAGIC)
+    (header_length,) = HEADER_LENGTH.unpack_from(data, offset)
+    offset += HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + header_length])
+    offset += header_length
+
+    rows = header['rows']
+    columns = {}
+    for name, typecode in COLUMNS:
+        column = array(typecode)
+        size = rows * column.itemsize
+        if offset + size > len(data):
+            raise ValueError(f"Truncated session analytics file: {path}")
+        column.frombytes(data[offset:offset + size])
+        if header.get('byteorder', sys.byteorder) != sys.byteorder:
+            column.byteswap()
+        columns[name] = column
+        offset += size
+    return header, columns
@@ -0,0 +1,131 @@
+import json
+import logging
+from typing import Dict, Any, Callable, List, Optional
+import paho.mqtt.client as mqtt
+
+from .timer_wheel import TimerScheduler, Timer
+from .server_state import ServerState
+from .audio_utils import play_audio_threaded
+from .constants import (
+    ACTION_STOP,
+    SESSION_STATE_RUNNING, SESSION_STATE_STOPPED, SESSION_STATE_PENDING,
+    MQTT_TOPIC_SERVER_CONTROL
+)
+
+SESSION_TIMERS_CONFIG_KEY = "session_timers"
+TIME_LIMIT_TIMER_NAME = "session_time_limit"
+
+
+class SessionTimers:
+    """
+    Arms, pauses and cancels the timed rules of a session.
+
+    Rules come from the `session_timers` section of the configuration:
+
+        "session_timers": {
+            "time_limit_seconds": 3600,
+            "cues": [
+                {"name": "hint_station_5", "after_seconds": 600,
+                 "sound": "hint.wav", "gain": 0.8, "unless_completed": "station_5"}
+            ]
+        }
+
+    Timers are armed when a session starts, paused when it is STOPPED, resumed
+    when it is RUNNING again and cancelled on reset. When the time limit expires
+    a `stop` control message is published so the session ends through the
+    regular control flow.
+
+    Args:
+        scheduler (TimerScheduler): The scheduler the timers run on.
+        state_provider (Callable[[], ServerState]): Returns the current server state
+                                                    when a cue fires.
+    """
+
+    def __init__(self, scheduler: TimerScheduler, state_provider: Callable[[], ServerState]):
+        self._scheduler = scheduler
+        self._state_provider = state_provider
+        self._timers: List[Timer] = []
+        self._client: Optional[mqtt.Client] = None
+
+    @property
+    def timers(self) -> List[Timer]:
+        """The timers of the current session that are still pending or paused."""
+        return [t for t in self._timers if t.pending or t.paused]
+
+    def on_session_state_change(self, previous_state: str, new_state: str,
+                                config: Dict[str, Any], client: mqtt.Client) -> None:
+        """Reacts to a session state transition. Called after the new state is in place."""
+        if previous_state == new_state:
+            return
+        self._client = client
+        if new_state == SESSION_STATE_RUNNING:
+            if self.timers:
+                self.resume()
+            else:
+                self.arm(config)
+        elif new_state == SESSION_STATE_STOPPED:
+            self.pause()
+        elif new_state == SESSION_STATE_PENDING:
+            self.cancel_all()
+
+    def arm(self, config: Dict[str, Any]) -> None:
+        """Schedules all timers configured for a new session, replacing any existing ones."""
+        self.cancel_all()
+        timers_config = config.get(SESSION_TIMERS_CONFIG_KEY, {})
+
+        time_limit = timers_config.get("time_limit_seconds")
+        if time_limit is not None:
+            self._timers.append(self._scheduler.schedule(
+                float(time_limit), self._on_time_limit, name=TIME_LIMIT_TIMER_NAME))
+
+        for cue in timers_config.get("cues", []):
+            try:
+                delay = float(cue["after_seconds"])
+                cue["sound"] # Validate early rather than when the cue fires
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"Invalid timed cue configuration {cue}: {e}")
+                continue
+            self._timers.append(self._scheduler.schedule(
+                delay, self._on_cue, cue, name=cue.get("name", cue["sound"])))
+
+        if self._timers:
+            logging.info(f"Armed {len(self._timers)} session timer(s)")
+
+    def pause(self) -> None:
+        paused = sum(1 for t in self._timers if t.pause())
+        if paused:
+            logging.info(f"Paused {paused} session timer(s)")
+
+    def resume(self) -> None:
+        resumed = sum(1 for t in self._timers if t.resume())
+        if resumed:
+            logging.info(f"Resumed {resumed} session timer(s)")
+
+    def cancel_all(self) -> None:
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+
+    # --- Timer Callbacks (run on the scheduler thread) ---
+
+    def _on_time_limit(self) -> None:
+        logging.info("Session time limit reached. Stopping session.")
+        for timer in self._timers:
+            if timer.name != TIME_LIMIT_TIMER_NAME:
+                timer.cancel() # The session is over, no more hints
+        if self._client is not None:
+            self._client.publish(MQTT_TOPIC_SERVER_CONTROL, json.dumps({"action": ACTION_STOP}))
+        else:
+            logging.error("Cannot stop session on time limit: no MQTT client available")
+
+    def _on_cue(self, cue: Dict[str, Any]) -> None:
+        server_state = self._state_provider()
+        if server_state.session_state != SESSION_STATE_RUNNING:
+            return
+        station_id = cue.get("unless_completed")
+        station_status = server_state.station_status.get(station_id)
+        if station_id and isinstance(station_status, dict) and station_status.get("completed"):
+            logging.debug(f"Skipping timed cue {cue.get('name')}: {station_id} already completed")
+            return
+        logging.info(f"Timed cue {cue.get('name', cue['sound'])} fired")
+        play_audio_threaded(cue["sound"], gain=cue.get("gain", 1.0))
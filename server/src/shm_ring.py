@@ -0,0 +1,130 @@
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+# --- Layout ---
+# <header: head u64, tail u64, capacity u32, record size u32, padding to 64 bytes> <slots...>
+# Each slot is `record_size` bytes: <u32 length> <data>. `head` counts records ever
+# written and `tail` records ever read; slot `i % capacity` holds record `i`.
+HEADER = struct.Struct('<QQII')
+HEADER_SIZE = 64 # Keeps the counters on their own cache line, apart from the data
+COUNTER = struct.Struct('<Q')
+HEAD_OFFSET = 0
+TAIL_OFFSET = 8
+LENGTH = struct.Struct('<I')
+
+
+class ShmRing:
+    """
+    Single-producer, single-consumer ring of fixed-size records in shared memory.
+
+    One process writes with `put` and one reads with `get`, each advancing only its
+    own counter, so no lock is needed. The consumer is woken through `doorbell`, a
+    multiprocessing semaphore released once per record; `get` also checks the
+    counters first, so a doorbell that drifted (e.g. after a worker restart) costs at
+    most one spurious wakeup.
+
+    Records larger than `record_size - 4` bytes are rejected: callers choose a record
+    size that fits their largest message.
+
+    Create the ring in the parent with `create` and pass `name` and the doorbell to
+    the worker processes, which `attach` to it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, doorbell, owner: bool):
+        self._shm = shm
+        self._buffer = shm.buf
+        self.doorbell = doorbell
+        self._owner = owner
+        _, _, self.capacity, self.record_size = HEADER.unpack_from(self._buffer, 0)
+        self.max_record_bytes = self.record_size - LENGTH.size
+
+    @classmethod
+    def create(cls, capacity: int, record_size: int, doorbell, name: Optional[str] = None) -> 'ShmRing':
+        """
+        Allocates a new ring.
+
+        Args:
+            capacity (int): Number of records the ring holds.
+            record_size (int): Bytes per slot, including the 4-byte length.
+            doorbell: A `multiprocessing.Semaphore(0)` from the context that runs the workers.
+            name (Optional[str]): Shared memory name; generated if omitted.
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * record_size)
+        HEADER.pack_into(shm.buf, 0, 0, 0, capacity, record_size)
+        return cls(shm, doorbell, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, doorbell) -> 'ShmRing':
+        return cls(shared_memory.SharedMemory(name=name), doorbell, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __len__(self) -> int:
+        return self._head() - self._tail()
+
+    def put(self, data: bytes) -> bool:
+        """
+        Appends a record. Producer side only.
+
+        Returns:
+            bool: False if the ring is full; the record was not written.
+
+        Raises:
+            ValueError: If the record is larger than the slot.
+        """
+        if len(data) > self.max_record_bytes:
+            raise ValueError(f"Record of {len(data)} bytes exceeds the ring's {self.max_record_bytes}-byte slots")
+        head = self._head()
+        if head - self._tail() >= self.capacity:
+            return False
+        offset = HEADER_SIZE + (head % self.capacity) * self.record_size
+        LENGTH.pack_into(self._buffer, offset, len(data))
+        self._buffer[offset + LENGTH.size:offset + LENGTH.size + len(data)] = data
+        COUNTER.pack_into(self._buffer, HEAD_OFFSET, head + 1) # Publish only after the data is written
+        self.doorbell.release()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Removes and returns the oldest record. Consumer side only.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for a record; None waits forever.
+
+        Returns:
+            Optional[bytes]: The record, or None if none arrived within the timeout.
+        """
+        if self._head() == self._tail():
+            if not self.doorbell.acquire(timeout=timeout):
+                return None
+            if self._head() == self._tail():
+                return None # Spurious: the record was already consumed through the fast path
+        else:
+            self.doorbell.acquire(block=False) # Keep the doorbell in step with the records
+        tail = self._tail()
+        offset = HEADER_SIZE + (tail % self.capacity) * self.record_size
+        (length,) = LENGTH.unpack_from(self._buffer, offset)
+        data = bytes(self._buffer[offset + LENGTH.size:offset + LENGTH.size + length])
+        COUNTER.pack_into(self._buffer, TAIL_OFFSET, tail + 1) # Free the slot only after copying it out
+        return data
+
+    def close(self) -> None:
+        """Detaches from the ring; the owner also frees it."""
+        self._buffer = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # --- Internals ---
+
+    def _head(self) -> int:
+        return COUNTER.unpack_from(self._buffer, HEAD_OFFSET)[0]
+
+    def _tail(self) -> int:
+        return COUNTER.unpack_from(self._buffer, TAIL_OFFSET)[0]
@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# Set to 1/true/yes to log a per-phase startup timing report
+STARTUP_REPORT_ENV = "ESCAPER_STARTUP_REPORT"
+
+
+def startup_report_enabled() -> bool:
+    return os.environ.get(STARTUP_REPORT_ENV, "").strip().lower() in ("1", "true", "yes")
+
+
+class StartupReport:
+    """
+    Collects the time spent in each startup phase and logs it once startup completes.
+
+    Sequential phases are recorded with `mark`, which measures the time since the
+    previous mark. Phases that run in the background (e.g. audio warm-up) are recorded
+    with `record`. `complete` logs the report; it is a no-op when the report is disabled
+    or was already logged.
+
+    Args:
+        start (float): `time.perf_counter()` value at which startup began.
+        enabled (Optional[bool]): Defaults to the ESCAPER_STARTUP_REPORT environment variable.
+    """
+
+    def __init__(self, start: float, enabled: Optional[bool] = None):
+        self.enabled = startup_report_enabled() if enabled is None else enabled
+        self._start = start
+        self._last = start
+        self._phases: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+        self._completed = False
+
+    @property
+    def phases(self) -> List[Tuple[str, float]]:
+        return list(self._phases)
+
+    def mark(self, phase: str) -> None:
+        """Records `phase` as the time elapsed since the previous mark."""
+        now = time.perf_counter()
+        with self._lock:
+            self._phases.append((phase, now - self._last))
+            self._last = now
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Records a phase measured elsewhere, e.g. on another thread."""
+        with self._lock:
+            self._phases.append((phase, seconds))
+
+    def complete(self, final_phase: str) -> None:
+        """Marks the final phase and logs the report, once."""
+        with self._lock:
+            if self._completed:
+                return
+            self._completed = True
+        self.mark(final_phase)
+        if not self.enabled:
+            return
+        total = self._last - self._start
+        lines = [f"  {phase:<24} {seconds * 1000:>8.1f} ms" for phase, seconds in self._phases]
+        logging.info("Startup report:\n" + "\n".join(lines) + f"\n  {'total (sequential)':<24} {total * 1000:>8.1f} ms")
@@ -0,0 +1,159 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+import paho.mqtt.client as mqtt
+
+from .timer_wheel import TimerScheduler, Timer
+from .server_state import ServerState
+from .constants import MQTT_TOPIC_SERVER_STATE, MQTT_TOPIC_SERVER_STATE_DELTA
+
+DEFAULT_COALESCE_SECONDS = 0.1
+DEFAULT_SNAPSHOT_INTERVAL_SECONDS = 30.0
+
+
+def diff_snapshots(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Computes a compact delta between two state snapshots (as returned by `ServerState.to_dict`).
+
+    Scalar values are included when they changed. Dictionary values are diffed one
+    level deep: only changed entries are included, and removed entries map to None.
+
+    Returns:
+        Dict[str, Any]: The delta; empty if nothing changed.
+    """
+    delta = {}
+    for key, value in current.items():
+        old_value = previous.get(key)
+        if value is old_value:
+            continue # Unchanged references are the common case: states are copy-on-write
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            entries = {k: v for k, v in value.items() if k not in old_value or old_value[k] != v}
+            entries.update({k: None for k in old_value if k not in value})
+            if entries:
+                delta[key] = entries
+        elif value != old_value:
+            delta[key] = value
+    return delta
+
+
+class StatePublisher:
+    """
+    Publishes server state changes for game-master consoles and props.
+
+    Changes are not published one by one: `notify_changed` only arms a flush timer, and
+    the flush diffs the current state against the last published one. A burst of
+    station completions within `coalesce_seconds` therefore produces a single delta.
+
+    Each flush publishes:
+      * a delta on `escaperoom/server/state/delta`, and
+      * the full snapshot, retained, on `escaperoom/server/state`, so a client joining
+        mid-session gets the current state from one message.
+    The retained snapshot is also refreshed every `snapshot_interval_seconds`.
+
+    Args:
+        scheduler (TimerScheduler): Runs the flush and refresh timers.
+        state_provider (Callable[[], ServerState]): Returns the current server state.
+        coalesce_seconds (float): How long to collect changes before publishing.
+        snapshot_interval_seconds (float): Period of the retained snapshot refresh.
+    """
+
+    def __init__(self, scheduler: TimerScheduler, state_provider: Callable[[], ServerState],
+                 coalesce_seconds: float = DEFAULT_COALESCE_SECONDS,
+                 snapshot_interval_seconds: float = DEFAULT_SNAPSHOT_INTERVAL_SECONDS):
+        self._scheduler = scheduler
+        self._state_provider = state_provider
+        self.coalesce_seconds = coalesce_seconds
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self._lock = threading.Lock()
+        self._client: Optional[mqtt.Client] = None
+        self._published: Dict[str, Any] = {} # Last snapshot sent to clients
+        self._version = 0
+        self._flush_timer: Optional[Timer] = None
+        self._refresh_timer: Optional[Timer] = None
+        self._listeners = []
+        self._stopped = False
+
+    @property
+    def version(self) -> int:
+        """Incremented on every published delta."""
+        return self._version
+
+    def add_listener(self, listener: Callable[[int, Dict[str, Any], Dict[str, Any]], None]) -> None:
+        """Registers `listener(version, delta, snapshot)`, called on every published delta."""
+        self._listeners.append(listener)
+
+    def start(self, client: mqtt.Client) -> None:
+        """Publishes the initial snapshot and starts the periodic retained refresh."""
+        self._client = client
+        self._stopped = False
+        self.flush()
+        self._schedule_refresh()
+
+    def stop(self) -> None:
+        """Cancels the timers, publishing a pending delta first so the retained snapshot is current."""
+        with self._lock:
+            self._stopped = True
+            pending = self._flush_timer is not None
+            for timer in (self._flush_timer, self._refresh_timer):
+                if timer is not None:
+                    timer.cancel()
+            self._flush_timer = self._refresh_timer = None
+        if pending:
+            self.flush()
+
+    def notify_changed(self, client: mqtt.Client) -> None:
+        """Signals that the state changed. Cheap: arms the flush timer if it isn't already."""
+        with self._lock:
+            self._client = client
+            if self._flush_timer is None and not self._stopped:
+                self._flush_timer = self._scheduler.schedule(self.coalesce_seconds, self.flush, name="state_flush")
+
+    def flush(self) -> None:
+        """Publishes the changes since the last flush, if any, plus the retained snapshot."""
+        with self._lock:
+            self._flush_timer = None
+            client = self._client
+            snapshot = self._state_provider().to_dict()
+            delta = diff_snapshots(self._published, snapshot)
+            if not delta and self._version > 0:
+                return
+            self._version += 1
+            self._published = snapshot
+            version = self._version
+        if client is not None:
+            self._publish(client, MQTT_TOPIC_SERVER_STATE_DELTA, {"version": version, "changes": delta}, retain=False)
+            self._publish_snapshot(client, version, snapshot)
+        for listener in self._listeners:
+            try:
+                listener(version, delta, snapshot)
+            except Exception as e:
+                logging.exception(f"Error in state listener: {e}")
+
+    # --- Internals ---
+
+    def _refresh(self) -> None:
+        with self._lock:
+            client, version, snapshot = self._client, self._version, self._published
+        if client is not None:
+            self._publish_snapshot(client, version, snapshot)
+        self._schedule_refresh()
+
+    def _schedule_refresh(self) -> None:
+        with self._lock:
+            if self._stopped:
+                return # Stopped while the refresh was running
+            self._refresh_timer = self._scheduler.schedule(
+                self.snapshot_interval_seconds, self._refresh, name="state_snapshot_refresh")
+
+    def _publish_snapshot(self, client: mqtt.Client, version: int, snapshot: Dict[str, Any]) -> None:
+        self._publish(client, MQTT_TOPIC_SERVER_STATE,
+                      {"version": version, "timestamp": time.time(), "state": snapshot}, retain=True)
+
+    @staticmethod
+    def _publish(client: mqtt.Client, topic: str, message: Dict[str, Any], retain: bool) -> None:
+        try:
+            client.publish(topic, json.dumps(message, separators=(',', ':')), qos=1, retain=retain)
+        except Exception as e:
+            logging.error(f"Failed to publish state to {topic}: {e}")
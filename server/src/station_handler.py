@@ -4,18 +4,40 @@ import paho.mqtt.client as mqtt
 
 from .message_handler_interface import MessageHandler
 from .server_state import ServerState
-from .constants import SESSION_STATE_RUNNING, MQTT_TOPIC_STATION_BASE
+from .constants import SESSION_STATE_RUNNING
+from .topics import describe_topic
+from .puzzle_graph import current_progress
 
 # --- Import Audio Utils ---
 # Use relative import because station_handler is part of the 'src' package
 from .audio_utils import play_audio_threaded
 
-EVENT_TOPIC_SEGMENT = 'event'
-EVENT_TOPIC_SEGMENT_LENGTH = 5
-EVENT_TOPIC_SEGMENT_INDEX = 3
-EVENT_TOPIC_STATION_INDEX = 2
-EVENT_TOPIC_BASE = 'escaperoom/station'
-EVENT_TOPIC_EVENT_TYPE_INDEX = 4
+def reading_triggers(config: Dict[str, Any], topic: str, payload: Dict[str, Any]) -> bool:
+    """
+    Whether a station reading meets the trigger condition of any of its sensors, with
+    the same conditions as StationEventHandler.handle (session state and puzzle graph aside).
+    Used to keep triggering readings when a backlog is collapsed.
+    """
+    descriptor = describe_topic(topic)
+    station_config = config.get("station_configs", {}).get(descriptor.station_id)
+    if descriptor.event_type is None or not station_config:
+        return False
+    for sensor_config in station_config.values():
+        if not isinstance(sensor_config, dict) or sensor_config.get("event_type") != descriptor.event_type:
+            continue
+        try:
+            if descriptor.event_type == "beacon_proximity":
+                range_val, threshold = payload.get("range"), sensor_config.get("range_threshold")
+                if range_val is not None and threshold is not None and float(range_val) <= float(threshold):
+                    return True
+            elif descriptor.event_type == "door_status":
+                status, trigger_val = payload.get("status"), sensor_config.get("trigger_value")
+                if status is not None and trigger_val is not None and str(status).upper() == str(trigger_val).upper():
+                    return True
+        except (ValueError, TypeError):
+            continue
+    return False
+
 
 class StationEventHandler(MessageHandler):
     """Handles events originating from individual stations."""
@@ -26,23 +48,12 @@ class StationEventHandler(MessageHandler):
         # Check 1: Session must be running
         if server_state.session_state != SESSION_STATE_RUNNING:
             # Log why it can't be handled (optional, but helpful for debugging)
-            server_state.logger.debug(f"Ignoring station event from {topic}: Session not RUNNING (state={server_state.session_state})")
+            server_state.logger.debug("Ignoring station event from %s: Session not RUNNING (state=%s)", topic, server_state.session_state)
             return False
 
         # Check 2: Topic structure must match station event pattern
-        # Expected: escaperoom/station/<station_id>/event/<event_type>
-        if not topic.startswith(MQTT_TOPIC_STATION_BASE):
-            return False
-        
-        parts = topic.split('/')
-        
-        is_valid_structure = ( # Check length and that 'event' keyword is present
-            len(parts) == EVENT_TOPIC_SEGMENT_LENGTH and 
-            parts[EVENT_TOPIC_SEGMENT_INDEX] == EVENT_TOPIC_SEGMENT
-            # parts[0] and parts[1] are covered by startswith check
-        )
-
-        return is_valid_structure
+        # Expected: escaperoom/station/<station_id>/event/<event_type> (parsed once per topic, then cached)
+        return describe_topic(topic).is_station_event
 
     def handle(self, topic: str, payload: Dict[str, Any], client: mqtt.Client, server_state: ServerState) -> ServerState:
         """Processes the station event based on configuration and payload."""
@@ -53,27 +64,34 @@ class StationEventHandler(MessageHandler):
         state_changed = False
 
         # Parse topic (already validated structure in can_handle)
-        try:
-            parts = topic.split('/')
-            station_id = parts[EVENT_TOPIC_STATION_INDEX]
-            event_type = parts[EVENT_TOPIC_EVENT_TYPE_INDEX]
-        except IndexError: # Should not happen if can_handle is correct, but belt-and-suspenders
+        descriptor = describe_topic(topic)
+        station_id = descriptor.station_id
+        event_type = descriptor.event_type
+        if event_type is None: # Should not happen if can_handle is correct, but belt-and-suspenders
             logger.error(f"Could not parse already validated topic: {topic}")
             return server_state # Return original state on error
 
         # --- Logic moved from old handle_station_event ---
         station_config = config.get("station_configs", {}).get(station_id)
         if not station_config:
-            logger.debug(f"No configuration found for station_id: {station_id}")
+            logger.debug("No configuration found for station_id: %s", station_id)
             return server_state # No config, no state change
 
-        # Create a copy to modify if needed
+        # Stations of the puzzle graph only count once the stations they depend on are solved
+        progress = current_progress(server_state)
+        if progress is not None and not progress.is_unlocked(station_id):
+            logger.debug("Ignoring event from %s: station is locked by the puzzle graph", station_id)
+            return server_state
+
+        # The status is copied on the first change only: most readings change nothing
         # Use deepcopy if status contains nested mutable structures
         # If status is simple dict of primitives, a shallow copy (.copy()) is fine
         # Assuming shallow might be okay, but deepcopy is safer without knowing the exact structure.
-        new_station_status = copy.deepcopy(original_station_status)
+        new_station_status = original_station_status
 
         for sensor_id, sensor_config in station_config.items():
+            if not isinstance(sensor_config, dict):
+                continue # Station-level settings (e.g. heartbeat_interval_seconds), not a sensor
             if sensor_config.get("event_type") == event_type: ## TODO: this should be refactored as well. Should have different logic for different event types.
                 # Example Logic 1: Beacon Proximity
                 if event_type == "beacon_proximity":
@@ -85,10 +103,12 @@ class StationEventHandler(MessageHandler):
                         try:
                             if float(range_val) <= float(threshold):
                                 logger.info(f"Beacon proximity triggered for {station_id}/{sensor_id}. Range {range_val} <= {threshold}")
-                                play_audio_threaded(sound_file)
+                                play_audio_threaded(sound_file, gain=sensor_config.get("sound_gain", 1.0))
                                 # Update the status copy
                                 if new_station_status.get(station_id) != {"completed": True}: # Example update logic
                                     logger.info(f"Updating status for station {station_id} to completed.")
+                                    if not state_changed:
+                                        new_station_status = copy.deepcopy(original_station_status)
                                     new_station_status[station_id] = {"completed": True}
                                     state_changed = True
                         except (ValueError, TypeError) as e:
@@ -105,10 +125,12 @@ class StationEventHandler(MessageHandler):
                     if status is not None and trigger_val is not None and sound_file:
                         if str(status).upper() == str(trigger_val).upper():
                                 logger.info(f"Door status triggered for {station_id}/{sensor_id}. Status {status} == {trigger_val}")
-                                play_audio_threaded(sound_file)
+                                play_audio_threaded(sound_file, gain=sensor_config.get("sound_gain", 1.0))
                                 # Update the status copy
                                 if new_station_status.get(station_id) != {"completed": True}: # Example update logic
                                     logger.info(f"Updating status for station {station_id} to completed.")
+                                    if not state_changed:
+                                        new_station_status = copy.deepcopy(original_station_status)
                                     new_station_status[station_id] = {"completed": True} 
                                     state_changed = True
                     else:
@@ -116,20 +138,24 @@ class StationEventHandler(MessageHandler):
 
                 # Add more elif blocks here for other event types and logic
                 else:
-                    logger.debug(f"No specific logic defined for event type: {event_type} on {station_id}/{sensor_id}")
+                    logger.debug("No specific logic defined for event type: %s on %s/%s", event_type, station_id, sensor_id)
                 
                 # Decide whether to break or continue if a sensor was processed
                 # break # Example: Stop after first matching sensor
 
         # --- Return State ---
         if state_changed:
-            logger.debug(f"Station event '{event_type}' for {station_id} resulted in state change. Creating new ServerState.")
-            return ServerState(
-                session_state=server_state.session_state, # Session state unchanged by station events
+            logger.debug("Station event '%s' for %s resulted in state change. Creating new ServerState.", event_type, station_id)
+            new_progress = progress
+            if progress is not None:
+                new_progress = progress.update(new_station_status, (station_id,)) # Only this station and what depends on it
+                if new_progress is not progress:
+                    logger.info(f"Puzzle progress: {new_progress.percent_complete:.0f}% complete, "
+                                f"available: {sorted(new_progress.available)}")
+            return server_state.replace( # Session state and config unchanged by station events
                 station_status=new_station_status, # Return the modified copy
-                config=server_state.config, # Config unchanged by station events
-                logger=server_state.logger
+                puzzle_progress=new_progress
             )
         else:
-            logger.debug(f"Station event '{event_type}' for {station_id} did not result in state change. Returning original ServerState.")
+            logger.debug("Station event '%s' for %s did not result in state change. Returning original ServerState.", event_type, station_id)
             return server_state # Return the original state if no changes occurred
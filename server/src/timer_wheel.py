@@ -0,0 +1,403 @@
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+# --- Wheel Geometry ---
+# Level 0 has 256 one-tick slots, each higher level has 64 slots covering 64x
+# the span of the level below. With 1ms ticks the wheel spans 2^32 ms (~49 days).
+ROOT_LEVEL_BITS = 8
+LEVEL_BITS = 6
+NUM_UPPER_LEVELS = 4
+ROOT_LEVEL_SIZE = 1 << ROOT_LEVEL_BITS
+ROOT_LEVEL_MASK = ROOT_LEVEL_SIZE - 1
+LEVEL_SIZE = 1 << LEVEL_BITS
+LEVEL_MASK = LEVEL_SIZE - 1
+MAX_TIMEOUT_TICKS = (1 << (ROOT_LEVEL_BITS + LEVEL_BITS * NUM_UPPER_LEVELS)) - 1
+
+DEFAULT_TICK_SECONDS = 0.001 # 1ms resolution
+
+
+class Timer:
+    """
+    A handle to a single pending callback in a `TimerWheel`.
+
+    Handles are returned by `TimerWheel.add` / `TimerScheduler.schedule` and are
+    the only way to cancel, pause or resume a timer. All operations are O(1).
+
+    Attributes:
+        deadline (int): The absolute wheel tick at which the timer fires.
+        callback (Callable): The function invoked when the timer fires.
+        args (tuple): Positional arguments passed to `callback`.
+        name (Optional[str]): Optional label, used in log messages.
+    """
+    __slots__ = ('deadline', 'callback', 'args', 'name', '_slot', '_owner',
+                 '_remaining', '_cancelled')
+
+    def __init__(self, deadline: int, callback: Callable[..., Any], args: tuple = (), name: Optional[str] = None):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.name = name
+        self._slot = None # The slot dict currently holding this timer, None when not queued
+        self._owner = None # TimerWheel or TimerScheduler used by cancel/pause/resume
+        self._remaining = None # Ticks left when paused
+        self._cancelled = False
+
+    @property
+    def pending(self) -> bool:
+        """True while the timer is queued in a wheel and will fire."""
+        return self._slot is not None
+
+    @property
+    def paused(self) -> bool:
+        """True if the timer was paused and can be resumed."""
+        return self._remaining is not None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> bool:
+        """Cancels the timer. Returns True if it was pending or paused."""
+        return self._owner.cancel(self) if self._owner is not None else False
+
+    def pause(self) -> bool:
+        """Removes the timer from the wheel, remembering the time left. Returns True if paused."""
+        return self._owner.pause(self) if self._owner is not None else False
+
+    def resume(self) -> bool:
+        """Re-queues a paused timer with the time it had left. Returns True if resumed."""
+        return self._owner.resume(self) if self._owner is not None else False
+
+    def __repr__(self):
+        return f"Timer(name={self.name!r}, deadline={self.deadline}, pending={self.pending}, paused={self.paused})"
+
+
+class TimerWheel:
+    """
+    A hierarchical timing wheel (in the style of the classic Linux kernel timer wheel).
+
+    The wheel is a pure data structure driven by integer ticks; it has no notion of
+    wall-clock time and is not thread-safe. `TimerScheduler` adds the clock, the
+    locking and the worker thread.
+
+    Insert, cancel, pause and resume are O(1). Advancing the wheel costs O(1) per
+    tick that holds timers plus at most one cascade per level per timer; ticks
+    with nothing to do are skipped without being visited.
+    """
+
+    def __init__(self, start_tick: int = 0):
+        self._current = start_tick # The next tick to be processed
+        self._root = [dict() for _ in range(ROOT_LEVEL_SIZE)]
+        self._levels = [[dict() for _ in range(LEVEL_SIZE)] for _ in range(NUM_UPPER_LEVELS)]
+        self._count = 0
+        # Lower bound on the next event tick, kept up to date on insert; None when it must be recomputed
+        self._next_event: Optional[int] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def current_tick(self) -> int:
+        """The next tick that `advance` will process."""
+        return self._current
+
+    def add(self, delay_ticks: int, callback: Callable[..., Any], *args, name: Optional[str] = None) -> Timer:
+        """
+        Schedules `callback(*args)` to run `delay_ticks` ticks from the current tick.
+
+        Args:
+            delay_ticks (int): Number of ticks to wait. Values <= 0 fire on the next advance.
+            callback (Callable): Function to invoke when the timer fires.
+            *args: Positional arguments for `callback`.
+            name (Optional[str]): Optional label for logging.
+
+        Returns:
+            Timer: A handle that can be used to cancel, pause or resume the timer.
+        """
+        return self.add_at(self._current + max(0, int(delay_ticks)), callback, *args, name=name)
+
+    def add_at(self, deadline_tick: int, callback: Callable[..., Any], *args, name: Optional[str] = None) -> Timer:
+        """
+        Schedules `callback(*args)` to run at an absolute tick. A deadline at or before
+        the current tick fires on the next advance; otherwise the timer never fires
+        before `deadline_tick`, however far behind the wheel's current tick is.
+        """
+        timer = Timer(int(deadline_tick), callback, args, name)
+        timer._owner = self
+        self._insert(timer)
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        """Removes a timer from the wheel. Returns True if it was pending or paused."""
+        was_active = timer._slot is not None or timer._remaining is not None
+        self._unlink(timer)
+        timer._remaining = None
+        timer._cancelled = True
+        return was_active
+
+    def pause(self, timer: Timer, now_tick: Optional[int] = None) -> bool:
+        """Takes a pending timer off the wheel, keeping the number of ticks it had left at `now_tick` (default: the current tick)."""
+        if timer._slot is None:
+            return False
+        self._unlink(timer)
+        timer._remaining = max(0, timer.deadline - (self._current if now_tick is None else now_tick))
+        return True
+
+    def resume(self, timer: Timer, now_tick: Optional[int] = None) -> bool:
+        """Puts a paused timer back on the wheel with its remaining ticks, counted from `now_tick` (default: the current tick)."""
+        if timer._remaining is None or timer._cancelled:
+            return False
+        timer.deadline = (self._current if now_tick is None else now_tick) + timer._remaining
+        timer._remaining = None
+        self._insert(timer)
+        return True
+
+    def next_event_tick(self) -> Optional[int]:
+        """
+        Returns the earliest tick that `advance` has work for, or None if the wheel is empty.
+
+        The result is either a tick with expiring timers or a cascade point with timers
+        to move down, so it is a lower bound on the next expiry, never later than it.
+        Empty slots are skipped arithmetically, so idle stretches cost O(slots), not O(ticks).
+        The slots are only scanned after `advance` emptied some; inserts keep the result up to date.
+        """
+        if self._count == 0:
+            return None
+        if self._next_event is not None:
+            return self._next_event
+        current = self._current
+        best = None
+        for offset in range(ROOT_LEVEL_SIZE):
+            if self._root[(current + offset) & ROOT_LEVEL_MASK]:
+                best = current + offset # Root slots only hold deadlines within one rotation
+                break
+        for level in range(NUM_UPPER_LEVELS):
+            shift = ROOT_LEVEL_BITS + level * LEVEL_BITS
+            first_block = -(-current >> shift) # First block boundary at or after `current`
+            for index, slot in enumerate(self._levels[level]):
+                if slot:
+                    tick = (first_block + ((index - first_block) & LEVEL_MASK)) << shift
+                    if best is None or tick < best:
+                        best = tick
+        self._next_event = best
+        return best
+
+    def advance(self, now_tick: int) -> List[Timer]:
+        """
+        Processes every tick up to and including `now_tick`.
+
+        Args:
+            now_tick (int): The tick to advance to.
+
+        Returns:
+            List[Timer]: The expired timers, in firing order. Callbacks are NOT invoked
+                         here so that callers can run them outside of any lock.
+        """
+        expired = []
+        while self._current <= now_tick:
+            next_tick = self.next_event_tick()
+            if next_tick is None or next_tick > now_tick:
+                self._current = now_tick + 1 # Nothing due in between, skip the idle ticks
+                break
+            self._current = next_tick
+            index = next_tick & ROOT_LEVEL_MASK
+            if index == 0:
+                self._cascade(next_tick)
+            slot = self._root[index]
+            if slot:
+                self._root[index] = dict()
+                for timer in slot:
+                    timer._slot = None
+                    self._count -= 1
+                    expired.append(timer)
+            self._current = next_tick + 1
+            self._next_event = None # Slots were emptied: rescan on the next call
+        return expired
+
+    def clear(self) -> None:
+        """Cancels every pending timer."""
+        for slot in self._root:
+            for timer in slot:
+                timer._slot = None
+                timer._cancelled = True
+            slot.clear()
+        for level in self._levels:
+            for slot in level:
+                for timer in slot:
+                    timer._slot = None
+                    timer._cancelled = True
+                slot.clear()
+        self._count = 0
+        self._next_event = None
+
+    # --- Internals ---
+
+    def _insert(self, timer: Timer) -> None:
+        delta = timer.deadline - self._current
+        if delta < ROOT_LEVEL_SIZE:
+            # Overdue timers go into the slot of the current tick and fire on the next advance
+            event_tick = max(timer.deadline, self._current)
+            slot = self._root[event_tick & ROOT_LEVEL_MASK]
+        else:
+            # Timers beyond the wheel span are parked at the furthest slot and re-placed when it cascades
+            expires = self._current + MAX_TIMEOUT_TICKS if delta > MAX_TIMEOUT_TICKS else timer.deadline
+            slot = None
+            for level in range(NUM_UPPER_LEVELS):
+                shift = ROOT_LEVEL_BITS + level * LEVEL_BITS
+                if delta < (1 << (shift + LEVEL_BITS)) or level == NUM_UPPER_LEVELS - 1:
+                    index = (expires >> shift) & LEVEL_MASK
+                    slot = self._levels[level][index]
+                    first_block = -(-self._current >> shift)
+                    event_tick = (first_block + ((index - first_block) & LEVEL_MASK)) << shift # Its cascade point
+                    break
+        slot[timer] = None
+        timer._slot = slot
+        if self._count == 0:
+            self._next_event = event_tick
+        elif self._next_event is not None and event_tick < self._next_event:
+            self._next_event = event_tick
+        self._count += 1
+
+    def _unlink(self, timer: Timer) -> None:
+        slot = timer._slot
+        if slot is not None:
+            del slot[timer]
+            timer._slot = None
+            self._count -= 1
+
+    def _cascade(self, tick: int) -> None:
+        """Moves timers from upper levels down as the lower level wraps around."""
+        for level in range(NUM_UPPER_LEVELS):
+            shift = ROOT_LEVEL_BITS + level * LEVEL_BITS
+            index = (tick >> shift) & LEVEL_MASK
+            slot = self._levels[level][index]
+            if slot:
+                self._levels[level][index] = dict()
+                for timer in slot:
+                    timer._slot = None
+                    self._count -= 1
+                    self._insert(timer)
+            if index != 0:
+                break # Higher levels only cascade when this level wraps too
+
+
+class TimerScheduler:
+    """
+    Runs a `TimerWheel` on a single daemon thread against a monotonic clock.
+
+    All public methods are thread-safe. Callbacks run on the scheduler thread,
+    outside of the internal lock, so they may schedule or cancel other timers.
+    Exceptions raised by callbacks are logged and do not stop the scheduler.
+
+    Args:
+        tick_seconds (float): Duration of one wheel tick. Defaults to 1ms.
+        clock (Callable[[], float]): Monotonic time source in seconds.
+        name (str): Thread name, used in logs.
+    """
+
+    def __init__(self, tick_seconds: float = DEFAULT_TICK_SECONDS,
+                 clock: Callable[[], float] = time.monotonic,
+                 name: str = "timer-scheduler"):
+        self._tick_seconds = tick_seconds
+        self._clock = clock
+        self._origin = clock()
+        self._wheel = TimerWheel(start_tick=0)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._name = name
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._wheel)
+
+    def now_tick(self) -> int:
+        """The current clock time expressed in wheel ticks."""
+        return int((self._clock() - self._origin) / self._tick_seconds)
+
+    def start(self) -> None:
+        """Starts the scheduler thread. Calling start on a running scheduler is a no-op."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+        logging.debug(f"Timer scheduler '{self._name}' started")
+
+    def stop(self) -> None:
+        """Stops the scheduler thread. Pending timers stay on the wheel but no longer fire."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def schedule(self, delay_seconds: float, callback: Callable[..., Any], *args, name: Optional[str] = None) -> Timer:
+        """
+        Schedules `callback(*args)` to run after `delay_seconds`.
+
+        Returns:
+            Timer: Handle used to cancel, pause or resume the timer.
+        """
+        with self._condition:
+            # An absolute deadline: the wheel's current tick lags the clock while a due timer waits to fire
+            # Counted from the next tick boundary, so the truncation of now_tick() can't make it early
+            elapsed_ticks = math.ceil((self._clock() - self._origin) / self._tick_seconds)
+            deadline = elapsed_ticks + max(0, math.ceil(delay_seconds / self._tick_seconds - 1e-9))
+            timer = self._wheel.add_at(deadline, callback, *args, name=name)
+            timer._owner = self
+            self._condition.notify() # The new timer may be due earlier than the thread's current wait
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        with self._condition:
+            return self._wheel.cancel(timer)
+
+    def pause(self, timer: Timer) -> bool:
+        with self._condition:
+            return self._wheel.pause(timer, self.now_tick())
+
+    def resume(self, timer: Timer) -> bool:
+        with self._condition:
+            resumed = self._wheel.resume(timer, self.now_tick())
+            if resumed:
+                self._condition.notify()
+            return resumed
+
+    def remaining_seconds(self, timer: Timer) -> Optional[float]:
+        """Returns the time left on a pending or paused timer, or None if it is neither."""
+        with self._condition:
+            if timer.paused:
+                return timer._remaining * self._tick_seconds
+            if timer.pending:
+                return max(0, timer.deadline - self.now_tick()) * self._tick_seconds
+            return None
+
+    def cancel_all(self) -> None:
+        with self._condition:
+            self._wheel.clear()
+
+    # --- Internals ---
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                expired = self._wheel.advance(self.now_tick())
+                if not expired:
+                    next_tick = self._wheel.next_event_tick()
+                    timeout = None if next_tick is None else max(
+                        0.0, self._origin + next_tick * self._tick_seconds - self._clock())
+                    self._condition.wait(timeout)
+                    continue
+            for timer in expired:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    logging.exception(f"Error in timer callback {timer.name or timer.callback}: {e}")
@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import Optional
+
+from .constants import MQTT_TOPIC_STATION_BASE, MQTT_TOPIC_SERVER_CONTROL
+
+# Stations publish on a small, fixed set of topics, so the cache stays warm
+TOPIC_CACHE_SIZE = 1024
+
+EVENT_TOPIC_SEGMENT = 'event'
+CONFIG_TOPIC_SEGMENT = 'config'
+BASELINE_TOPIC_SEGMENT = 'baseline'
+
+
+class TopicDescriptor:
+    """
+    The parsed form of a topic, built once per distinct topic and shared by every
+    message on it. Immutable.
+
+    Attributes:
+        topic (str): The topic string.
+        is_control (bool): Whether it is the server control topic.
+        station_id (Optional[str]): `<station_id>` of an `escaperoom/station/<station_id>/...` topic.
+        event_type (Optional[str]): `<event_type>` of an `escaperoom/station/<station_id>/event/<event_type>`
+                                    topic; None for any other topic.
+    """
+    __slots__ = ('topic', 'is_control', 'station_id', 'event_type')
+
+    def __init__(self, topic: str, is_control: bool, station_id: Optional[str], event_type: Optional[str]):
+        self.topic = topic
+        self.is_control = is_control
+        self.station_id = station_id
+        self.event_type = event_type
+
+    @property
+    def is_station_event(self) -> bool:
+        return self.event_type is not None
+
+    def __repr__(self):
+        return (f"TopicDescriptor({self.topic!r}, is_control={self.is_control}, "
+                f"station_id={self.station_id!r}, event_type={self.event_type!r})")
+
+
+@lru_cache(maxsize=TOPIC_CACHE_SIZE)
+def describe_topic(topic: str) -> TopicDescriptor:
+    """Parses a topic into a TopicDescriptor, cached per topic string."""
+    station_id = event_type = None
+    if topic.startswith(MQTT_TOPIC_STATION_BASE):
+        parts = topic[len(MQTT_TOPIC_STATION_BASE):].split('/')
+        station_id = parts[0] or None
+        # Expected: escaperoom/station/<station_id>/event/<event_type>
+        if station_id is not None and len(parts) == 3 and parts[1] == EVENT_TOPIC_SEGMENT and parts[2]:
+            event_type = parts[2]
+    return TopicDescriptor(topic, topic == MQTT_TOPIC_SERVER_CONTROL, station_id, event_type)
+
+
+def station_config_topic(station_id: str) -> str:
+    """The retained topic the server pushes a station's settings on: escaperoom/station/<station_id>/config."""
+    return f"{MQTT_TOPIC_STATION_BASE}{station_id}/{CONFIG_TOPIC_SEGMENT}"
+
+
+def station_baseline_topic(station_id: str) -> str:
+    """The topic, not retained, the server asks a station to stream a baseline on: escaperoom/station/<station_id>/baseline."""
+    return f"{MQTT_TOPIC_STATION_BASE}{station_id}/{BASELINE_TOPIC_SEGMENT}"
@@ -0,0 +1,178 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import server
+from src.admission import AdmissionController, TokenBucket, publish_alert, ALERT_TOPIC_QUARANTINED, ALERT_TOPIC_RELEASED
+from src.topics import describe_topic
+from src.timer_wheel import TimerScheduler
+from src.constants import (
+    SESSION_STATE_RUNNING, MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_BASE, MQTT_TOPIC_SERVER_ALERTS
+)
+
+LASER_TOPIC = f"{MQTT_TOPIC_STATION_BASE}station_laser/event/laser"
+LASER_2_TOPIC = f"{MQTT_TOPIC_STATION_BASE}station_laser/event/laser_2"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockMQTTMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=3, now=0.0)
+        self.assertEqual([bucket.take(0.0) for _ in range(4)], [True, True, True, False])
+        self.assertFalse(bucket.take(0.05))
+        self.assertTrue(bucket.take(0.1)) # One token per 100 ms
+        self.assertEqual(sum(bucket.take(100.0) for _ in range(10)), 3) # Never more than the burst banked
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.alerts = []
+        self.controller = AdmissionController(
+            topic_rate=10, topic_burst=5, station_rate=15, station_burst=8,
+            sustained_seconds=2, quarantine_seconds=30,
+            topic_limits={LASER_2_TOPIC: {'rate_per_second': 1, 'burst': 1}},
+            on_alert=lambda client, alert: self.alerts.append(alert), clock=self.clock)
+
+    def admit(self, topic, count=1, interval=0.0):
+        admitted = 0
+        for _ in range(count):
+            admitted += self.controller.admit(describe_topic(topic))
+            self.clock.now += interval
+        return admitted
+
+    def test_topic_budget(self):
+        self.assertEqual(self.admit(LASER_TOPIC, 10), 5)
+        self.clock.now += 0.5
+        self.assertEqual(self.admit(LASER_TOPIC, 10), 5)
+
+    def test_station_budget_is_shared_by_its_topics(self):
+        self.assertEqual(self.admit(LASER_TOPIC, 5), 5)
+        other = f"{MQTT_TOPIC_STATION_BASE}station_laser/event/ambient"
+        self.assertEqual(self.admit(other, 5), 3) # 8 for the station
+        self.assertEqual(self.admit(f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity", 5), 5)
+
+    def test_topic_override(self):
+        self.assertEqual(self.admit(LASER_2_TOPIC, 5), 1)
+
+    def test_control_and_other_topics_are_exempt(self):
+        self.assertEqual(self.admit(MQTT_TOPIC_SERVER_CONTROL, 1000), 1000)
+        self.assertEqual(self.admit("escaperoom/server/state", 1000), 1000)
+        self.assertEqual(self.controller.rejected, 0)
+
+    def test_sustained_overload_quarantines_then_releases(self):
+        # 100 Hz against a 10 msg/s budget
+        self.admit(LASER_TOPIC, 300, interval=0.01)
+        self.assertEqual(self.controller.quarantined_topics, [LASER_TOPIC])
+        self.assertEqual(len(self.alerts), 1)
+        alert = self.alerts[0]
+        self.assertEqual((alert['alert'], alert['topic'], alert['station_id']),
+                         (ALERT_TOPIC_QUARANTINED, LASER_TOPIC, "station_laser"))
+        self.assertGreater(alert['observed_rate_per_second'], 50)
+
+        # Everything is rejected while quarantined, even after a pause
+        self.clock.now += 10
+        self.assertEqual(self.admit(LASER_TOPIC, 10), 0)
+        # Other topics of the room are unaffected
+        self.assertEqual(self.admit(f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity", 3), 3)
+
+        self.clock.now += 20
+        self.assertEqual(self.admit(LASER_TOPIC, 1), 1)
+        self.assertEqual(self.controller.quarantined_topics, [])
+        self.assertEqual(self.alerts[-1]['alert'], ALERT_TOPIC_RELEASED)
+
+    def test_quarantine_of_a_quiet_topic_ends_on_time(self):
+        scheduler = TimerScheduler(clock=self.clock) # Not started: the wheel is advanced by hand
+        lock = MagicMock()
+        controller = AdmissionController(topic_rate=10, topic_burst=5, sustained_seconds=2, quarantine_seconds=30,
+                                         on_alert=lambda client, alert: self.alerts.append((client, alert)),
+                                         scheduler=scheduler, lock=lock, clock=self.clock)
+        client = MagicMock()
+        for _ in range(300):
+            controller.admit(describe_topic(LASER_TOPIC), client)
+            self.clock.now += 0.01
+        self.assertEqual(controller.quarantined_topics, [LASER_TOPIC])
+
+        # The station went quiet: no message comes to release the topic
+        self.clock.now += 30
+        for timer in scheduler._wheel.advance(scheduler.now_tick()):
+            timer.callback(*timer.args)
+        self.assertEqual(controller.quarantined_topics, [])
+        self.assertEqual(self.alerts[-1][0], client)
+        self.assertEqual((self.alerts[-1][1]['alert'], self.alerts[-1][1]['topic']), (ALERT_TOPIC_RELEASED, LASER_TOPIC))
+        lock.__enter__.assert_called_once()
+        self.assertEqual(controller.admit(describe_topic(LASER_TOPIC)), True)
+
+    def test_short_bursts_are_not_quarantined(self):
+        for _ in range(10):
+            self.admit(LASER_TOPIC, 20) # Over budget for an instant
+            self.clock.now += 5 # Then quiet
+        self.assertEqual(self.controller.quarantined_topics, [])
+        self.assertEqual(self.alerts, [])
+
+
+class TestServerAdmission(unittest.TestCase):
+
+    def setUp(self):
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        server.STATION_STATUS = {}
+        server.CONFIG = {'station_configs': {}}
+        server.DUPLICATE_FILTER.clear()
+        self.clock = FakeClock()
+        self.client = MagicMock()
+        patcher = patch('src.server.ADMISSION', AdmissionController(
+            topic_rate=10, topic_burst=5, sustained_seconds=1, quarantine_seconds=30,
+            on_alert=publish_alert, clock=self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runaway_topic_is_quarantined_and_control_still_handled(self):
+        control_handler = MagicMock()
+        control_handler.can_handle.side_effect = lambda topic, payload, state: topic == MQTT_TOPIC_SERVER_CONTROL
+        control_handler.handle.side_effect = lambda topic, payload, client, state: state
+        with patch('src.server.message_handlers', [control_handler]), \
+             patch('src.server._parse_message_payload', wraps=server._parse_message_payload) as parse:
+            for seq in range(300):
+                server.on_message(self.client, None, MockMQTTMessage(LASER_TOPIC, json.dumps({"value": seq % 2, "seq": seq}).encode()))
+                self.clock.now += 0.01
+            server.on_message(self.client, None, MockMQTTMessage(MQTT_TOPIC_SERVER_CONTROL, b'{"action": "stop"}'))
+        # Only the admitted readings were decoded
+        self.assertLess(parse.call_count, 30)
+        control_handler.handle.assert_called_once()
+        alert_calls = [c for c in self.client.publish.call_args_list if c[0][0] == MQTT_TOPIC_SERVER_ALERTS]
+        self.assertEqual(len(alert_calls), 1)
+        alert = json.loads(alert_calls[0][0][1])
+        self.assertEqual((alert['alert'], alert['topic']), (ALERT_TOPIC_QUARANTINED, LASER_TOPIC))
+
+
+    def test_replayed_backlog_is_not_limited(self):
+        server.CONFIG = {'station_configs': {'station_laser': {'laser_1': {'event_type': 'laser'}}}}
+        with patch('src.server.SESSION_RECORDER', None), patch('src.server.STATE_PUBLISHER'), \
+             patch.object(server.CATCH_UP, 'add', wraps=server.CATCH_UP.add) as add:
+            server.on_connect(self.client, None, {'session present': 1}, 0)
+            for seq in range(300): # Queued by the broker while disconnected, delivered at once
+                server.on_message(self.client, None, MockMQTTMessage(
+                    LASER_TOPIC, json.dumps({"sensor": "laser_1", "value": seq % 2, "seq": seq}).encode()))
+            server.CATCH_UP.finish()
+        self.assertEqual(add.call_count, 300)
+        self.assertEqual(server.ADMISSION.quarantined_topics, [])
+        self.assertEqual(server.ADMISSION.rejected, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import wave
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from src import audio_utils
+from src.audio_engine import AudioEngine, WavSink, decode_wav, to_pcm16, CUE_BUS, MUSIC_BUS
+
+
+class ListSink:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        pass
+
+
+def tone(frames, value=0.5, channels=2):
+    return np.full((frames, channels), value, dtype=np.float32)
+
+
+def write_wav(path, samples, sample_rate, channels=1):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((np.asarray(samples) * 32767).astype('<i2').tobytes())
+
+
+class TestAudioEngineMixing(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = AudioEngine(ListSink(), frame_size=64, duck_gain=0.25, duck_fade_seconds=0.0)
+
+    def test_sources_are_summed_with_their_gain(self):
+        self.engine.play(tone(128, 0.5), gain=0.5)
+        self.engine.play(tone(128, 0.25))
+        out = self.engine.render(1)
+        np.testing.assert_allclose(out, 0.5)
+
+    def test_voice_is_heard_in_the_next_frame_and_removed_when_done(self):
+        self.engine.render(3) # Already running with nothing to play
+        self.engine.play(tone(100, 0.5))
+        out = self.engine.render(2)
+        self.assertTrue(np.all(out[:100] == 0.5)) # No frame of delay after the trigger
+        self.assertTrue(np.all(out[100:] == 0.0))
+        self.assertEqual(self.engine.active_voices, 0)
+
+    def test_loop_wraps_around(self):
+        self.engine.play(np.arange(10, dtype=np.float32)[:, None].repeat(2, axis=1) / 10, bus=MUSIC_BUS, loop=True)
+        out = self.engine.render(1)
+        np.testing.assert_allclose(out[10:20, 0], out[:10, 0])
+        self.assertEqual(self.engine.active_voices, 1)
+
+    def test_music_is_ducked_while_a_cue_plays(self):
+        self.engine.play(tone(640, 0.4), bus=MUSIC_BUS, loop=True)
+        np.testing.assert_allclose(self.engine.render(1), 0.4)
+        self.engine.play(tone(64, 0.0), bus=CUE_BUS)
+        np.testing.assert_allclose(self.engine.render(1), 0.1) # 0.4 * duck gain
+        np.testing.assert_allclose(self.engine.render(1), 0.4) # Cue finished, music restored
+
+    def test_stop_fades_out_without_clicks(self):
+        engine = AudioEngine(ListSink(), sample_rate=1000, frame_size=50)
+        voice = engine.play(tone(10000, 1.0), loop=True)
+        engine.render(1)
+        self.assertTrue(engine.stop(voice, fade_seconds=0.1)) # 100 samples
+        out = engine.render(3)[:, 0]
+        self.assertTrue(np.all(np.diff(out[:100]) < 0)) # Monotonic ramp down
+        self.assertLess(out[99], 0.02)
+        self.assertTrue(np.all(out[100:] == 0.0))
+        self.assertEqual(engine.active_voices, 0)
+        self.assertFalse(engine.stop(voice))
+
+    def test_fade_changes_gain_gradually(self):
+        engine = AudioEngine(ListSink(), sample_rate=1000, frame_size=100)
+        voice = engine.play(tone(1000, 1.0))
+        engine.fade(voice, 0.5, seconds=0.1)
+        out = engine.render(2)[:, 0]
+        self.assertAlmostEqual(float(out[0]), 1.0)
+        self.assertTrue(np.all(out[100:] == 0.5))
+
+    def test_output_is_clipped(self):
+        self.engine.play(tone(64, 0.8))
+        self.engine.play(tone(64, 0.8))
+        pcm = np.frombuffer(to_pcm16(self.engine.render(1)), dtype='<i2')
+        self.assertEqual(int(pcm.max()), 32767)
+
+
+class TestHeadlessRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_decode_resamples_and_spreads_mono(self):
+        path = os.path.join(self.temp_dir, "cue.wav")
+        write_wav(path, np.full(22050, 0.5), sample_rate=22050)
+        samples = decode_wav(path, sample_rate=44100, channels=2)
+        self.assertEqual(samples.shape, (44100, 2))
+        np.testing.assert_allclose(samples, 0.5, atol=1e-4)
+
+    def test_render_to_wav_sink(self):
+        cue_path = os.path.join(self.temp_dir, "cue.wav")
+        write_wav(cue_path, np.full(1000, 0.5), sample_rate=8000)
+        out_path = os.path.join(self.temp_dir, "out.wav")
+        engine = AudioEngine(WavSink(out_path, sample_rate=8000), sample_rate=8000, frame_size=100)
+        engine.play(cue_path, gain=0.5)
+        engine.render(20)
+        engine.close()
+        with wave.open(out_path, 'rb') as wav:
+            self.assertEqual(wav.getnframes(), 2000)
+            pcm = np.frombuffer(wav.readframes(2000), dtype='<i2').reshape(-1, 2)
+        self.assertTrue(np.all(np.abs(pcm[:1000] - 8191) <= 1))
+        self.assertTrue(np.all(pcm[1000:] == 0))
+
+    def test_real_time_thread_stays_close_to_the_clock(self):
+        sink = ListSink()
+        engine = AudioEngine(sink, sample_rate=8000, frame_size=80, lookahead_frames=2) # 10 ms frames
+        engine.start()
+        time.sleep(0.2)
+        engine.close()
+        # ~20 frames of real time plus the lookahead; never a runaway burst
+        self.assertGreaterEqual(len(sink.frames), 10)
+        self.assertLessEqual(len(sink.frames), 30)
+
+
+class TestAudioUtilsWithEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        write_wav(os.path.join(self.temp_dir, "hint.wav"), np.full(100, 0.5), sample_rate=8000)
+        self.config = {
+            "audio_base_path": self.temp_dir,
+            "audio_engine": {"enabled": True, "sample_rate": 8000, "frame_size": 80},
+            "session_timers": {"cues": [{"name": "hint", "after_seconds": 1, "sound": "hint.wav"}]},
+        }
+        audio_utils.configure_audio(self.config)
+        self.engine = audio_utils.start_audio_engine(self.config, sink=ListSink())
+
+    def tearDown(self):
+        audio_utils.stop_audio_engine()
+        audio_utils.configure_audio({})
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_preloaded_cue_is_mixed_without_a_thread(self):
+        audio_utils.warm_up_audio(self.config)
+        self.assertTrue(self.engine.is_loaded(os.path.join(self.temp_dir, "hint.wav")))
+        with patch('src.audio_utils.threading.Thread') as mock_thread:
+            audio_utils.play_audio_threaded("hint.wav", gain=0.5)
+        mock_thread.assert_not_called()
+        deadline = time.monotonic() + 2
+        while not any(frame.any() for frame in list(self.engine.sink.frames)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(any(np.allclose(frame, 0.25, atol=1e-3) for frame in self.engine.sink.frames))
+
+    def play_and_wait(self, sound_file_name, playsound):
+        done = threading.Event()
+        playsound.side_effect = lambda path: done.set()
+        with patch('src.audio_utils._load_backend', return_value=(playsound, Exception)):
+            audio_utils.play_audio_threaded(sound_file_name)
+            self.assertTrue(done.wait(2))
+
+    def test_cue_the_engine_cannot_decode_is_played_with_playsound(self):
+        mp3_path = os.path.join(self.temp_dir, "door.mp3")
+        with open(mp3_path, 'wb') as f:
+            f.write(b'ID3\x03\x00\x00\x00\x00\x00\x00' + bytes(64))
+        playsound = MagicMock()
+        with self.assertLogs(level='WARNING'):
+            self.play_and_wait("door.mp3", playsound)
+        playsound.assert_called_once_with(mp3_path)
+        self.assertEqual(self.engine.active_voices, 0)
+        self.play_and_wait("door.mp3", playsound) # Straight to playsound from now on
+        self.assertEqual(playsound.call_count, 2)
+
+    def test_warm_up_flags_cues_the_engine_cannot_decode(self):
+        with open(os.path.join(self.temp_dir, "door.mp3"), 'wb') as f:
+            f.write(b'ID3' + bytes(64))
+        config = dict(self.config, station_configs={"station_door": {"door": {"sound_on_trigger": "door.mp3"}}})
+        with patch('src.audio_utils._load_backend') as load_backend, self.assertLogs(level='WARNING') as logs:
+            audio_utils.warm_up_audio(config)
+        load_backend.assert_called_once() # Ready for the cue the engine can't play
+        self.assertIn("door.mp3", logs.output[0])
+        self.assertTrue(self.engine.is_loaded(os.path.join(self.temp_dir, "hint.wav")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from src import server
+from src.binary_payload import (
+    encode_binary_payload, decode_binary_payload, binary_sequence, BinaryPayloadError,
+    HEADER, BINARY_MARKER
+)
+from src.constants import SESSION_STATE_RUNNING, MQTT_TOPIC_STATION_BASE
+from tests.test_server_message_handling import MockMQTTMessage
+
+
+class TestBinaryPayload(unittest.TestCase):
+
+    def test_round_trip(self):
+        raw = encode_binary_payload("beacon_proximity", 5, 42, {"sensor": "beacon_proximity_1", "range": 3, "value": 1.5})
+        self.assertEqual(raw[0], BINARY_MARKER)
+        self.assertEqual(decode_binary_payload(raw), {
+            "seq": 42, "station": 5, "event_type": "beacon_proximity",
+            "sensor": "beacon_proximity_1", "range": 3, "value": 1.5,
+        })
+        self.assertEqual(binary_sequence(raw), 42)
+
+    def test_event_types_match_the_topic_names(self):
+        raw = encode_binary_payload("laser", 7, 3, {"sensor": "laser_1", "value": 612})
+        self.assertEqual(decode_binary_payload(raw)["event_type"], "laser") # As in escaperoom/station/<id>/event/laser
+
+    def test_truncated_payload(self):
+        raw = encode_binary_payload("door_status", 1, 1, {"status": "OPEN"})
+        for cut in (HEADER.size - 1, HEADER.size + 1, len(raw) - 1):
+            with self.assertRaises(BinaryPayloadError):
+                decode_binary_payload(raw[:cut])
+
+    def test_unknown_type_tag(self):
+        raw = encode_binary_payload("door_status", 1, 1, {}) + bytes([3, ord('x'), 0])
+        with self.assertRaises(BinaryPayloadError):
+            decode_binary_payload(raw)
+
+    def test_on_message_dispatches_binary_payload(self):
+        """Binary and JSON payloads reach handlers in the same shape."""
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        server.DUPLICATE_FILTER.clear()
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+        handler = MagicMock()
+        handler.can_handle.return_value = True
+        handler.handle.side_effect = lambda topic, payload, client, state: state
+        raw = encode_binary_payload("beacon_proximity", 5, 7, {"sensor": "beacon_proximity_1", "range": 3})
+
+        with patch('src.server.message_handlers', [handler]):
+            server.on_message(MagicMock(), None, MockMQTTMessage(topic, raw))
+
+        payload = handler.handle.call_args[0][1]
+        self.assertEqual(payload["range"], 3)
+        self.assertEqual(payload["sensor"], "beacon_proximity_1")
+
+    def test_on_message_logs_bad_binary_payload(self):
+        msg = MockMQTTMessage("some/topic", bytes([BINARY_MARKER, 1]))
+        with patch('src.server.message_handlers', []), self.assertLogs(level='ERROR') as log:
+            server.on_message(MagicMock(), None, msg)
+            self.assertTrue(any("Could not decode binary payload" in r.getMessage() for r in log.records))
+
+
+if __name__ == '__main__':
+    unittest.main()
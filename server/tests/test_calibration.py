@@ -0,0 +1,280 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import server
+from src.admission import AdmissionController
+from src.calibration import CalibrationManager, StationRateMeter, compute_calibration, BASELINE_FLAG
+from src.calibration_handler import CalibrationHandler
+from src.control_handler import ControlMessageHandler
+from src.station_handler import StationEventHandler
+from src.topics import station_config_topic, station_baseline_topic
+from src.constants import SESSION_STATE_PENDING, MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_BASE
+
+LASER_TOPIC = f"{MQTT_TOPIC_STATION_BASE}station_laser/event/laser"
+BEACON_TOPIC = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+CONFIG = {
+    "station_configs": {
+        "station_5": {
+            "heartbeat_interval_seconds": 10,
+            "beacon_proximity_1": {"event_type": "beacon_proximity", "range_threshold": 5,
+                                   "sound_on_trigger": "shalom.wav", "calibration": {"field": "range"}},
+        },
+        "station_laser": {
+            "laser_1": {"event_type": "laser", "calibration": {"min_deadband": 8}},
+        },
+        "station_door": {
+            "main_door_switch": {"event_type": "door_status", "trigger_value": "OPEN"},
+        },
+    }
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeScheduler:
+    """Records timers; the test fires them by hand."""
+
+    def __init__(self):
+        self.timers = []
+
+    def schedule(self, delay_seconds, callback, *args, name=None):
+        timer = MagicMock()
+        self.timers.append((name, delay_seconds, callback, args, timer))
+        return timer
+
+    def fire(self, name):
+        for index, (timer_name, _, callback, args, timer) in enumerate(self.timers):
+            if timer_name == name and not timer.cancel.called:
+                del self.timers[index]
+                callback(*args)
+                return
+        raise AssertionError(f"No pending timer {name}")
+
+
+class MockMQTTMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TestComputeCalibration(unittest.TestCase):
+
+    def test_thresholds_bracket_the_baseline(self):
+        samples = [598.0, 602.0] * 50 # Mean 600, standard deviation 2
+        calibration = compute_calibration(samples, threshold_sigmas=4, deadband_sigmas=2, min_deadband=1)
+        self.assertEqual(calibration, {"thresholds": [592.0, 608.0], "deadband": 4.0, "baseline": 600.0, "samples": 100})
+
+    def test_rule_thresholds_are_kept(self):
+        calibration = compute_calibration([40.0, 42.0] * 10, rule_thresholds=[5])
+        self.assertEqual(calibration["thresholds"], [5.0, 37.0, 45.0])
+
+    def test_thresholds_fit_in_a_station(self):
+        calibration = compute_calibration([40.0, 42.0] * 10, rule_thresholds=[5, 10, 20])
+        self.assertEqual(calibration["thresholds"], [5.0, 10.0, 20.0, 37.0]) # No room for the upper band edge
+        with self.assertRaises(ValueError):
+            compute_calibration([40.0, 42.0] * 10, rule_thresholds=[1, 2, 3, 4, 5])
+
+    def test_steady_baseline_gets_the_minimum_deadband(self):
+        calibration = compute_calibration([700.0] * 30, min_deadband=8)
+        self.assertEqual((calibration["deadband"], calibration["thresholds"]), (8.0, [692.0, 708.0]))
+
+
+class TestStationRateMeter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rates = StationRateMeter(window_seconds=10, clock=self.clock)
+
+    def count(self, station_id, per_second, seconds):
+        for _ in range(seconds):
+            for _ in range(per_second):
+                self.rates.count(station_id)
+            self.clock.now += 1
+
+    def test_rate_over_complete_seconds(self):
+        self.count("station_laser", 100, 5)
+        self.rates.count("station_laser") # The second in progress doesn't count yet
+        self.assertEqual(self.rates.rate("station_laser"), 100.0)
+        self.clock.now += 1
+        self.count("station_laser", 4, 10)
+        self.assertEqual(self.rates.rate("station_laser"), 4.0) # The window has moved on
+        self.assertEqual(self.rates.rate("station_laser", 3), 4.0)
+        self.assertEqual(self.rates.rate("station_5"), 0.0)
+
+    def test_quiet_seconds_count_as_zero(self):
+        self.count("station_5", 10, 2)
+        self.clock.now += 30
+        self.count("station_5", 10, 1)
+        self.assertEqual(self.rates.rate("station_5"), 1.0) # 10 messages over the 10s window
+
+
+class TestCalibrationManager(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = FakeScheduler()
+        self.rates = StationRateMeter(window_seconds=60, clock=self.clock)
+        self.calibration = CalibrationManager(self.scheduler, self.rates, window_seconds=10, rate_window_seconds=60,
+                                              min_samples=5)
+        self.client = MagicMock()
+
+    def published(self):
+        return {c.args[0]: (json.loads(c.args[1]), c.kwargs) for c in self.client.publish.call_args_list}
+
+    def test_baseline_becomes_retained_station_config(self):
+        self.assertEqual(self.calibration.start(self.client, CONFIG), ["station_5", "station_laser"])
+        self.assertTrue(self.calibration.collecting)
+        # The stations are asked to stream their raw readings, without touching their retained config
+        self.assertEqual(self.published()[station_baseline_topic("station_laser")],
+                         ({BASELINE_FLAG: True, "seconds": 10.0}, {"qos": 1, "retain": False}))
+        self.assertNotIn(station_config_topic("station_laser"), self.published())
+        self.assertTrue(self.calibration.collecting_from("station_5"))
+        for value in (598, 602) * 10:
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_1", "value": value})
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_2", "value": 0}) # Another sensor
+            self.calibration.observe("station_laser", "laser", {"value": "broken"})
+        self.calibration.observe("station_door", "door_status", {"status": "OPEN"})
+
+        self.scheduler.fire("calibrate_station_laser")
+        payload, options = self.published()[station_config_topic("station_laser")]
+        self.assertEqual(options, {"qos": 1, "retain": True})
+        self.assertEqual(payload["sensors"], {"laser_1": {"thresholds": [592.0, 608.0], "deadband": 8.0,
+                                                          "baseline": 600.0, "samples": 20}})
+        self.assertEqual(self.published()[station_baseline_topic("station_laser")][0], {BASELINE_FLAG: False})
+        self.assertEqual(self.calibration.calibration("station_laser"), payload)
+
+        # The beacon sent too few readings to be calibrated: it stops streaming, and its retained config is left alone
+        with self.assertLogs(level='WARNING'):
+            self.scheduler.fire("calibrate_station_5")
+        self.assertEqual(self.published()[station_baseline_topic("station_5")][0], {BASELINE_FLAG: False})
+        self.assertNotIn(station_config_topic("station_5"), self.published())
+        self.assertIsNone(self.calibration.calibration("station_5"))
+        self.assertFalse(self.calibration.collecting)
+
+    def test_failed_recalibration_keeps_the_retained_thresholds(self):
+        self.calibration.start(self.client, CONFIG, ["station_laser"])
+        for _ in range(10):
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_1", "value": 600})
+        self.scheduler.fire("calibrate_station_laser")
+        self.client.reset_mock()
+
+        self.calibration.start(self.client, CONFIG, ["station_laser"])
+        with self.assertLogs(level='WARNING'):
+            self.scheduler.fire("calibrate_station_laser") # No readings this time
+        self.assertEqual([c.args[0] for c in self.client.publish.call_args_list], [station_baseline_topic("station_laser")] * 2)
+        self.assertFalse(any(c.kwargs["retain"] for c in self.client.publish.call_args_list))
+
+    def test_recalibrating_one_station_starts_over(self):
+        self.calibration.start(self.client, CONFIG, ["station_laser"])
+        for _ in range(10):
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_1", "value": 100})
+        first_timer = self.scheduler.timers[0][4]
+        self.calibration.start(self.client, CONFIG, ["station_laser"], window_seconds=2)
+        first_timer.cancel.assert_called_once()
+        self.assertEqual(self.scheduler.timers[-1][1], 2.0)
+        for _ in range(10):
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_1", "value": 600})
+        self.scheduler.fire("calibrate_station_laser")
+        payload, _ = self.published()[station_config_topic("station_laser")]
+        self.assertEqual(payload["sensors"]["laser_1"]["baseline"], 600.0)
+
+    def test_station_without_calibrated_sensors_is_skipped(self):
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self.calibration.start(self.client, CONFIG, ["station_door", "station_unknown"]), [])
+        self.assertFalse(self.calibration.collecting)
+
+    def test_rates_before_and_after_are_reported(self):
+        for _ in range(60): # Streaming every bucket change
+            for _ in range(50):
+                self.rates.count("station_laser")
+            self.clock.now += 1
+        self.calibration.start(self.client, CONFIG, ["station_laser"])
+        for _ in range(10):
+            self.calibration.observe("station_laser", "laser", {"sensor": "laser_1", "value": 600})
+        self.scheduler.fire("calibrate_station_laser")
+        for _ in range(60): # Threshold crossings only
+            self.rates.count("station_laser")
+            self.clock.now += 1
+        with self.assertLogs(level='INFO') as logs:
+            self.scheduler.fire("calibration_rates_station_laser")
+        self.assertEqual(self.calibration.reports["station_laser"], {"before_per_second": 50.0, "after_per_second": 1.0})
+        self.assertIn("50.0x fewer", logs.output[0])
+
+
+class TestServerCalibration(unittest.TestCase):
+
+    def setUp(self):
+        server.SESSION_STATE = SESSION_STATE_PENDING
+        server.STATION_STATUS = {}
+        server.CONFIG = CONFIG
+        server.DUPLICATE_FILTER.clear()
+        self.clock = FakeClock()
+        self.scheduler = FakeScheduler()
+        self.rates = StationRateMeter(clock=self.clock)
+        self.calibration = CalibrationManager(self.scheduler, self.rates, min_samples=5)
+        self.client = MagicMock()
+        patches = [
+            patch('src.server.ADMISSION', None),
+            patch('src.server.STATION_RATES', self.rates),
+            patch('src.server.CALIBRATION', self.calibration),
+            patch('src.server.message_handlers',
+                  [CalibrationHandler(self.calibration), ControlMessageHandler(), StationEventHandler()]),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def send(self, topic, payload):
+        server.on_message(self.client, None, MockMQTTMessage(topic, json.dumps(payload).encode()))
+
+    def test_calibrate_action_collects_station_readings(self):
+        self.send(MQTT_TOPIC_SERVER_CONTROL, {"action": "calibrate", "station_id": "station_laser"})
+        self.assertEqual(server.SESSION_STATE, SESSION_STATE_PENDING) # Not a session action
+        for seq in range(10):
+            self.send(LASER_TOPIC, {"sensor": "laser_1", "value": 600 + seq % 2, "seq": seq})
+        self.send(BEACON_TOPIC, {"sensor": "beacon_proximity_1", "range": 40, "seq": 1}) # Not being calibrated
+        self.scheduler.fire("calibrate_station_laser")
+
+        payload = json.loads(self.client.publish.call_args_list[-1].args[1])
+        self.assertEqual(self.client.publish.call_args_list[-1].args[0], station_config_topic("station_laser"))
+        self.assertEqual(payload["sensors"]["laser_1"]["samples"], 10)
+        self.clock.now += 1
+        self.assertEqual(self.rates.rate("station_laser"), 10.0)
+
+    def test_streamed_baseline_is_not_rate_limited(self):
+        admission = AdmissionController(topic_rate=10, topic_burst=5, sustained_seconds=1, clock=self.clock)
+        with patch('src.server.ADMISSION', admission):
+            self.send(MQTT_TOPIC_SERVER_CONTROL, {"action": "calibrate", "station_id": "station_laser"})
+            for seq in range(100): # A scan every 10 ms
+                self.send(LASER_TOPIC, {"sensor": "laser_1", "value": 600 + seq % 2, "seq": seq})
+                self.clock.now += 0.01
+            self.scheduler.fire("calibrate_station_laser")
+        payload = json.loads(self.client.publish.call_args_list[-1].args[1])
+        self.assertEqual(payload["sensors"]["laser_1"]["samples"], 100)
+        self.assertEqual(admission.rejected, 0)
+
+    def test_heartbeat_only_proves_liveness(self):
+        heartbeat_topic = f"{MQTT_TOPIC_STATION_BASE}station_laser/event/heartbeat"
+        with patch('src.server.LIVENESS_TRACKER') as liveness, patch('src.server._dispatch') as dispatch:
+            liveness.touch.return_value = False
+            self.send(heartbeat_topic, {"seq": 1})
+        liveness.touch.assert_called_once()
+        dispatch.assert_not_called()
+        self.clock.now += 1
+        self.assertEqual(self.rates.rate("station_laser"), 0.0) # Not sensor traffic
+
+    def test_invalid_window_is_rejected(self):
+        with self.assertLogs(level='WARNING'):
+            self.send(MQTT_TOPIC_SERVER_CONTROL, {"action": "calibrate", "window_seconds": "soon"})
+        self.assertFalse(self.calibration.collecting)
+
+
+if __name__ == '__main__':
+    unittest.main()
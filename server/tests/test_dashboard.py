@@ -0,0 +1,57 @@
+import json
+import threading
+import unittest
+import urllib.request
+
+from src.dashboard import DashboardServer
+
+
+class TestDashboardServer(unittest.TestCase):
+
+    def setUp(self):
+        self.dashboard = DashboardServer("127.0.0.1", 0)
+        self.dashboard.start()
+        self.base_url = f"http://127.0.0.1:{self.dashboard.port}"
+
+    def tearDown(self):
+        self.dashboard.stop()
+
+    def test_state_endpoint(self):
+        snapshot = {"session_state": "RUNNING", "station_status": {}, "station_liveness": {}, "config_version": "abc"}
+        self.dashboard.update(1, snapshot, snapshot)
+        with urllib.request.urlopen(f"{self.base_url}/state", timeout=2) as response:
+            self.assertEqual(response.headers["Content-Type"], "application/json")
+            body = json.loads(response.read())
+        self.assertEqual(body, {"version": 1, "state": snapshot})
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            urllib.request.urlopen(f"{self.base_url}/nope", timeout=2)
+        self.assertEqual(ctx.exception.code, 404)
+
+    def test_event_stream_sends_snapshot_then_deltas(self):
+        self.dashboard.update(1, {"session_state": "PENDING"}, {"session_state": "PENDING"})
+        response = urllib.request.urlopen(f"{self.base_url}/events", timeout=2)
+
+        def read_event():
+            lines = []
+            while True:
+                line = response.readline().decode().rstrip("\n")
+                if not line:
+                    return dict(l.split(": ", 1) for l in lines)
+                lines.append(line)
+
+        first = read_event()
+        self.assertEqual(first["event"], "snapshot")
+        self.assertEqual(json.loads(first["data"])["state"], {"session_state": "PENDING"})
+
+        threading.Timer(0.05, self.dashboard.update, args=(2, {"session_state": "RUNNING"}, {"session_state": "RUNNING"})).start()
+        second = read_event()
+        self.assertEqual(second["event"], "delta")
+        self.assertEqual(second["id"], "2")
+        self.assertEqual(json.loads(second["data"]), {"version": 2, "changes": {"session_state": "RUNNING"}})
+        response.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import logging
+import statistics
+from array import array
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import server
+from src.dedup_cache import DuplicateFilter
+from src.topics import describe_topic
+from src.constants import SESSION_STATE_RUNNING, MQTT_TOPIC_STATION_BASE
+
+WARM_UP_MESSAGES = 300
+MEASURED_MESSAGES = 1000
+# Net memory kept per message once caches are full: nothing should accumulate
+MAX_RETAINED_BYTES_PER_MESSAGE = 16
+# Transient footprint of handling one message (parsed payload, dedup key, ...). With a
+# str decode, a rebuilt ServerState, topic splits and an INFO log per message, the
+# median was ~6.4 KB
+MAX_MEDIAN_PEAK_BYTES = 2 * 1024
+# Occasional spikes: the dedup LRU compacting its table
+MAX_PEAK_BYTES = 12 * 1024
+
+
+class MockMQTTMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class TestDispatchAllocations(unittest.TestCase):
+
+    def setUp(self):
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        server.STATION_STATUS = {}
+        server.CONFIG = {
+            'station_configs': {
+                'station_5': {
+                    'beacon_1': {'event_type': 'beacon_proximity', 'range_threshold': 5, 'sound_on_trigger': 'a.wav'},
+                },
+            }
+        }
+        self.client = MagicMock()
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+        # Readings that don't trigger: the steady state of a station reporting its sensor
+        self.messages = [MockMQTTMessage(topic, json.dumps({"range": 10.5, "seq": seq}).encode('utf-8'))
+                         for seq in range(WARM_UP_MESSAGES + MEASURED_MESSAGES)]
+        patches = [
+            patch('src.server.DUPLICATE_FILTER', DuplicateFilter(max_entries=64)),
+            patch('src.server.ADMISSION', None), # The readings are sent far faster than any station budget
+            patch('src.server.SESSION_RECORDER', None),
+            patch('src.server.STATE_PUBLISHER'),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_steady_state_allocation_ceiling(self):
+        previous_level = logging.getLogger().level
+        logging.getLogger().setLevel(logging.INFO) # Production level: DEBUG is off
+        self.addCleanup(logging.getLogger().setLevel, previous_level)
+
+        for msg in self.messages[:WARM_UP_MESSAGES]:
+            server.on_message(self.client, None, msg)
+
+        measured = self.messages[WARM_UP_MESSAGES:]
+        peaks = array('q', bytes(8 * MEASURED_MESSAGES)) # Preallocated: the bookkeeping must not count
+        tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            for index, msg in enumerate(measured):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                server.on_message(self.client, None, msg)
+                _, peak = tracemalloc.get_traced_memory()
+                peaks[index] = peak - before
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(server.STATION_STATUS, {}) # Nothing triggered
+        self.assertLessEqual((current - baseline) / MEASURED_MESSAGES, MAX_RETAINED_BYTES_PER_MESSAGE)
+        self.assertLessEqual(statistics.median(peaks), MAX_MEDIAN_PEAK_BYTES)
+        self.assertLessEqual(max(peaks), MAX_PEAK_BYTES)
+
+    def test_server_state_is_reused_while_unchanged(self):
+        state = server._current_server_state()
+        self.assertIs(server._current_server_state(), state)
+        server.STATION_STATUS = {"station_5": {"completed": True}}
+        self.assertIsNot(server._current_server_state(), state)
+
+    def test_topic_descriptors_are_cached(self):
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+        descriptor = describe_topic(topic)
+        self.assertIs(describe_topic(topic), descriptor)
+        self.assertEqual((descriptor.station_id, descriptor.event_type), ("station_5", "beacon_proximity"))
+        self.assertFalse(describe_topic(f"{MQTT_TOPIC_STATION_BASE}station_5/some_action").is_station_event)
+        self.assertTrue(describe_topic("escaperoom/server/control").is_control)
+
+
+if __name__ == '__main__':
+    unittest.main()
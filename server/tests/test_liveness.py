@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.liveness import LivenessTracker, station_id_from_topic, heartbeat_interval, publish_liveness
+from src.constants import MQTT_TOPIC_LIVENESS_BASE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLivenessTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = LivenessTracker(clock=self.clock, wall_clock=self.clock)
+
+    def test_online_offline_transitions(self):
+        self.assertTrue(self.tracker.touch("station_5", 10)) # First message: came online
+        self.assertFalse(self.tracker.touch("station_5", 10)) # Still online
+        self.assertTrue(self.tracker.status["station_5"]["online"])
+
+        self.clock.now += 19
+        self.assertEqual(self.tracker.expire(), [])
+        self.clock.now += 2 # 21s of silence > 2 x 10s
+        self.assertEqual(self.tracker.expire(), ["station_5"])
+        self.assertFalse(self.tracker.status["station_5"]["online"])
+        self.assertEqual(self.tracker.expire(), []) # Reported once
+
+        self.assertTrue(self.tracker.touch("station_5", 10)) # Back online
+
+    def test_activity_postpones_deadline(self):
+        self.tracker.touch("station_5", 10)
+        for _ in range(10):
+            self.clock.now += 15
+            self.tracker.touch("station_5", 10)
+            self.assertEqual(self.tracker.expire(), [])
+        self.clock.now += 21
+        self.assertEqual(self.tracker.expire(), ["station_5"])
+
+    def test_per_station_intervals(self):
+        self.tracker.touch("fast", 1)
+        self.tracker.touch("slow", 60)
+        self.clock.now += 5
+        self.assertEqual(self.tracker.expire(), ["fast"])
+        self.assertTrue(self.tracker.status["slow"]["online"])
+
+    def test_heap_stays_bounded(self):
+        """High-rate traffic does not grow the deadline heap: one entry per station."""
+        for i in range(10000):
+            self.tracker.touch(f"station_{i % 300}", 30)
+        self.assertEqual(len(self.tracker._heap), 300)
+
+    def test_status_is_copy_on_write(self):
+        self.tracker.touch("station_5", 10)
+        before = self.tracker.status
+        self.clock.now += 30
+        self.tracker.expire()
+        self.assertTrue(before["station_5"]["online"])
+        self.assertIsNot(before, self.tracker.status)
+
+
+class TestLivenessHelpers(unittest.TestCase):
+
+    def test_station_id_from_topic(self):
+        self.assertEqual(station_id_from_topic("escaperoom/station/station_5/event/door_status"), "station_5")
+        self.assertIsNone(station_id_from_topic("escaperoom/server/control"))
+
+    def test_heartbeat_interval_from_config(self):
+        config = {"default_heartbeat_interval_seconds": 15,
+                  "station_configs": {"station_5": {"heartbeat_interval_seconds": 5}}}
+        self.assertEqual(heartbeat_interval(config, "station_5"), 5)
+        self.assertEqual(heartbeat_interval(config, "station_door"), 15)
+        self.assertEqual(heartbeat_interval({}, "station_door"), 30)
+
+    def test_publish_is_retained(self):
+        client = MagicMock()
+        publish_liveness(client, "station_5", {"online": False, "last_seen": 1.0})
+        client.publish.assert_called_once_with(
+            f"{MQTT_TOPIC_LIVENESS_BASE}station_5",
+            '{"station_id": "station_5", "online": false, "last_seen": 1.0}', qos=1, retain=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.shm_ring import ShmRing
+from src.multiprocess_runtime import (
+    Supervisor, RingWriter, CueForwarder, worker_should_run, apply_ingest_record,
+    pack_ingest_record, unpack_ingest_record, pack_cue_record, unpack_cue_record,
+    RECORD_MESSAGE, RECORD_CONNECTED, RECORD_DISCONNECTED, CUE_PLAY, CUE_MUSIC_ON, CUE_MUSIC_OFF
+)
+
+CONTEXT = multiprocessing.get_context('spawn')
+
+
+def crash():
+    """Worker that dies right away. Runs in a child process."""
+    os._exit(3)
+
+
+def idle(stop_event):
+    """Worker that runs until asked to stop. Runs in a child process."""
+    while worker_should_run(stop_event):
+        stop_event.wait(0.05)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_ingest_record_round_trip(self):
+        record = pack_ingest_record(RECORD_MESSAGE, 12.5, "escaperoom/station/station_5/event/door_status", b'{"status": "OPEN"}')
+        self.assertEqual(unpack_ingest_record(record),
+                         (RECORD_MESSAGE, 0, 12.5, "escaperoom/station/station_5/event/door_status", b'{"status": "OPEN"}'))
+
+    def test_connection_record_carries_session_flag(self):
+        kind, flags, _, topic, payload = unpack_ingest_record(pack_ingest_record(RECORD_CONNECTED, 1.0, flags=1))
+        self.assertEqual((kind, flags, topic, payload), (RECORD_CONNECTED, 1, '', b''))
+
+    def test_cue_record_round_trip(self):
+        kind, requested_at, sound, gain = unpack_cue_record(pack_cue_record(CUE_PLAY, 3.0, "hint.wav", 0.5))
+        self.assertEqual((kind, requested_at, sound, gain), (CUE_PLAY, 3.0, "hint.wav", 0.5))
+
+
+class TestCueForwarding(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = ShmRing.create(4, 64, CONTEXT.Semaphore(0))
+        self.addCleanup(self.ring.close)
+        self.writer = RingWriter(self.ring, "audio process")
+
+    def test_cues_and_music_are_forwarded_instead_of_played(self):
+        from src import audio_utils
+        audio_utils.forward_audio(CueForwarder(self.writer, clock=lambda: 7.0))
+        self.addCleanup(audio_utils.forward_audio, None)
+        audio_utils.play_audio_threaded("door_open_sound.wav", gain=0.8)
+        audio_utils.update_background_music(True, {})
+        audio_utils.update_background_music(False, {})
+        records = [unpack_cue_record(self.ring.get(timeout=0)) for _ in range(3)]
+        self.assertEqual(records[0][:3], (CUE_PLAY, 7.0, "door_open_sound.wav"))
+        self.assertAlmostEqual(records[0][3], 0.8, places=5)
+        self.assertEqual([record[0] for record in records[1:]], [CUE_MUSIC_ON, CUE_MUSIC_OFF])
+
+    def test_full_ring_drops_and_counts(self):
+        for _ in range(6):
+            self.writer.put(b'cue')
+        self.assertEqual(len(self.ring), 4)
+        self.assertEqual(self.writer.dropped, 2)
+
+
+    def test_bounded_wait_drops_once_the_ring_stays_full(self):
+        for _ in range(4):
+            self.writer.put(b'cue')
+        started = time.monotonic()
+        self.assertFalse(self.writer.put(b'music', wait_seconds=0.05))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(self.writer.dropped, 1)
+
+    def test_unbounded_wait_holds_the_record_until_there_is_room(self):
+        for _ in range(4):
+            self.writer.put(b'message')
+        consumer = threading.Timer(0.05, self.ring.get, kwargs={'timeout': 0})
+        consumer.start()
+        self.addCleanup(consumer.join)
+        self.assertTrue(self.writer.put(b'connected', wait_seconds=None))
+        self.assertEqual([self.ring.get(timeout=0) for _ in range(4)][-1], b'connected')
+        self.assertEqual(self.writer.dropped, 0)
+
+    def test_unbounded_wait_gives_up_on_shutdown(self):
+        stop_event = threading.Event()
+        writer = RingWriter(self.ring, "rule process", lambda: not stop_event.is_set())
+        for _ in range(4):
+            writer.put(b'message')
+        threading.Timer(0.05, stop_event.set).start()
+        self.assertFalse(writer.put(b'connected', wait_seconds=None))
+        self.assertEqual(writer.dropped, 1)
+
+
+class TestApplyIngestRecord(unittest.TestCase):
+
+    def test_message_and_connection_records_reach_the_server(self):
+        from src import server
+        client = MagicMock()
+        with patch.object(server, 'on_message') as on_message, \
+             patch.object(server, 'note_broker_connected') as connected, \
+             patch.object(server, 'note_broker_disconnected') as disconnected:
+            apply_ingest_record(server, client, pack_ingest_record(
+                RECORD_MESSAGE, 1.0, "escaperoom/server/control", b'{"action": "start"}'))
+            apply_ingest_record(server, client, pack_ingest_record(RECORD_CONNECTED, 2.0, flags=1))
+            apply_ingest_record(server, client, pack_ingest_record(RECORD_DISCONNECTED, 3.0))
+        msg = on_message.call_args[0][2]
+        self.assertEqual((msg.topic, msg.payload), ("escaperoom/server/control", b'{"action": "start"}'))
+        connected.assert_called_once_with(client, True)
+        disconnected.assert_called_once_with()
+
+
+class TestWorkerConfig(unittest.TestCase):
+
+    def test_reload_config_reads_the_file_in_a_worker(self):
+        import json
+        import tempfile
+        from src import config_loader, server
+        from src.control_handler import ControlMessageHandler
+        from src.constants import MQTT_TOPIC_SERVER_CONTROL, SESSION_STATE_RUNNING
+
+        config_dir = tempfile.mkdtemp()
+        config_path = os.path.join(config_dir, 'config.json')
+        self.addCleanup(lambda: (os.remove(config_path), os.rmdir(config_dir)))
+        supervisor_config = {"station_configs": {}, "version": 1}
+        with open(config_path, 'w') as f:
+            json.dump(supervisor_config, f)
+        config_loader.use_config(supervisor_config) # As _init_worker does
+        self.addCleanup(config_loader.use_config, None)
+
+        with patch.object(config_loader, '_DEFAULT_CONFIG_PATH', config_path):
+            self.assertIs(config_loader.preloaded_config(), supervisor_config)
+            with open(config_path, 'w') as f: # The operator edits config.json, then sends reload_config
+                json.dump({"station_configs": {}, "version": 2}, f)
+            state = server._current_server_state().replace(session_state=SESSION_STATE_RUNNING, config=supervisor_config)
+            new_state = ControlMessageHandler().handle(MQTT_TOPIC_SERVER_CONTROL, {"action": "reload_config"}, MagicMock(), state)
+        self.assertEqual(new_state.config["version"], 2)
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def make_supervisor(self, **kwargs):
+        supervisor = Supervisor(CONTEXT, CONTEXT.Event(), **kwargs)
+        self.addCleanup(supervisor.stop, 2)
+        return supervisor
+
+    def test_crashed_worker_is_restarted_with_growing_delay(self):
+        supervisor = self.make_supervisor(restart_delay_seconds=0.05, max_restart_delay_seconds=0.2)
+        supervisor.add('crasher', crash)
+        supervisor.start()
+
+        def restarted_three_times():
+            supervisor.poll()
+            return supervisor.restarts['crasher'] >= 3
+        self.assertTrue(wait_for(restarted_three_times))
+        self.assertEqual(supervisor._workers['crasher'].delay, 0.2)
+
+    def test_healthy_worker_is_left_alone_and_stopped_on_request(self):
+        supervisor = self.make_supervisor()
+        supervisor.add('idle', idle, (supervisor.stop_event,))
+        supervisor.start()
+        pid = supervisor.pid('idle')
+        time.sleep(0.2)
+        self.assertEqual(supervisor.poll(), [])
+        self.assertEqual(supervisor.pid('idle'), pid)
+        supervisor.stop(timeout=5)
+        self.assertFalse(supervisor._workers['idle'].process.is_alive())
+        self.assertEqual(supervisor._workers['idle'].process.exitcode, 0) # Exited by itself, not terminated
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import logging
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.puzzle_graph import PuzzleGraph, PuzzleGraphError, PuzzleProgress, puzzle_graph, evaluate_progress
+from src.server_state import ServerState
+from src.station_handler import StationEventHandler
+from src.control_handler import ControlMessageHandler
+from src.constants import SESSION_STATE_RUNNING, MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_BASE
+
+DONE = {"completed": True}
+
+
+def chain(length):
+    """station_0 <- station_1 <- ... : each station requires the previous one."""
+    return PuzzleGraph({f"station_{i}": [f"station_{i - 1}"] if i else [] for i in range(length)})
+
+
+class TestPuzzleGraph(unittest.TestCase):
+
+    def test_topological_order_and_implicit_roots(self):
+        graph = PuzzleGraph.from_config({
+            "station_door": {"requires": ["station_5", "station_laser"]},
+            "station_5": {"requires": ["station_intro"]},
+        })
+        self.assertEqual(len(graph), 4)
+        self.assertIn("station_laser", graph) # Only named as a requirement
+        order = graph.order
+        self.assertLess(order.index("station_intro"), order.index("station_5"))
+        self.assertLess(order.index("station_5"), order.index("station_door"))
+        self.assertEqual(graph.dependents["station_5"], ("station_door",))
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(PuzzleGraphError):
+            PuzzleGraph.from_config({"a": {"requires": ["b"]}, "b": {"requires": ["a"]}})
+
+    def test_malformed_config_is_rejected(self):
+        with self.assertRaises(PuzzleGraphError):
+            PuzzleGraph.from_config({"a": {"requires": "b"}})
+
+    def test_graph_is_built_once_per_config(self):
+        config = {"puzzle_graph": {"a": {"requires": []}}}
+        self.assertIs(puzzle_graph(config), puzzle_graph(config))
+        self.assertIsNone(puzzle_graph({}))
+        with self.assertLogs(level='ERROR'):
+            self.assertIsNone(puzzle_graph({"puzzle_graph": {"a": {"requires": ["a"]}}}))
+
+
+class TestPuzzleProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = PuzzleGraph({
+            "station_5": [], "station_laser": [],
+            "station_door": ["station_5", "station_laser"],
+            "station_exit": ["station_door"],
+        })
+
+    def test_initial_progress(self):
+        progress = PuzzleProgress.evaluate(self.graph, {})
+        self.assertEqual(progress.percent_complete, 0.0)
+        self.assertEqual(progress.available, {"station_5", "station_laser"})
+        self.assertEqual(progress.next_unlockable, ["station_door"])
+        self.assertFalse(progress.is_unlocked("station_door"))
+        self.assertTrue(progress.is_unlocked("station_unrelated")) # Not in the graph
+
+    def test_completion_unlocks_dependents(self):
+        status = {"station_5": DONE}
+        progress = PuzzleProgress.evaluate(self.graph, {}).update(status, ["station_5"])
+        self.assertEqual(progress.solved, {"station_5"})
+        self.assertFalse(progress.is_unlocked("station_door")) # Still waiting for the laser
+        status = dict(status, station_laser=DONE)
+        progress = progress.update(status, ["station_laser"])
+        self.assertTrue(progress.is_unlocked("station_door"))
+        self.assertEqual(progress.available, {"station_door"})
+        self.assertEqual(progress.next_unlockable, ["station_exit"])
+        self.assertEqual(progress.percent_complete, 50.0)
+        self.assertEqual(progress.to_dict(), {
+            "percent_complete": 50.0, "solved": ["station_5", "station_laser"],
+            "available": ["station_door"], "next_unlockable": ["station_exit"],
+        })
+
+    def test_completion_of_a_locked_station_does_not_count(self):
+        progress = PuzzleProgress.evaluate(self.graph, {"station_door": DONE})
+        self.assertEqual(progress.solved, frozenset())
+        # Solving the requirements later makes the earlier completion count
+        status = {"station_door": DONE, "station_5": DONE, "station_laser": DONE}
+        progress = progress.update(status, ["station_5", "station_laser"])
+        self.assertEqual(progress.solved, {"station_5", "station_laser", "station_door"})
+        self.assertEqual(progress.available, {"station_exit"})
+
+    def test_unsolving_propagates_downstream(self):
+        status = {station_id: DONE for station_id in self.graph.order}
+        progress = PuzzleProgress.evaluate(self.graph, status)
+        self.assertEqual(progress.percent_complete, 100.0)
+        del status["station_5"]
+        progress = progress.update(status, ["station_5"])
+        self.assertEqual(progress.solved, {"station_laser"})
+        self.assertEqual(progress.available, {"station_5"})
+
+    def test_unchanged_update_returns_same_progress(self):
+        progress = PuzzleProgress.evaluate(self.graph, {})
+        self.assertIs(progress.update({}, ["station_5", "not_in_graph"]), progress)
+
+    def test_update_cost_follows_the_change_not_the_room(self):
+        graph = chain(2000)
+        status = {f"station_{i}": DONE for i in range(1000)}
+        progress = PuzzleProgress.evaluate(graph, status)
+        self.assertEqual(progress.available, {"station_1000"})
+        status["station_1000"] = DONE
+        progress = progress.update(status, ["station_1000"])
+        self.assertEqual(progress.evaluated, 2) # The station and the one it unlocks
+        self.assertEqual(progress.available, {"station_1001"})
+
+
+class TestPuzzleGraphInHandlers(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            "puzzle_graph": {"station_door": {"requires": ["station_5"]}},
+            "station_configs": {
+                "station_5": {"beacon_proximity_1": {"event_type": "beacon_proximity", "range_threshold": 5,
+                                                     "sound_on_trigger": "shalom.wav"}},
+                "station_door": {"main_door_switch": {"event_type": "door_status", "trigger_value": "OPEN",
+                                                      "sound_on_trigger": "door_open_sound.wav"}},
+            },
+        }
+        self.state = ServerState(SESSION_STATE_RUNNING, {}, self.config, logging,
+                                 puzzle_progress=evaluate_progress(self.config, {}))
+        self.handler = StationEventHandler()
+
+    def handle(self, station_id, event_type, payload, state):
+        return self.handler.handle(f"{MQTT_TOPIC_STATION_BASE}{station_id}/event/{event_type}", payload, MagicMock(), state)
+
+    @patch('src.station_handler.play_audio_threaded')
+    def test_locked_station_is_ignored_until_unlocked(self, play):
+        state = self.handle("station_door", "door_status", {"status": "OPEN"}, self.state)
+        self.assertIs(state, self.state)
+        play.assert_not_called()
+
+        state = self.handle("station_5", "beacon_proximity", {"range": 2}, state)
+        self.assertEqual(state.puzzle_progress.available, {"station_door"})
+        self.assertEqual(state.to_dict()["puzzle_progress"]["percent_complete"], 50.0)
+
+        state = self.handle("station_door", "door_status", {"status": "OPEN"}, state)
+        self.assertEqual(state.station_status["station_door"], DONE)
+        self.assertEqual(state.puzzle_progress.percent_complete, 100.0)
+        play.assert_called_with("door_open_sound.wav", gain=1.0)
+
+    @patch('src.station_handler.play_audio_threaded')
+    def test_reset_evaluates_progress_from_scratch(self, play):
+        state = self.handle("station_5", "beacon_proximity", {"range": 2}, self.state)
+        state = ControlMessageHandler().handle(MQTT_TOPIC_SERVER_CONTROL, {"action": "reset"}, MagicMock(), state)
+        self.assertEqual(state.puzzle_progress.solved, frozenset())
+        self.assertFalse(state.puzzle_progress.is_unlocked("station_door"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import random
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import server
+from src.reconnect import ReconnectPolicy, CatchUpBuffer
+from src.timer_wheel import TimerScheduler
+from src.constants import SESSION_STATE_RUNNING, MQTT_TOPIC_STATION_BASE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockMQTTMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = json.dumps(payload).encode('utf-8')
+
+
+class TestReconnectPolicy(unittest.TestCase):
+
+    def test_jittered_delays_stay_in_range(self):
+        policy = ReconnectPolicy(min_seconds=4, max_seconds=60, jitter=0.5, rng=random.Random(1))
+        delays = [policy.first_delay() for _ in range(100)]
+        self.assertTrue(all(2 <= d <= 4 for d in delays))
+        self.assertGreater(len({round(d, 3) for d in delays}), 50) # Actually spread out
+
+    def test_apply_sets_paho_backoff(self):
+        client = MagicMock()
+        ReconnectPolicy(min_seconds=8, max_seconds=60, jitter=0.0).apply(client)
+        client.reconnect_delay_set.assert_called_once_with(min_delay=8, max_delay=60)
+
+    def test_jitter_survives_at_the_default_delay(self):
+        client = MagicMock()
+        policy = ReconnectPolicy(min_seconds=1, max_seconds=60, jitter=0.5, rng=random.Random(3))
+        for _ in range(20):
+            policy.apply(client)
+        min_delays = {c.kwargs['min_delay'] for c in client.reconnect_delay_set.call_args_list}
+        self.assertGreater(len(min_delays), 10) # Not all rounded to 1
+        self.assertTrue(all(0.5 <= d <= 1.0 for d in min_delays))
+
+
+class TestCatchUpBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = TimerScheduler()
+        self.on_batch = MagicMock()
+        self.buffer = CatchUpBuffer(self.scheduler, self.on_batch, quiet_seconds=0.25, max_seconds=5,
+                                    clock=self.clock)
+
+    def test_not_buffering_outside_catch_up(self):
+        self.assertFalse(self.buffer.add("escaperoom/station/s1/event/door_status", {"status": "OPEN"}, "s1"))
+
+    def test_superseded_readings_are_collapsed(self):
+        client = MagicMock()
+        self.buffer.on_disconnect()
+        self.clock.now += 30
+        self.buffer.begin(client)
+        beacon = "escaperoom/station/s5/event/beacon_proximity"
+        door = "escaperoom/station/door/event/door_status"
+        self.buffer.add(beacon, {"sensor": "b1", "range": 9}, "s5")
+        self.buffer.add(door, {"status": "OPEN"}, "door")
+        self.buffer.add(beacon, {"sensor": "b2", "range": 7}, "s5") # Another sensor: kept
+        self.buffer.add(beacon, {"sensor": "b1", "range": 2}, "s5") # Supersedes range 9
+        self.clock.now += 0.5
+        self.buffer.finish()
+
+        client_arg, messages, stats = self.on_batch.call_args.args
+        self.assertIs(client_arg, client)
+        self.assertEqual([m[1] for m in messages],
+                         [{"status": "OPEN"}, {"sensor": "b2", "range": 7}, {"sensor": "b1", "range": 2}])
+        self.assertEqual((stats['received'], stats['applied']), (4, 3))
+        self.assertAlmostEqual(stats['downtime_seconds'], 30)
+        self.assertAlmostEqual(stats['recovery_seconds'], 30.5)
+        self.assertFalse(self.buffer.active)
+        self.assertEqual(len(self.scheduler), 0) # Quiet timer cancelled
+
+    def test_superseded_trigger_is_kept(self):
+        buffer = CatchUpBuffer(self.scheduler, self.on_batch, clock=self.clock,
+                               is_trigger=lambda topic, payload, station_id: payload["range"] <= 5)
+        buffer.begin(MagicMock())
+        beacon = "escaperoom/station/s5/event/beacon_proximity"
+        for range_value in (9, 3, 2, 8, 9):
+            buffer.add(beacon, {"sensor": "b1", "range": range_value}, "s5")
+        buffer.finish()
+        _, messages, stats = self.on_batch.call_args.args
+        self.assertEqual([m[1]["range"] for m in messages], [2, 9]) # The latest trigger, then the latest reading
+        self.assertEqual(stats['applied'], 2)
+
+    def test_quiet_timer_waits_for_silence(self):
+        self.buffer.begin(MagicMock())
+        self.clock.now += 0.2
+        self.buffer.add("escaperoom/station/s1/event/x", {}, "s1")
+        self.clock.now += 0.1
+        self.buffer._check_quiet() # Only 0.1s of silence: rescheduled
+        self.on_batch.assert_not_called()
+        self.clock.now += 0.2
+        self.buffer._check_quiet()
+        self.on_batch.assert_called_once()
+
+
+class TestServerCatchUp(unittest.TestCase):
+
+    def setUp(self):
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        server.STATION_STATUS = {}
+        server.DUPLICATE_FILTER.clear()
+        recorder_patcher = patch('src.server.SESSION_RECORDER', None) # No analytics files from tests
+        recorder_patcher.start()
+        self.addCleanup(recorder_patcher.stop)
+        server.CONFIG = {
+            'mqtt_broker': {'host': 'localhost', 'port': 1883},
+            'station_configs': {
+                'station_5': {
+                    'beacon_1': {'event_type': 'beacon_proximity', 'range_threshold': 5, 'sound_on_trigger': 'a.wav'},
+                    'beacon_2': {'event_type': 'beacon_proximity', 'range_threshold': 5, 'sound_on_trigger': 'b.wav'},
+                },
+                'station_door': {
+                    'door': {'event_type': 'door_status', 'trigger_value': 'OPEN', 'sound_on_trigger': 'door.wav'},
+                },
+            }
+        }
+        self.client = MagicMock()
+
+    def tearDown(self):
+        server.CATCH_UP.finish()
+
+    def test_backlog_is_applied_as_one_transition(self):
+        beacon_topic = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+        door_topic = f"{MQTT_TOPIC_STATION_BASE}station_door/event/door_status"
+        with patch('src.server.STATE_PUBLISHER') as mock_publisher, \
+             patch('src.station_handler.play_audio_threaded', wraps=server.play_audio_threaded), \
+             patch('src.server.play_audio_threaded') as mock_play:
+            server.on_connect(self.client, None, {'session present': 1}, 0)
+            self.assertTrue(server.CATCH_UP.active)
+            for seq, range_value in enumerate([9, 8, 3]):
+                server.on_message(self.client, None, MockMQTTMessage(beacon_topic, {"range": range_value, "seq": seq}))
+            server.on_message(self.client, None, MockMQTTMessage(door_topic, {"status": "OPEN"}))
+            self.assertEqual(server.STATION_STATUS, {}) # Nothing applied yet
+            mock_publisher.notify_changed.reset_mock() # Liveness transitions
+            server.CATCH_UP.finish()
+
+        self.assertEqual(server.STATION_STATUS, {"station_5": {"completed": True}, "station_door": {"completed": True}})
+        mock_publisher.notify_changed.assert_called_once() # One state transition
+        # Both beacon sensors triggered on the one collapsed reading: still one cue for station_5
+        self.assertEqual(sorted(call.args[0] for call in mock_play.call_args_list), ["b.wav", "door.wav"])
+        self.assertEqual(server.CATCH_UP.last_recovery['received'], 4)
+        self.assertEqual(server.CATCH_UP.last_recovery['applied'], 2)
+
+    def test_puzzle_solved_during_the_outage_counts(self):
+        beacon_topic = f"{MQTT_TOPIC_STATION_BASE}station_5/event/beacon_proximity"
+        with patch('src.server.STATE_PUBLISHER'), patch('src.server.play_audio_threaded') as mock_play:
+            server.on_connect(self.client, None, {'session present': 1}, 0)
+            for seq, range_value in enumerate([9, 3, 8]): # Walked up to the beacon, then away
+                server.on_message(self.client, None, MockMQTTMessage(beacon_topic, {"range": range_value, "seq": seq}))
+            server.CATCH_UP.finish()
+        self.assertEqual(server.STATION_STATUS, {"station_5": {"completed": True}})
+        mock_play.assert_called_once()
+
+    def test_control_message_ends_catch_up(self):
+        with patch('src.server.STATE_PUBLISHER'):
+            server.CATCH_UP.begin(self.client)
+            server.on_message(self.client, None, MockMQTTMessage("escaperoom/server/control", {"action": "stop"}))
+        self.assertFalse(server.CATCH_UP.active)
+
+    def test_unexpected_disconnect_applies_backoff(self):
+        server.on_disconnect(self.client, None, 7)
+        self.client.reconnect_delay_set.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import server
+from src.serial_transport import SerialTransport
+from src.constants import SESSION_STATE_RUNNING
+
+
+def open_pty():
+    """Returns (master fd, slave path) of a new pseudo-terminal pair."""
+    master, slave = os.openpty()
+    path = os.ttyname(slave)
+    os.close(slave) # The transport opens its own end
+    return master, path
+
+
+class TestSerialTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.records = []
+        self.masters = []
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for master in self.masters:
+            try:
+                os.close(master)
+            except OSError:
+                pass
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_transport(self, paths, **kwargs):
+        transport = SerialTransport(paths, self.records.append, **kwargs)
+        self.addCleanup(transport.stop)
+        return transport
+
+    def new_pty(self):
+        master, path = open_pty()
+        self.masters.append(master)
+        return master, path
+
+    def poll_until(self, transport, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            transport.poll(0.05)
+        return condition()
+
+    def test_records_are_framed_across_reads(self):
+        master, path = self.new_pty()
+        transport = self.make_transport([path])
+        transport.poll(0)
+        self.assertEqual(transport.connected_ports, [path])
+
+        os.write(master, b"\r\nOn!\r\nescaperoom/station/s1/event/door_status {\"status\":")
+        transport.poll(0.05)
+        self.assertEqual(self.records, []) # Record not complete yet
+        os.write(master, b" \"OPEN\"}\r\nescaperoom/station/s1/event/door_status {\"status\": \"CLOSED\"}\n")
+        self.assertTrue(self.poll_until(transport, lambda: len(self.records) == 2))
+
+        self.assertEqual(self.records[0].topic, "escaperoom/station/s1/event/door_status")
+        self.assertEqual(self.records[0].payload, b'{"status": "OPEN"}')
+        self.assertEqual(transport.stats()[path], {'records': 2, 'discarded': 1}) # The "On!" banner
+
+    def test_many_ports_on_one_thread(self):
+        ports = [self.new_pty() for _ in range(4)]
+        transport = self.make_transport([path for _, path in ports])
+        per_port = 500
+        pending = {}
+        for index, (master, _) in enumerate(ports):
+            os.set_blocking(master, False)
+            pending[master] = b"".join(
+                f"escaperoom/station/s{index}/event/laser {{\"value\": {i}}}\n".encode() for i in range(per_port))
+        before = threading.active_count()
+        while pending:
+            # Large bursts on every port at once, as high-rate stations behind bridges would arrive
+            for master, data in list(pending.items()):
+                try:
+                    written = os.write(master, data)
+                except BlockingIOError:
+                    written = 0
+                pending[master] = data[written:]
+                if not pending[master]:
+                    del pending[master]
+            transport.poll(0.01)
+        self.assertTrue(self.poll_until(transport, lambda: len(self.records) == 4 * per_port))
+        self.assertEqual(threading.active_count(), before) # Polled inline: no thread per port
+        for index in range(4):
+            values = [r.payload for r in self.records if r.topic == f"escaperoom/station/s{index}/event/laser"]
+            self.assertEqual(values[-1], f'{{"value": {per_port - 1}}}'.encode()) # In order, none lost
+
+    def test_reconnects_after_unplug(self):
+        link = os.path.join(self.temp_dir, "ttyBRIDGE")
+        master, path = self.new_pty()
+        os.symlink(path, link)
+        transport = self.make_transport([link], reconnect_seconds=0.05)
+        transport.poll(0)
+        self.assertEqual(transport.connected_ports, [link])
+
+        os.close(master) # Unplugged
+        self.masters.remove(master)
+        with self.assertLogs(level='WARNING'):
+            self.assertTrue(self.poll_until(transport, lambda: transport.connected_ports == []))
+
+        master, path = self.new_pty() # Plugged back in, as a new device node
+        os.remove(link)
+        os.symlink(path, link)
+        self.assertTrue(self.poll_until(transport, lambda: transport.connected_ports == [link]))
+        os.write(master, b"escaperoom/station/s1/event/door_status {}\n")
+        self.assertTrue(self.poll_until(transport, lambda: len(self.records) == 1))
+
+    def test_background_thread_feeds_server_dispatch(self):
+        master, path = self.new_pty()
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        server.STATION_STATUS = {}
+        server.DUPLICATE_FILTER.clear()
+        server.CONFIG = {'station_configs': {'station_door': {
+            'door': {'event_type': 'door_status', 'trigger_value': 'OPEN', 'sound_on_trigger': 'door.wav'}}}}
+        client = MagicMock()
+        transport = SerialTransport([path], lambda msg: server.on_message(client, None, msg))
+        with patch('src.station_handler.play_audio_threaded') as mock_play, patch('src.server.STATE_PUBLISHER'):
+            transport.start()
+            self.addCleanup(transport.stop)
+            os.write(master, b"escaperoom/station/station_door/event/door_status {\"status\": \"OPEN\"}\n")
+            deadline = time.monotonic() + 2
+            while not server.STATION_STATUS and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(server.STATION_STATUS, {"station_door": {"completed": True}})
+        mock_play.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
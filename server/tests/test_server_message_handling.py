@@ -6,6 +6,7 @@ import logging # Import logging for assertLogs
 # Modules to test
 from src import server
 from src.server_state import ServerState # Import ServerState
+from src.dedup_cache import DuplicateFilter
 from src.constants import ( # Import constants used in tests/setup
     SESSION_STATE_PENDING, SESSION_STATE_RUNNING, SESSION_STATE_STOPPED,
     MQTT_TOPIC_SERVER_CONTROL, MQTT_TOPIC_STATION_BASE
@@ -32,6 +33,12 @@ class TestServerMessageHandling(unittest.TestCase):
         # Reset state for each test
         server.SESSION_STATE = SESSION_STATE_PENDING
         server.STATION_STATUS = {}
+        server.PUZZLE_PROGRESS = None
+        server.DUPLICATE_FILTER.clear()
+        # Sessions started by these tests must not write analytics files
+        recorder_patcher = patch('src.server.SESSION_RECORDER', None)
+        recorder_patcher.start()
+        self.addCleanup(recorder_patcher.stop)
         # Use imported constants for setup clarity
         server.CONFIG = {
             'mqtt_broker': {'host': 'localhost', 'port': 1883},
@@ -275,6 +282,7 @@ class TestServerMessageHandling(unittest.TestCase):
 
         server.SESSION_STATE = SESSION_STATE_STOPPED
         self.mock_station_handler.can_handle.reset_mock() # Reset mock for second part
+        server.DUPLICATE_FILTER.clear() # Same message again, it must not be dropped as a duplicate
 
         with patch('src.server.message_handlers', [self.mock_control_handler, self.mock_station_handler]), self.assertLogs(level='WARNING') as log:
              server.on_message(self.mock_client, None, msg)
@@ -362,6 +370,63 @@ class TestServerMessageHandling(unittest.TestCase):
         self.mock_station_handler.handle.assert_not_called()
 
 
+    # --- Test Duplicate Suppression ---
+
+    def test_duplicate_station_event_dropped(self):
+        """Test that an identical station event is dropped before parsing and dispatch."""
+        server.SESSION_STATE = SESSION_STATE_RUNNING
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_test/event/test_event"
+        self.mock_control_handler.can_handle.return_value = False
+        self.mock_station_handler.can_handle.return_value = True
+        self.mock_station_handler.handle.side_effect = lambda topic, payload, client, state: state
+
+        with patch('src.server.message_handlers', [self.mock_control_handler, self.mock_station_handler]), \
+             patch('src.server._parse_message_payload', wraps=server._parse_message_payload) as mock_parse:
+            server.on_message(self.mock_client, None, MockMQTTMessage(topic, '{"range": 3}'))
+            server.on_message(self.mock_client, None, MockMQTTMessage(topic, '{"range": 3}'))
+            server.on_message(self.mock_client, None, MockMQTTMessage(topic, '{"range": 4}'))
+
+        self.assertEqual(mock_parse.call_count, 2)
+        self.assertEqual(self.mock_station_handler.handle.call_count, 2)
+        self.assertEqual(server.DUPLICATE_FILTER.duplicates_dropped, 1)
+
+    def test_duplicate_detection_uses_seq_field(self):
+        """Test that payloads with the same seq are duplicates even if other fields differ."""
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_test/event/test_event"
+        dedup = server.DUPLICATE_FILTER
+        self.assertFalse(dedup.is_duplicate(topic, b'{"seq": 7, "range": 3}'))
+        self.assertTrue(dedup.is_duplicate(topic, b'{"range": 9, "seq": 7}'))
+        self.assertFalse(dedup.is_duplicate(topic, b'{"seq": 8, "range": 3}'))
+
+    def test_duplicate_filter_is_bounded(self):
+        """Test that the dedup cache never grows past max_entries."""
+        dedup = DuplicateFilter(window_seconds=60, max_entries=100)
+        for i in range(10000):
+            dedup.is_duplicate("escaperoom/station/s/event/e", f'{{"seq": {i}}}'.encode())
+        for i in range(10000): # Payloads without seq, one topic each
+            dedup.is_duplicate(f"escaperoom/station/s{i}/event/e", b'{"range": 3}')
+        self.assertEqual(len(dedup), 200)
+
+    def test_payload_returning_to_an_earlier_value_is_not_a_duplicate(self):
+        """Test that A -> B -> A without seq keeps the second A; only an immediate repeat is dropped."""
+        dedup = DuplicateFilter(window_seconds=2, clock=lambda: 0.0)
+        topic = f"{MQTT_TOPIC_STATION_BASE}station_door/event/door_status"
+        results = [dedup.is_duplicate(topic, payload) for payload in
+                   (b'{"status": "OPEN"}', b'{"status": "CLOSED"}', b'{"status": "OPEN"}', b'{"status": "OPEN"}')]
+        self.assertEqual(results, [False, False, False, True])
+        self.assertFalse(dedup.is_duplicate(f"{MQTT_TOPIC_STATION_BASE}station_other/event/door_status", b'{"status": "OPEN"}'))
+
+    def test_duplicate_window_expires(self):
+        """Test that a repeated payload outside the window is not a duplicate."""
+        now = [0.0]
+        dedup = DuplicateFilter(window_seconds=2, clock=lambda: now[0])
+        self.assertFalse(dedup.is_duplicate("t", b'{"range": 3}'))
+        now[0] = 1.0
+        self.assertTrue(dedup.is_duplicate("t", b'{"range": 3}'))
+        now[0] = 2.5
+        self.assertFalse(dedup.is_duplicate("t", b'{"range": 3}'))
+
+
     # Remove old routing tests as they mocked internal functions
 
 
@@ -0,0 +1,117 @@
+import math
+import os
+import tempfile
+import time
+import unittest
+from array import array
+
+from src.session_analytics import (
+    SessionRecorder, write_session_file, read_session_file,
+    KIND_EVENT, KIND_STATION_COMPLETED, KIND_SESSION_STATE
+)
+from src.analytics_report import load_sessions, build_report, format_report
+from src.constants import SESSION_STATE_PENDING, SESSION_STATE_RUNNING, SESSION_STATE_STOPPED
+
+
+def _wait_for_session_file(directory, timeout=2.0):
+    """Session files are written on a background thread."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        files = [f for f in os.listdir(directory) if f.endswith('.esa')]
+        if files:
+            return os.path.join(directory, files[0])
+        time.sleep(0.01)
+    return None
+
+
+class TestSessionAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_session_round_trip(self):
+        recorder = SessionRecorder(self.directory)
+        recorder.on_state_change(SESSION_STATE_PENDING, SESSION_STATE_RUNNING, {}, {}, SESSION_STATE_RUNNING)
+        recorder.record_event("station_5", "beacon_proximity", {"range": 8})
+        recorder.record_event("station_5", "beacon_proximity", {"range": 3})
+        recorder.record_event("station_door", "door_status", {"status": "OPEN"})
+        recorder.on_state_change(SESSION_STATE_RUNNING, SESSION_STATE_RUNNING,
+                                 {}, {"station_5": {"completed": True}}, SESSION_STATE_RUNNING)
+        recorder.on_state_change(SESSION_STATE_RUNNING, SESSION_STATE_STOPPED,
+                                 {"station_5": {"completed": True}}, {}, SESSION_STATE_RUNNING)
+        self.assertFalse(recorder.active)
+
+        path = _wait_for_session_file(self.directory)
+        self.assertIsNotNone(path)
+        header, columns = read_session_file(path)
+
+        self.assertEqual(header['end_state'], SESSION_STATE_STOPPED)
+        self.assertEqual(header['rows'], 6)
+        self.assertEqual(list(columns['kind']), [KIND_SESSION_STATE, KIND_EVENT, KIND_EVENT, KIND_EVENT,
+                                                 KIND_STATION_COMPLETED, KIND_SESSION_STATE])
+        self.assertEqual(list(columns['value'])[1:3], [8.0, 3.0])
+        self.assertTrue(math.isnan(columns['value'][3]))
+        self.assertEqual(header['stations'][columns['station'][4]], "station_5")
+
+    def test_sessions_in_the_same_second_get_their_own_files(self):
+        recorder = SessionRecorder(self.directory)
+        paths = []
+        for _ in range(3):
+            recorder.on_state_change(SESSION_STATE_PENDING, SESSION_STATE_RUNNING, {}, {}, SESSION_STATE_RUNNING)
+            paths.append(recorder.finish(SESSION_STATE_STOPPED))
+        self.assertEqual(len(set(paths)), 3)
+
+    def test_report(self):
+        for session in range(3):
+            header = {'session_id': str(session), 'rows': 4, 'stations': ['station_5', 'station_door'],
+                      'events': ['beacon_proximity', '', 'door_status']}
+            columns = {
+                'timestamp': array('d', [10, 20, 30 + session, 100]),
+                'kind': array('B', [KIND_EVENT, KIND_EVENT, KIND_STATION_COMPLETED, KIND_STATION_COMPLETED]),
+                'station': array('H', [0, 0, 0, 1]),
+                'event': array('H', [0, 0, 1, 1]),
+                'value': array('d', [5, 3, math.nan, math.nan]),
+            }
+            write_session_file(os.path.join(self.directory, f"session_{session}.esa"), header, columns)
+
+        report = build_report(load_sessions(self.directory))
+        self.assertEqual(report['sessions'], 3)
+        station_5 = report['stations']['station_5']
+        self.assertEqual(station_5['completions'], 3)
+        self.assertEqual(station_5['completion_seconds']['median'], 31)
+        self.assertEqual(station_5['readings_before_trigger']['mean'], 2)
+        self.assertEqual(report['stations']['station_door']['stall_seconds']['max'], 70)
+        self.assertEqual(report['event_counts'], {"station_5/beacon_proximity": 6})
+        self.assertIn("station_door", format_report(report))
+
+    def test_report_is_fast(self):
+        """Hundreds of sessions aggregate in well under a second."""
+        rows = 2000
+        stations = [f"station_{i}" for i in range(10)]
+        for session in range(300):
+            kinds = array('B', [KIND_EVENT] * rows)
+            for i in range(10):
+                kinds[(i + 1) * 190] = KIND_STATION_COMPLETED
+            columns = {
+                'timestamp': array('d', range(rows)),
+                'kind': kinds,
+                'station': array('H', [i % 10 for i in range(rows)]),
+                'event': array('H', [0] * rows),
+                'value': array('d', [1.0] * rows),
+            }
+            header = {'session_id': str(session), 'rows': rows, 'stations': stations, 'events': ['beacon_proximity']}
+            write_session_file(os.path.join(self.directory, f"session_{session}.esa"), header, columns)
+
+        start = time.perf_counter()
+        report = build_report(load_sessions(self.directory))
+        elapsed = time.perf_counter() - start
+        self.assertEqual(report['sessions'], 300)
+        self.assertLess(elapsed, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import multiprocessing
+import unittest
+
+from src.shm_ring import ShmRing
+
+CONTEXT = multiprocessing.get_context('spawn')
+
+
+def produce(name, doorbell, count):
+    """Writes `count` numbered records, waiting whenever the ring is full. Runs in a child process."""
+    ring = ShmRing.attach(name, doorbell)
+    for i in range(count):
+        record = i.to_bytes(4, 'little') * (1 + i % 8)
+        while not ring.put(record):
+            pass
+    ring.close()
+
+
+class TestShmRing(unittest.TestCase):
+
+    def make_ring(self, capacity=4, record_size=32):
+        ring = ShmRing.create(capacity, record_size, CONTEXT.Semaphore(0))
+        self.addCleanup(ring.close)
+        return ring
+
+    def test_records_come_out_in_order(self):
+        ring = self.make_ring()
+        for record in (b'a', b'bb', b''):
+            self.assertTrue(ring.put(record))
+        self.assertEqual(len(ring), 3)
+        self.assertEqual([ring.get(timeout=0) for _ in range(3)], [b'a', b'bb', b''])
+        self.assertIsNone(ring.get(timeout=0))
+
+    def test_full_ring_rejects_until_a_record_is_read(self):
+        ring = self.make_ring(capacity=2)
+        self.assertTrue(ring.put(b'1'))
+        self.assertTrue(ring.put(b'2'))
+        self.assertFalse(ring.put(b'3'))
+        self.assertEqual(ring.get(timeout=0), b'1')
+        self.assertTrue(ring.put(b'3'))
+        self.assertEqual([ring.get(timeout=0), ring.get(timeout=0)], [b'2', b'3'])
+
+    def test_wraps_around_many_times(self):
+        ring = self.make_ring(capacity=3)
+        for i in range(100):
+            self.assertTrue(ring.put(str(i).encode()))
+            self.assertEqual(ring.get(timeout=0), str(i).encode())
+
+    def test_oversized_record_is_rejected(self):
+        ring = self.make_ring(record_size=16)
+        self.assertEqual(ring.max_record_bytes, 12)
+        self.assertTrue(ring.put(b'x' * 12))
+        with self.assertRaises(ValueError):
+            ring.put(b'x' * 13)
+
+    def test_get_times_out_on_an_empty_ring(self):
+        ring = self.make_ring()
+        self.assertIsNone(ring.get(timeout=0.01))
+
+    def test_records_cross_processes(self):
+        ring = self.make_ring(capacity=8, record_size=36)
+        count = 2000
+        producer = CONTEXT.Process(target=produce, args=(ring.name, ring.doorbell, count))
+        producer.start()
+        self.addCleanup(producer.join, 5)
+        received = []
+        while len(received) < count:
+            record = ring.get(timeout=10)
+            self.assertIsNotNone(record, "producer stalled")
+            received.append(record)
+        self.assertEqual(received, [i.to_bytes(4, 'little') * (1 + i % 8) for i in range(count)])
+
+
+if __name__ == '__main__':
+    unittest.main()
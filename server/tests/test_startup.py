@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from src.startup import StartupReport
+
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartupReport(unittest.TestCase):
+
+    def test_phases_and_single_completion(self):
+        report = StartupReport(start=0.0, enabled=True)
+        report.mark("imports")
+        report.record("audio warm-up (background)", 0.25)
+        with patch("src.startup.logging") as mock_logging:
+            report.complete("first broker connection")
+            report.complete("first broker connection") # Reconnects don't report again
+        self.assertEqual([phase for phase, _ in report.phases],
+                         ["imports", "audio warm-up (background)", "first broker connection"])
+        mock_logging.info.assert_called_once()
+
+    def test_disabled_report_logs_nothing(self):
+        report = StartupReport(start=0.0, enabled=False)
+        with patch("src.startup.logging") as mock_logging:
+            report.complete("first broker connection")
+        mock_logging.info.assert_not_called()
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_server_import_defers_audio_and_http_stacks(self):
+        # Checked in a fresh interpreter: other tests may already have imported these
+        code = ("import sys, src.server; "
+                "print(sorted(m for m in ('playsound', 'http.server') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
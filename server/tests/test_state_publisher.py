@@ -0,0 +1,89 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from src.state_publisher import StatePublisher, diff_snapshots
+from src.server_state import ServerState
+from src.timer_wheel import TimerScheduler
+from src.constants import (
+    SESSION_STATE_PENDING, SESSION_STATE_RUNNING,
+    MQTT_TOPIC_SERVER_STATE, MQTT_TOPIC_SERVER_STATE_DELTA
+)
+
+
+class TestDiffSnapshots(unittest.TestCase):
+
+    def test_scalar_and_nested_changes(self):
+        previous = {"session_state": SESSION_STATE_PENDING, "station_status": {"a": {"completed": True}, "b": 1}}
+        current = {"session_state": SESSION_STATE_RUNNING, "station_status": {"a": {"completed": True}, "c": 2}}
+        self.assertEqual(diff_snapshots(previous, current), {
+            "session_state": SESSION_STATE_RUNNING,
+            "station_status": {"b": None, "c": 2},
+        })
+
+    def test_no_changes(self):
+        status = {"a": 1}
+        self.assertEqual(diff_snapshots({"station_status": status}, {"station_status": status}), {})
+        self.assertEqual(diff_snapshots({"station_status": {"a": 1}}, {"station_status": {"a": 1}}), {})
+
+
+class TestStatePublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = TimerScheduler() # Not started: flushes are triggered by hand
+        self.state = ServerState(SESSION_STATE_RUNNING, {}, {}, MagicMock())
+        self.publisher = StatePublisher(self.scheduler, lambda: self.state, coalesce_seconds=0.1)
+        self.client = MagicMock()
+        self.publisher.start(self.client)
+        self.client.reset_mock()
+
+    def published(self, topic):
+        return [json.loads(c.args[1]) for c in self.client.publish.call_args_list if c.args[0] == topic]
+
+    def test_burst_is_coalesced(self):
+        """Many changes within the window produce one delta and one retained snapshot."""
+        pending_before = len(self.scheduler) # The periodic snapshot refresh
+        for i in range(20):
+            self.state = self.state.replace(station_status=dict(self.state.station_status, **{f"station_{i}": {"completed": True}}))
+            self.publisher.notify_changed(self.client)
+        self.assertEqual(len(self.scheduler), pending_before + 1) # A single pending flush
+        self.publisher.flush()
+
+        deltas = self.published(MQTT_TOPIC_SERVER_STATE_DELTA)
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(len(deltas[0]["changes"]["station_status"]), 20)
+        snapshots = self.published(MQTT_TOPIC_SERVER_STATE)
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(snapshots[0]["state"]["station_status"], self.state.station_status)
+        self.assertEqual(snapshots[0]["version"], deltas[0]["version"])
+
+        retained = [c.kwargs["retain"] for c in self.client.publish.call_args_list]
+        self.assertEqual(sorted(retained), [False, True])
+
+    def test_stop_publishes_the_pending_delta(self):
+        self.state = self.state.replace(session_state=SESSION_STATE_PENDING)
+        self.publisher.notify_changed(self.client)
+        self.publisher.stop()
+        self.assertEqual(self.published(MQTT_TOPIC_SERVER_STATE_DELTA)[0]["changes"], {"session_state": SESSION_STATE_PENDING})
+        self.assertEqual(self.published(MQTT_TOPIC_SERVER_STATE)[0]["state"]["session_state"], SESSION_STATE_PENDING)
+        self.assertEqual(len(self.scheduler), 0) # No flush or refresh left behind
+        self.publisher.notify_changed(self.client)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_flush_without_changes_publishes_nothing(self):
+        self.publisher.flush()
+        self.client.publish.assert_not_called()
+
+    def test_listener_receives_delta(self):
+        listener = MagicMock()
+        self.publisher.add_listener(listener)
+        self.state = self.state.replace(session_state=SESSION_STATE_PENDING)
+        self.publisher.flush()
+        listener.assert_called_once()
+        version, delta, snapshot = listener.call_args.args
+        self.assertEqual(delta, {"session_state": SESSION_STATE_PENDING})
+        self.assertEqual(snapshot["session_state"], SESSION_STATE_PENDING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import unittest
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from src.timer_wheel import TimerWheel, TimerScheduler, ROOT_LEVEL_SIZE, MAX_TIMEOUT_TICKS
+from src.session_timers import SessionTimers
+from src.server_state import ServerState
+from src.constants import (
+    SESSION_STATE_PENDING, SESSION_STATE_RUNNING, SESSION_STATE_STOPPED,
+    MQTT_TOPIC_SERVER_CONTROL
+)
+
+
+class TestTimerWheel(unittest.TestCase):
+
+    def test_fires_at_exact_tick(self):
+        """Timers fire on their deadline tick, across every wheel level."""
+        wheel = TimerWheel()
+        delays = [0, 1, 255, 256, 257, 5000, 70000, 3_600_000]
+        timers = {wheel.add(d, lambda: None, name=str(d)): d for d in delays}
+
+        fired_at = {}
+        for delay in delays:
+            for timer in wheel.advance(delay):
+                fired_at[timer] = delay
+            # Nothing should fire one tick early
+            self.assertTrue(all(t.pending for t, d in timers.items() if d > delay))
+
+        self.assertEqual(fired_at, timers)
+        self.assertEqual(len(wheel), 0)
+
+    def test_firing_order_and_idle_skip(self):
+        """Advancing over a long idle stretch fires timers in deadline order."""
+        wheel = TimerWheel()
+        order = [wheel.add(d, lambda: None, name=str(d)) for d in (9000, 10, 300, 10)]
+        expired = wheel.advance(1_000_000)
+        self.assertEqual([t.deadline for t in expired], [10, 10, 300, 9000])
+        self.assertEqual(wheel.current_tick, 1_000_001)
+        self.assertEqual(set(expired), set(order))
+
+    def test_cancel(self):
+        wheel = TimerWheel()
+        keep = wheel.add(500, lambda: None)
+        drop = wheel.add(500, lambda: None)
+        self.assertTrue(drop.cancel())
+        self.assertFalse(drop.cancel()) # Second cancel is a no-op
+        self.assertEqual(wheel.advance(1000), [keep])
+        self.assertTrue(drop.cancelled)
+
+    def test_pause_and_resume_keep_remaining_ticks(self):
+        wheel = TimerWheel()
+        timer = wheel.add(1000, lambda: None)
+        wheel.advance(399)
+        self.assertTrue(timer.pause())
+        self.assertEqual(wheel.advance(5000), []) # Paused timers don't fire
+        self.assertTrue(timer.resume())
+        self.assertEqual(timer.deadline, 5001 + 600)
+        self.assertEqual(wheel.advance(5600), [])
+        self.assertEqual(wheel.advance(5601), [timer])
+
+    def test_timeout_beyond_wheel_span(self):
+        wheel = TimerWheel()
+        timer = wheel.add(MAX_TIMEOUT_TICKS + ROOT_LEVEL_SIZE * 3, lambda: None)
+        self.assertEqual(wheel.advance(MAX_TIMEOUT_TICKS), [])
+        self.assertEqual(wheel.advance(MAX_TIMEOUT_TICKS + ROOT_LEVEL_SIZE * 3), [timer])
+
+    def test_many_timers(self):
+        wheel = TimerWheel()
+        timers = [wheel.add(i * 7, lambda: None) for i in range(10000)]
+        for t in timers[::2]:
+            t.cancel()
+        self.assertEqual(len(wheel), 5000)
+        self.assertEqual(wheel.advance(70000), timers[1::2])
+
+    def test_next_event_tick_is_kept_up_to_date_on_insert(self):
+        """The incrementally tracked next event matches a full scan of the slots."""
+        wheel = TimerWheel()
+        wheel.advance(12345)
+        for delay in (90000, 5000, 300, 70, 3_600_000):
+            wheel.add(delay, lambda: None)
+            tracked = wheel.next_event_tick()
+            wheel._next_event = None # Force a scan
+            self.assertEqual(tracked, wheel.next_event_tick())
+        self.assertEqual(wheel.next_event_tick(), 12346 + 70)
+
+    def test_absolute_deadline_behind_current_tick(self):
+        """A deadline set while the wheel lags the clock fires no earlier than the deadline."""
+        wheel = TimerWheel()
+        timer = wheel.add_at(1500, lambda: None) # The clock is at 1000 but the wheel hasn't caught up
+        self.assertEqual(wheel.advance(1499), [])
+        self.assertEqual(wheel.advance(1500), [timer])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerSchedulerDeadlines(unittest.TestCase):
+
+    def test_timer_scheduled_while_another_is_due_does_not_fire_early(self):
+        clock = FakeClock()
+        scheduler = TimerScheduler(clock=clock) # Not started: the wheel is advanced by hand
+        due = scheduler.schedule(0.49, lambda: None)
+        clock.now = 0.5 # `due` is overdue but hasn't fired yet, so the wheel still lags
+        later = scheduler.schedule(1.0, lambda: None)
+        clock.now = 1.49
+        self.assertEqual(scheduler._wheel.advance(scheduler.now_tick()), [due])
+        clock.now = 1.5
+        self.assertEqual(scheduler._wheel.advance(scheduler.now_tick()), [later])
+
+    def test_pause_and_resume_count_from_the_clock(self):
+        clock = FakeClock()
+        scheduler = TimerScheduler(clock=clock)
+        timer = scheduler.schedule(1.0, lambda: None)
+        clock.now = 0.4
+        self.assertTrue(timer.pause())
+        clock.now = 10.0
+        self.assertTrue(timer.resume())
+        self.assertAlmostEqual(scheduler.remaining_seconds(timer), 0.6)
+
+
+
+class TestTimerScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = TimerScheduler()
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_callback_runs_on_time(self):
+        fired = threading.Event()
+        fired_at = []
+        start = time.monotonic()
+        self.scheduler.schedule(0.05, lambda: (fired_at.append(time.monotonic()), fired.set()))
+        self.assertTrue(fired.wait(1))
+        self.assertGreaterEqual(fired_at[0] - start, 0.05)
+        self.assertLess(fired_at[0] - start, 0.05 + 0.02)
+
+    def test_cancelled_timer_does_not_fire(self):
+        callback = MagicMock()
+        timer = self.scheduler.schedule(0.02, callback)
+        timer.cancel()
+        time.sleep(0.05)
+        callback.assert_not_called()
+
+    def test_callback_errors_do_not_stop_scheduler(self):
+        fired = threading.Event()
+        self.scheduler.schedule(0.001, MagicMock(side_effect=RuntimeError("boom")))
+        self.scheduler.schedule(0.01, fired.set)
+        with self.assertLogs(level='ERROR'):
+            self.assertTrue(fired.wait(1))
+
+
+class TestSessionTimers(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = TimerScheduler()
+        self.state = ServerState(SESSION_STATE_RUNNING, {}, {}, MagicMock())
+        self.session_timers = SessionTimers(self.scheduler, lambda: self.state)
+        self.config = {
+            "session_timers": {
+                "time_limit_seconds": 3600,
+                "cues": [{"name": "hint", "after_seconds": 600, "sound": "hint.wav", "unless_completed": "station_5"}]
+            }
+        }
+        self.client = MagicMock()
+
+    def test_session_lifecycle(self):
+        """Timers are armed on start, paused on stop, resumed on start and cancelled on reset."""
+        self.session_timers.on_session_state_change(SESSION_STATE_PENDING, SESSION_STATE_RUNNING, self.config, self.client)
+        timers = self.session_timers.timers
+        self.assertEqual(len(timers), 2)
+        self.assertTrue(all(t.pending for t in timers))
+
+        self.session_timers.on_session_state_change(SESSION_STATE_RUNNING, SESSION_STATE_STOPPED, self.config, self.client)
+        self.assertTrue(all(t.paused for t in timers))
+
+        self.session_timers.on_session_state_change(SESSION_STATE_STOPPED, SESSION_STATE_RUNNING, self.config, self.client)
+        self.assertEqual(self.session_timers.timers, timers) # Resumed, not re-armed
+        self.assertTrue(all(t.pending for t in timers))
+
+        self.session_timers.on_session_state_change(SESSION_STATE_RUNNING, SESSION_STATE_PENDING, self.config, self.client)
+        self.assertEqual(self.session_timers.timers, [])
+        self.assertTrue(all(t.cancelled for t in timers))
+        self.assertEqual(len(self.scheduler), 0)
+
+    @patch('src.session_timers.play_audio_threaded')
+    def test_cue_skipped_when_station_completed(self, mock_play):
+        cue = self.config["session_timers"]["cues"][0]
+        self.session_timers._on_cue(cue)
+        mock_play.assert_called_once_with("hint.wav", gain=1.0)
+
+        mock_play.reset_mock()
+        self.state = ServerState(SESSION_STATE_RUNNING, {"station_5": {"completed": True}}, {}, MagicMock())
+        self.session_timers._on_cue(cue)
+        mock_play.assert_not_called()
+
+    def test_time_limit_publishes_stop(self):
+        self.session_timers.on_session_state_change(SESSION_STATE_PENDING, SESSION_STATE_RUNNING, self.config, self.client)
+        self.session_timers._on_time_limit()
+        self.client.publish.assert_called_once_with(MQTT_TOPIC_SERVER_CONTROL, '{"action": "stop"}')
+        self.assertEqual([t.name for t in self.session_timers.timers], ["session_time_limit"])
+
+
+if __name__ == '__main__':
+    unittest.main()